@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_engine import CHOICE_CODE, CHOICES, INSTR_INDEX, INSTRUMENT_SET
+from horizons import DEFAULT_HORIZON, HORIZONS
+from results_store import (DEFAULT_DB, LEGACY_INSTRUMENTS_SQL, column_or, decisions_from_blob, returns_from_blob,
+                           weights_from_blob)
+from scoring import BIG_UP_THRESHOLD, big_up_mask, compute_player_scores_batch, compute_portfolio_scores_batch
+
+# Statystyki wszystkich zapisanych gier (bazy results.db) liczone strumieniowo:
+# gry czytamy porcjami z kursora, każdą porcję oceniamy wsadowo i dodajemy do liczników
+# o stałym rozmiarze (rundy x instrumenty, histogramy 0-100), więc pamięć nie rośnie z liczbą gier.
+# Bazy dzielimy na zakresy id i liczymy równolegle w wielu procesach, a liczniki na końcu sumujemy.
+# Gry w trybie portfela liczymy osobno (portfolio=True): udziały wyborów to udziały kapitału,
+# a ocena pochodzi z compute_portfolio_scores_batch.
+
+# Gier w jednym zadaniu procesu i w jednej porcji czytanej z bazy
+SHARD_GAMES = 50_000
+CHUNK_GAMES = 2_000
+
+# Instrumenty ryzykowne jako kody decyzji (gotówka nie ma "euforii")
+_RISKY_CODES = [CHOICE_CODE[k] for k in INSTR_INDEX]
+
+def _connect_ro(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+# Warunek SQL na gry horyzontu w obecnym zestawie instrumentów (gier z innych zestawów nie da się odczytać)
+# i w jednym trybie gry, tylko na modelu zwrotów (bez gier na prawdziwych notowaniach); parametry: horyzont, tryb (0/1)
+def _games_filter(conn) -> str:
+    return (f"horizon = ? AND {_instruments(conn)} = '{INSTRUMENT_SET}' AND {column_or(conn, 'portfolio', '0')} = ? "
+            f"AND {column_or(conn, 'history', '0')} = 0")
+
+def _instruments(conn) -> str:
+    return column_or(conn, "instruments", LEGACY_INSTRUMENTS_SQL)
+
+# Zakresy id po shard_games kolejnych id (zadania dla procesów); gry innych horyzontów w zakresie pomijamy
+def shard_ranges(path: str, horizon: str, shard_games: int = SHARD_GAMES, portfolio: bool = False) -> list:
+    with contextlib.closing(_connect_ro(path)) as conn:
+        first, last = conn.execute(f"SELECT MIN(id), MAX(id) FROM games WHERE {_games_filter(conn)}",
+                                   (horizon, int(portfolio))).fetchone()
+    if first is None:
+        return []
+    return [(lo, min(lo + shard_games, last + 1)) for lo in range(first, last + 1, shard_games)]
+
+# Porcje gier z zakresu id jako tablice (decyzje, dźwignia, zwroty, udziały portfela albo None).
+# W porcji gry o różnej liczbie decyzji rozdzielamy, bo ocena wsadowa wymaga tej samej długości.
+def iter_game_chunks(path: str, horizon: str, lo: int, hi: int, chunk_games: int = CHUNK_GAMES,
+                     portfolio: bool = False):
+    with contextlib.closing(_connect_ro(path)) as conn:
+        weights_sql = column_or(conn, "weights", "NULL") if portfolio else "NULL"
+        cur = conn.execute(f"SELECT rounds, decisions, returns, {weights_sql}, {_instruments(conn)} FROM games "
+                           f"WHERE {_games_filter(conn)} AND id >= ? AND id < ?", (horizon, int(portfolio), lo, hi))
+        while True:
+            rows = cur.fetchmany(chunk_games)
+            if not rows:
+                return
+            by_rounds = {}
+            for rounds, dec_blob, ret_blob, w_blob, instruments in rows:
+                weights = None if w_blob is None else weights_from_blob(w_blob, instruments)
+                by_rounds.setdefault(rounds, []).append((decisions_from_blob(dec_blob, instruments),
+                                                         returns_from_blob(ret_blob, instruments), weights))
+            for games in by_rounds.values():
+                decisions = np.stack([d for d, _, _ in games])
+                returns = np.stack([r for _, r, _ in games])
+                weights = np.stack([w for _, _, w in games]) if portfolio else None
+                yield decisions["choice"].astype(np.int64), decisions["leverage"], returns, weights
+
+# Puste liczniki dla gier o najwyżej n_decisions decyzjach; w trybie portfela wybory i wejścia po euforii
+# sumujemy jako udziały kapitału, więc liczniki są zmiennoprzecinkowe
+def empty_stats(n_decisions: int, portfolio: bool = False) -> dict:
+    counts = np.float64 if portfolio else np.int64
+    return {
+        "games": 0,
+        "choice_counts": np.zeros((n_decisions, len(CHOICES)), dtype=counts),
+        "leverage_counts": np.zeros(n_decisions, dtype=np.int64),
+        "games_with_leverage": 0,
+        "big_up_buys": 0.0 if portfolio else 0,
+        "big_up_occasions": np.zeros(len(_RISKY_CODES), dtype=np.int64),
+        "big_up_follows": np.zeros(len(_RISKY_CODES), dtype=counts),
+        "risk_hist": np.zeros(101, dtype=np.int64),
+        "rationality_hist": np.zeros(101, dtype=np.int64),
+    }
+
+# Dodajemy do liczników porcję gier o tej samej liczbie decyzji (weights: udziały gier w trybie portfela)
+def add_chunk(stats: dict, choices, leverage, returns, leverage_from: int, weights=None):
+    n_games, n = choices.shape
+    stats["games"] += n_games
+    if weights is None:
+        for c in range(len(CHOICES)):
+            stats["choice_counts"][:n, c] += (choices == c).sum(axis=0)
+    else:
+        stats["choice_counts"][:n] += weights.sum(axis=0)
+    stats["leverage_counts"][:n] += leverage.sum(axis=0)
+    stats["games_with_leverage"] += int(leverage[:, leverage_from:].any(axis=1).sum())
+
+    if weights is None:
+        stats["big_up_buys"] += int(big_up_mask(choices, returns).sum())
+    # Dla każdego instrumentu: ile razy urósł o próg i ile razy gracz wszedł w niego w następnej rundzie
+    # (w trybie portfela: jaki udział kapitału miał w nim w następnej rundzie)
+    for j, code in enumerate(_RISKY_CODES):
+        big = returns[:, :n - 1, INSTR_INDEX[CHOICES[code]]] >= BIG_UP_THRESHOLD[code]
+        stats["big_up_occasions"][j] += int(big.sum())
+        if weights is None:
+            stats["big_up_follows"][j] += int((big & (choices[:, 1:] == code)).sum())
+        else:
+            follows = float(weights[:, 1:, code][big].sum())
+            stats["big_up_follows"][j] += follows
+            stats["big_up_buys"] += follows
+
+    if weights is None:
+        scores = compute_player_scores_batch(choices, leverage, returns)
+    else:
+        scores = compute_portfolio_scores_batch(weights, leverage, returns)
+    stats["risk_hist"] += np.bincount(scores["risk"], minlength=101)
+    stats["rationality_hist"] += np.bincount(scores["rationality"], minlength=101)
+
+def merge_stats(a: dict, b: dict) -> dict:
+    return {k: a[k] + b[k] for k in a}
+
+def run_shard(path: str, horizon: str, lo: int, hi: int, chunk_games: int = CHUNK_GAMES,
+              portfolio: bool = False) -> dict:
+    h = HORIZONS[horizon]
+    stats = empty_stats(h["rounds"] - 1, portfolio)
+    for choices, leverage, returns, weights in iter_game_chunks(path, horizon, lo, hi, chunk_games, portfolio):
+        add_chunk(stats, choices, leverage, returns, h["leverage_from"], weights)
+    return stats
+
+# Średnia i percentyle z histogramu wartości 0-100
+def _hist_summary(hist) -> dict:
+    total = hist.sum()
+    if total == 0:
+        return {"mean": None, "p10": None, "p50": None, "p90": None}
+    cum = np.cumsum(hist)
+    out = {"mean": float((np.arange(101) * hist).sum() / total)}
+    out.update({f"p{p}": int(np.searchsorted(cum, total * p / 100)) for p in (10, 50, 90)})
+    return out
+
+def summarize(stats: dict, horizon: str) -> dict:
+    leverage_from = HORIZONS[horizon]["leverage_from"]
+    decided = stats["choice_counts"].sum(axis=1)
+    played = int(np.count_nonzero(decided))
+    decided = decided[:played]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = stats["choice_counts"][:played] / decided[:, None]
+        lev_share = stats["leverage_counts"][:played] / decided
+        follow = stats["big_up_follows"] / stats["big_up_occasions"]
+    lev_after = stats["leverage_counts"][leverage_from:played].sum()
+    decisions_after = decided[leverage_from:].sum()
+    games = stats["games"]
+    return {
+        "horizon": horizon,
+        "games": games,
+        "decisions": int(round(float(decided.sum()))),
+        "choice_share": {k: float(stats["choice_counts"][:, c].sum() / max(1, decided.sum())) for c, k in enumerate(CHOICES)},
+        "choice_share_by_round": {k: shares[:, c].round(4).tolist() for c, k in enumerate(CHOICES)},
+        "leverage": {
+            "from_round": leverage_from + 1,
+            "games_using": stats["games_with_leverage"] / games if games else 0.0,
+            "decisions_share": float(lev_after / decisions_after) if decisions_after else 0.0,
+            "share_by_round": np.nan_to_num(lev_share).round(4).tolist(),
+        },
+        "big_up": {
+            "buys": stats["big_up_buys"],
+            "buys_share": stats["big_up_buys"] / max(1, int(round(float(decided[1:].sum())))),
+            "follow_rate": {CHOICES[code]: (None if np.isnan(f) else float(f)) for code, f in zip(_RISKY_CODES, follow)},
+        },
+        "risk": _hist_summary(stats["risk_hist"]) | {"hist": stats["risk_hist"].tolist()},
+        "rationality": _hist_summary(stats["rationality_hist"]) | {"hist": stats["rationality_hist"].tolist()},
+    }
+
+def run_analytics(paths, horizon: str = DEFAULT_HORIZON, workers=None, shard_games: int = SHARD_GAMES,
+                  chunk_games: int = CHUNK_GAMES, portfolio: bool = False) -> dict:
+    tasks = [(p, lo, hi) for p in paths for lo, hi in shard_ranges(p, horizon, shard_games, portfolio)]
+    stats = empty_stats(HORIZONS[horizon]["rounds"] - 1, portfolio)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_shard, p, horizon, lo, hi, chunk_games, portfolio) for p, lo, hi in tasks]
+        for f in futures:
+            stats = merge_stats(stats, f.result())
+    report = summarize(stats, horizon)
+    report["portfolio"] = portfolio
+    report["files"] = list(paths)
+    return report
+
+def print_report(report: dict):
+    mode = "tryb portfela" if report["portfolio"] else "jeden instrument na rundę"
+    print(f"{HORIZONS[report['horizon']]['label']} ({mode}): {report['games']} gier, {report['decisions']} decyzji")
+    if not report["games"]:
+        return
+    shares = ", ".join(f"{k} {v:.1%}" for k, v in report["choice_share"].items())
+    print(f"wybory: {shares}")
+    lev = report["leverage"]
+    print(f"dźwignia od rundy {lev['from_round']}: używa {lev['games_using']:.1%} gier, "
+          f"{lev['decisions_share']:.1%} decyzji")
+    big = report["big_up"]
+    follow = ", ".join(f"{k} {'–' if v is None else f'{v:.1%}'}" for k, v in big["follow_rate"].items())
+    print(f"wejścia po euforii: {big['buys']:.0f} ({big['buys_share']:.1%} decyzji); po dużym wzroście wybiera: {follow}")
+    for key, name in (("risk", "ryzyko"), ("rationality", "racjonalność")):
+        s = report[key]
+        print(f"{name}: średnia {s['mean']:.1f}, p10 {s['p10']}, p50 {s['p50']}, p90 {s['p90']}")
+
+    by_round = report["choice_share_by_round"]
+    n = len(by_round[CHOICES[0]])
+    step = max(1, -(-n // 40))
+    print(f"\n{'runda':>6}" + "".join(f"{k:>8}" for k in CHOICES) + f"{'lewar':>8}")
+    for t in range(0, n, step):
+        row = "".join(f"{by_round[k][t]:>8.1%}" for k in CHOICES)
+        print(f"{t + 1:>6}{row}{lev['share_by_round'][t]:>8.1%}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statystyki wszystkich zapisanych gier (strumieniowo, równolegle).")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DB], help=f"bazy wyników (domyślnie {DEFAULT_DB})")
+    parser.add_argument("--horizon", choices=list(HORIZONS), default=DEFAULT_HORIZON, help="horyzont gier")
+    parser.add_argument("--portfolio", action="store_true", help="gry w trybie portfela zamiast jednego instrumentu")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="liczba procesów")
+    parser.add_argument("--shard-games", type=int, default=SHARD_GAMES, help="gier na zadanie procesu")
+    parser.add_argument("--chunk-games", type=int, default=CHUNK_GAMES, help="gier w porcji czytanej z bazy")
+    parser.add_argument("--json", help="zapisz pełny raport do pliku JSON")
+    args = parser.parse_args(argv)
+
+    report = run_analytics(args.paths, args.horizon, workers=args.workers, shard_games=args.shard_games,
+                           chunk_games=args.chunk_games, portfolio=args.portfolio)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_engine import (CASH_CODE, CASH_WEIGHTS, CHOICE_CODE, CHOICES, LEVERAGE_FROM_ROUND, REBALANCE_COST,
+                         SPECULATIVE_KEYS, START_CAPITAL, TOTAL_ROUNDS, choice_returns, portfolio_growth)
+from returns_model import MOMENTUM_LOOKBACK, PARAMS, RISKY_KEYS, simulate_paths
+from scoring import compute_player_scores_batch, compute_portfolio_scores_batch
+
+# Strategie dostają zwroty z rozegranych rund (ścieżki x t x instrumenty), numer rundy t
+# i generator; zwracają kody decyzji (CHOICES) i flagi dźwigni dla wszystkich ścieżek naraz.
+
+# Rynek szeroki: pierwszy instrument zestawu (domyślnie S&P 500)
+MARKET = 0
+
+def _const(code: int, leverage: bool = False):
+    def strategy(past, t, rng):
+        n = past.shape[0]
+        return np.full(n, code), np.full(n, leverage)
+    return strategy
+
+# Wchodzimy w instrument z najlepszym ostatnim zwrotem, o ile był dodatni; inaczej gotówka
+def momentum_follow(past, t, rng):
+    n = past.shape[0]
+    if t == 0:
+        return np.full(n, MARKET), np.zeros(n, dtype=bool)
+    last = past[:, -1]
+    return np.where(last.max(axis=1) > 0, last.argmax(axis=1), CASH_CODE), np.zeros(n, dtype=bool)
+
+# Trzymamy rynek szeroki, ale po dwóch spadkowych miesiącach z rzędu przechodzimy do gotówki
+def cash_after_two_down(past, t, rng):
+    n = past.shape[0]
+    choices = np.full(n, MARKET)
+    if t >= 2:
+        down = (past[:, -1, MARKET] < 0) & (past[:, -2, MARKET] < 0)
+        choices[down] = CASH_CODE
+    return choices, np.zeros(n, dtype=bool)
+
+def random_choice(past, t, rng):
+    n = past.shape[0]
+    return rng.integers(len(CHOICE_CODE), size=n), rng.random(n) < 0.5
+
+# Stałe strategie dla rynku szerokiego i instrumentów spekulacyjnych (te także z dźwignią)
+STRATEGIES = {f"always-{RISKY_KEYS[MARKET].lower()}": _const(MARKET)}
+for _key in SPECULATIVE_KEYS:
+    STRATEGIES[f"always-{_key.lower()}"] = _const(CHOICE_CODE[_key])
+    STRATEGIES[f"always-{_key.lower()}-lev"] = _const(CHOICE_CODE[_key], leverage=True)
+STRATEGIES.update({
+    "momentum": momentum_follow,
+    "cash-after-two-down": cash_after_two_down,
+    "random": random_choice,
+})
+
+# Strategie portfelowe (tryb portfela) dostają to samo i dodatkowo udziały held po poprzedniej rundzie
+# (ścieżki x wybory); zwracają udziały wyborów (ścieżki x wybory, suma 1) i flagi dźwigni.
+N_CHOICES = len(CHOICES)
+
+def _fixed_weights(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    def allocation(past, t, rng, held):
+        n = past.shape[0]
+        return np.broadcast_to(weights, (n, N_CHOICES)), np.zeros(n, dtype=bool)
+    return allocation
+
+def _risky_weights(values) -> np.ndarray:
+    w = np.zeros(N_CHOICES)
+    w[:len(values)] = np.asarray(values) / np.sum(values)
+    return w
+
+# Kupujemy po równo wszystkie instrumenty i nie przebudowujemy portfela (bez kosztów po pierwszej rundzie)
+def buy_and_hold_equal(past, t, rng, held):
+    n = past.shape[0]
+    if t == 0:
+        return np.broadcast_to(_risky_weights(np.ones(len(RISKY_KEYS))), (n, N_CHOICES)), np.zeros(n, dtype=bool)
+    return held, np.zeros(n, dtype=bool)
+
+# Po równo w instrumenty z przewagą wzrostów w ostatnich rundach (jak pamięć trendu modelu); reszta w gotówce
+def trend_weights(past, t, rng, held):
+    n = past.shape[0]
+    score = np.sign(past[:, -MOMENTUM_LOOKBACK:]).sum(axis=1) if t else np.zeros((n, len(RISKY_KEYS)))
+    up = (score > 0).astype(np.float64)
+    k = up.sum(axis=1, keepdims=True)
+    weights = np.zeros((n, N_CHOICES))
+    weights[:, :len(RISKY_KEYS)] = up / np.maximum(k, 1)
+    weights[:, CASH_CODE] = k[:, 0] == 0
+    return weights, np.zeros(n, dtype=bool)
+
+ALLOCATIONS = {
+    "equal-weight": _fixed_weights(_risky_weights(np.ones(len(RISKY_KEYS)))),
+    "inverse-vol": _fixed_weights(_risky_weights(1.0 / PARAMS["vol"])),
+    "market-60-cash-40": _fixed_weights(0.6 * np.eye(N_CHOICES)[MARKET] + 0.4 * CASH_WEIGHTS),
+    "buy-and-hold-equal": buy_and_hold_equal,
+    "trend-weights": trend_weights,
+}
+
+# Rozgrywamy strategię na wszystkich ścieżkach naraz, z regułami dźwigni jak w GameState.step
+def play_strategy(strategy, paths, rng, start_capital: float = START_CAPITAL):
+    n_paths = paths.shape[0]
+    n_decisions = TOTAL_ROUNDS - 1
+    choices = np.empty((n_paths, n_decisions), dtype=np.int8)
+    leverage = np.empty((n_paths, n_decisions), dtype=bool)
+    capital = np.empty((n_paths, n_decisions + 1))
+    capital[:, 0] = start_capital
+
+    for t in range(n_decisions):
+        ch, lev = strategy(paths[:, :t], t, rng)
+        lev = np.asarray(lev, dtype=bool) & (t >= LEVERAGE_FROM_ROUND)
+        choices[:, t] = ch
+        leverage[:, t] = lev
+        capital[:, t + 1] = capital[:, t] * (1 + choice_returns(paths[:, t], ch, lev))
+
+    return choices, leverage, capital
+
+# Rozgrywamy strategię portfelową na wszystkich ścieżkach naraz: każda runda to kilka operacji
+# na macierzach (ścieżki x wybory), z kosztami przebudowy jak w GameState.step_portfolio
+def play_allocation(allocation, paths, rng, start_capital: float = START_CAPITAL, cost: float = REBALANCE_COST):
+    n_paths = paths.shape[0]
+    n_decisions = TOTAL_ROUNDS - 1
+    weights = np.empty((n_paths, n_decisions, N_CHOICES))
+    leverage = np.empty((n_paths, n_decisions), dtype=bool)
+    capital = np.empty((n_paths, n_decisions + 1))
+    capital[:, 0] = start_capital
+    held = np.broadcast_to(CASH_WEIGHTS, (n_paths, N_CHOICES))
+
+    for t in range(n_decisions):
+        w, lev = allocation(paths[:, :t], t, rng, held)
+        lev = np.asarray(lev, dtype=bool) & (t >= LEVERAGE_FROM_ROUND)
+        weights[:, t] = w
+        leverage[:, t] = lev
+        growth, held = portfolio_growth(paths[:, t], weights[:, t], lev, held, cost)
+        capital[:, t + 1] = capital[:, t] * growth
+
+    return weights, leverage, capital
+
+# Jedna paczka ścieżek: każda strategia gra na tych samych ścieżkach (wspólne liczby losowe)
+def run_shard(seed_seq, n_paths: int, strategy_names, ruin_level: float, cost: float = REBALANCE_COST):
+    rng = np.random.default_rng(seed_seq)
+    paths = simulate_paths(n_paths, TOTAL_ROUNDS, rng=rng)
+
+    results = {}
+    for name in strategy_names:
+        if name in ALLOCATIONS:
+            weights, leverage, capital = play_allocation(ALLOCATIONS[name], paths, rng, cost=cost)
+            scores = compute_portfolio_scores_batch(weights, leverage, paths)
+        else:
+            choices, leverage, capital = play_strategy(STRATEGIES[name], paths, rng)
+            scores = compute_player_scores_batch(choices, leverage, paths)
+        results[name] = {
+            "final": capital[:, -1],
+            "ruined": capital.min(axis=1) < ruin_level * START_CAPITAL,
+            "risk": scores["risk"].astype(np.int16),
+            "rationality": scores["rationality"].astype(np.int16),
+        }
+    return results
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+def _distribution(values) -> dict:
+    pct = np.percentile(values, PERCENTILES)
+    out = {"mean": float(np.mean(values)), "std": float(np.std(values))}
+    out.update({f"p{p}": float(v) for p, v in zip(PERCENTILES, pct)})
+    return out
+
+# Zbieramy wyniki paczek w rozkłady dla każdej strategii
+def summarize(shard_results, strategy_names) -> dict:
+    summary = {}
+    for name in strategy_names:
+        parts = [r[name] for r in shard_results]
+        final = np.concatenate([p["final"] for p in parts])
+        summary[name] = {
+            "games": int(final.size),
+            "final_capital": _distribution(final),
+            "ruin_probability": float(np.concatenate([p["ruined"] for p in parts]).mean()),
+            "risk": _distribution(np.concatenate([p["risk"] for p in parts])),
+            "rationality": _distribution(np.concatenate([p["rationality"] for p in parts])),
+        }
+    return summary
+
+def run_backtest(n_paths: int, strategy_names, seed=None, workers=None, shard_size: int = 10_000, ruin_level: float = 0.5,
+                 cost: float = REBALANCE_COST):
+    root = np.random.SeedSequence(seed)
+    sizes = [min(shard_size, n_paths - start) for start in range(0, n_paths, shard_size)]
+    seeds = root.spawn(len(sizes))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_shard, s, size, strategy_names, ruin_level, cost) for s, size in zip(seeds, sizes)]
+        shard_results = [f.result() for f in futures]
+
+    return {"seed": root.entropy, "paths": n_paths, "ruin_level": ruin_level, "rebalance_cost": cost,
+            "strategies": summarize(shard_results, strategy_names)}
+
+def print_table(report: dict):
+    print(f"Ścieżek: {report['paths']}, ziarno: {report['seed']}, ruina: kapitał < {report['ruin_level']:.0%} startu")
+    header = f"{'strategia':<22}{'średnia':>10}{'p5':>10}{'p50':>10}{'p95':>10}{'ruina':>8}{'ryzyko':>8}{'racj.':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, s in report["strategies"].items():
+        fc = s["final_capital"]
+        print(
+            f"{name:<22}{fc['mean']:>10.0f}{fc['p5']:>10.0f}{fc['p50']:>10.0f}{fc['p95']:>10.0f}"
+            f"{s['ruin_probability']:>8.1%}{s['risk']['mean']:>8.1f}{s['rationality']['mean']:>8.1f}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest Monte Carlo strategii na ścieżkach z modelu INSTRUMENTS.")
+    parser.add_argument("--paths", type=int, default=20_000, help="liczba ścieżek (domyślnie 20 000)")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES) + sorted(ALLOCATIONS),
+                        default=list(STRATEGIES) + list(ALLOCATIONS),
+                        help="strategie i portfele do porównania (domyślnie wszystkie)")
+    parser.add_argument("--seed", type=int, default=None, help="ziarno (domyślnie losowe, wypisywane w raporcie)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="liczba procesów")
+    parser.add_argument("--shard-size", type=int, default=10_000, help="ścieżek na zadanie procesu")
+    parser.add_argument("--ruin", type=float, default=0.5, help="próg ruiny jako ułamek kapitału startowego")
+    parser.add_argument("--cost", type=float, default=REBALANCE_COST,
+                        help=f"koszt przebudowy portfela jako ułamek obrotu (domyślnie {REBALANCE_COST})")
+    parser.add_argument("--json", help="zapisz pełny raport do pliku JSON")
+    args = parser.parse_args(argv)
+
+    report = run_backtest(args.paths, args.strategies, seed=args.seed, workers=args.workers,
+                          shard_size=args.shard_size, ruin_level=args.ruin, cost=args.cost)
+    print_table(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
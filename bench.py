@@ -0,0 +1,168 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from game_engine import CHOICES, GameState, compute_player_scores, decisions_from_codes
+from returns_model import RISKY_KEYS, sample_return, simulate_paths, streak_bias
+from rng_streams import seeded_paths
+from scoring import compute_player_scores_batch
+from ui_helpers import chart_frame, fmt_pln_num, summary_cards_html
+
+# Mikrobenchmarki ścieżek symulacji i oceny. Ziarna i rozmiary są stałe,
+# więc wyniki z różnych commitów można porównywać (--baseline z progiem --threshold).
+
+SEED = 1234
+ROUNDS = (40, 1000)
+BATCHES = (1_000, 100_000)
+
+# Gra rozegrana losowymi decyzjami na stałej ścieżce (do benchmarków oceny i wykresu)
+def _played_game(n_rounds: int) -> GameState:
+    rng = random.Random(SEED)
+    path = simulate_paths(1, n_rounds, rng=np.random.default_rng(SEED))[0]
+    game = GameState(path=path, total_rounds=n_rounds)
+    while not game.finished:
+        game.step(rng.choice(CHOICES), rng.random() < 0.3)
+    return game
+
+# apply_benchmarks nadpisuje wiersze bufora historii, więc można go powtarzać na tej samej grze
+def _apply_all_benchmarks(game: GameState):
+    for r in range(1, game.total_rounds):
+        game.apply_benchmarks(r)
+
+# Każdy przypadek to (nazwa, funkcja bez argumentów); przygotowanie danych dzieje się poza pomiarem
+def build_cases():
+    cases = []
+    # Ostatni instrument zestawu (domyślnie BTC)
+    key = RISKY_KEYS[-1]
+    series_40 = simulate_paths(1, 40, rng=np.random.default_rng(SEED))[0, :, -1].tolist()
+    scalar_rng = random.Random(SEED)
+    cases.append((f"sample_return/{key}", lambda: sample_return(key, series_40, scalar_rng)))
+    cases.append((f"streak_bias/{key}", lambda: streak_bias(key, series_40)))
+
+    for n in ROUNDS:
+        rng = np.random.default_rng(SEED)
+        cases.append((f"ensure_round_returns/{n}", lambda n=n, rng=rng: GameState(rng=rng, total_rounds=n).ensure_round_returns(1)))
+        cases.append((f"ensure_round_returns_seeded/{n}", lambda n=n: GameState(seed=SEED, total_rounds=n).ensure_round_returns(1)))
+
+        game = _played_game(n)
+        returns = game.returns()
+        decisions = decisions_from_codes(game.decisions["choice"], game.decisions["leverage"])
+        cases.append((f"apply_benchmarks/{n}", lambda game=game: _apply_all_benchmarks(game)))
+        cases.append((f"compute_player_scores/{n}", lambda d=decisions, returns=returns: compute_player_scores(d, returns)))
+        cases.append((f"game_score/{n}", lambda game=game: game.score()))
+        cases.append((f"chart_frame/{n}", lambda game=game: chart_frame(game)))
+
+    for b in BATCHES:
+        rng = np.random.default_rng(SEED)
+        cases.append((f"simulate_paths/{b}x40", lambda b=b, rng=rng: simulate_paths(b, 40, rng=rng)))
+        cases.append((f"seeded_paths/{b}x40", lambda b=b: seeded_paths(np.arange(b), 40)))
+
+        paths = simulate_paths(b, 40, rng=np.random.default_rng(SEED))
+        choice_rng = np.random.default_rng(SEED)
+        choices = choice_rng.integers(len(CHOICES), size=(b, 39))
+        leverage = choice_rng.random((b, 39)) < 0.3
+        cases.append((f"compute_player_scores_batch/{b}x40",
+                      lambda c=choices, l=leverage, p=paths: compute_player_scores_batch(c, l, p)))
+
+    items = [
+        {"title": title, "value_num_str": fmt_pln_num(v), "delta_pct": (v / 10000.0 - 1) * 100}
+        for title, v in (("Twój Wynik", 12345.6), ("S&P 500", 11000.0), ("Złoto", 9800.0), ("Bitcoin", 15500.0))
+    ]
+    cases.append(("render_summary_cards", lambda: summary_cards_html(items)))
+    return cases
+
+# Mierzymy czas jednego wywołania: dobieramy liczbę powtórzeń do ~min_time i bierzemy medianę z prób
+def measure(fn, repeats: int, min_time: float) -> dict:
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if dt == 0 else max(2, min(10, int(min_time / dt) + 1))
+
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return {"median_s": statistics.median(times), "min_s": min(times), "number": number, "repeats": repeats}
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(filter_text=None, repeats: int = 5, min_time: float = 0.2) -> dict:
+    results = {}
+    for name, fn in build_cases():
+        if filter_text and filter_text not in name:
+            continue
+        results[name] = measure(fn, repeats, min_time)
+        print(f"{name:<42}{_fmt_time(results[name]['median_s']):>12}", file=sys.stderr)
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seed": SEED,
+        "results": results,
+    }
+
+def _fmt_time(s: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if s >= scale:
+            return f"{s / scale:.2f} {unit}"
+    return f"{s / 1e-9:.0f} ns"
+
+# Porównanie z poprzednim wynikiem po najlepszej próbie (min_s): szum systemu tylko wydłuża pomiar,
+# więc minimum jest stabilniejsze niż mediana. Zwraca nazwy przypadków wolniejszych niż próg.
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    print(f"\n{'przypadek':<42}{'bazowo':>12}{'teraz':>12}{'zmiana':>10}")
+    for name, res in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = res["min_s"] / base["min_s"]
+        flag = "  REGRESJA" if ratio > threshold else ""
+        print(f"{name:<42}{_fmt_time(base['min_s']):>12}{_fmt_time(res['min_s']):>12}{ratio:>9.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki symulacji zwrotów, oceny gracza i renderowania.")
+    parser.add_argument("--out", help="zapisz wyniki JSON do pliku")
+    parser.add_argument("--baseline", help="plik JSON z wcześniejszego uruchomienia do porównania")
+    parser.add_argument("--threshold", type=float, default=1.25, help="dopuszczalne spowolnienie względem bazowego (domyślnie 1.25x)")
+    parser.add_argument("--filter", help="uruchom tylko przypadki zawierające ten tekst")
+    parser.add_argument("--repeats", type=int, default=5, help="liczba prób na przypadek")
+    args = parser.parse_args(argv)
+
+    report = run(args.filter, repeats=args.repeats)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegresje powyżej {args.threshold:.2f}x: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
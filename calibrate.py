@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_engine import TOTAL_ROUNDS
+from returns_model import INSTRUMENTS, RISKY_KEYS, draw_shocks, paths_from_shocks
+
+# Kalibracja parametrów INSTRUMENTS do docelowych statystyk (roczny zwrot, zmienność, obsunięcie,
+# częstość dużych spadków, autokorelacja). Każdego kandydata oceniamy na tych samych wylosowanych
+# szokach (wspólne liczby losowe), więc różnice funkcji celu wynikają tylko z parametrów.
+# Optymalizator to metoda entropii krzyżowej: populacja kandydatów z rozkładu normalnego,
+# z którego po każdym pokoleniu zostaje średnia i rozrzut najlepszych. Pokolenie dzielimy między
+# procesy, a w procesie kandydaci są kolejnymi "instrumentami" jednego wywołania paths_from_shocks.
+
+# Parametry, które kalibrujemy, i ich dopuszczalne zakresy
+BOUNDS = {
+    "mean": (-0.05, 0.05),
+    "vol": (0.001, 0.30),
+    "crash_p": (0.0, 0.20),
+    "crash_mu": (-0.60, 0.0),
+    "crash_sigma": (0.001, 0.30),
+    "rally_p": (0.0, 0.20),
+    "rally_mu": (0.0, 0.60),
+    "rally_sigma": (0.001, 0.30),
+    "mom_strength": (0.0, 0.20),
+    "mom_cap": (0.0, 0.20),
+    "ret_floor": (-0.95, -0.01),
+    "ret_cap": (0.01, 2.0),
+}
+FIELDS = tuple(BOUNDS)
+
+# Statystyki liczone z symulacji; TARGET_SCALE to najmniejsza skala błędu względnego
+STATS = ("ann_return", "ann_vol", "max_drawdown", "tail_freq", "autocorr")
+TARGET_SCALE = {"ann_return": 0.02, "ann_vol": 0.02, "max_drawdown": 0.02, "tail_freq": 0.005, "autocorr": 0.02}
+
+# Duży spadek w rundzie (do tail_freq), jeśli cel nie podaje własnego progu
+DEFAULT_TAIL_THRESHOLD = -0.10
+PERIODS_PER_YEAR = 12
+
+# Ilu kandydatów liczymy w jednym wywołaniu symulacji (pamięć: ścieżki x rundy x kandydaci)
+CANDIDATES_PER_TASK = 8
+
+# Szoki wspólne dla wszystkich ocen w procesie roboczym
+_shocks = None
+
+def _init_worker(seed: int, n_paths: int, n_rounds: int):
+    global _shocks
+    rng = np.random.default_rng(seed)
+    _shocks = draw_shocks(rng, n_paths, n_rounds, 1)
+
+# Statystyki zwrotów (ścieżki x rundy x kandydaci) dla każdego kandydata.
+# Liczymy w układzie rundy x ścieżki x kandydaci, w jakim leży wynik paths_from_shocks.
+def path_stats(returns, tail_threshold) -> dict:
+    r = returns.transpose(1, 0, 2)
+    n_rounds = r.shape[0]
+    wealth = np.cumprod(1.0 + r, axis=0)
+    growth = wealth[-1] ** (PERIODS_PER_YEAR / n_rounds) - 1.0
+    peak = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=0)
+    drawdown = (1.0 - wealth / peak).max(axis=0)
+    dev = r - r.mean(axis=(0, 1))
+    var = (dev * dev).mean(axis=(0, 1))
+    autocorr = (dev[1:] * dev[:-1]).mean(axis=(0, 1)) / np.where(var > 0, var, np.inf)
+    return {
+        "ann_return": growth.mean(axis=0),
+        "ann_vol": np.sqrt(var * PERIODS_PER_YEAR),
+        "max_drawdown": drawdown.mean(axis=0),
+        "tail_freq": (r <= tail_threshold).mean(axis=(0, 1)),
+        "autocorr": autocorr,
+    }
+
+# Zwroty kandydatów (macierz kandydaci x FIELDS) na wspólnych szokach procesu
+def simulate_candidates(candidates):
+    u, z = _shocks
+    k = len(candidates)
+    params = {f: candidates[:, j] for j, f in enumerate(FIELDS)}
+    shape = (u.shape[0], u.shape[1], k)
+    return paths_from_shocks(np.broadcast_to(u, shape), np.broadcast_to(z, shape), params=params)
+
+def evaluate(candidates, tail_threshold: float) -> dict:
+    return path_stats(simulate_candidates(np.asarray(candidates)), tail_threshold)
+
+# Błąd dopasowania: suma kwadratów błędów względnych (z wagami) po statystykach z celu
+def loss(stats: dict, targets: dict, weights: dict) -> np.ndarray:
+    total = 0.0
+    for name in STATS:
+        if name not in targets:
+            continue
+        scale = max(abs(targets[name]), TARGET_SCALE[name])
+        total = total + weights.get(name, 1.0) * ((stats[name] - targets[name]) / scale) ** 2
+    return total
+
+# Kandydaci muszą dać poprawny model: parametry w zakresach BOUNDS (więc ret_floor < 0 < ret_cap),
+# prawdopodobieństwa skoków razem najwyżej 0.5, a mom_cap nie większy niż mom_strength.
+# Przesunięcie trendu nie przekracza mom_strength, więc wyższy mom_cap niczego nie zmienia w zwrotach;
+# przycięcie daje te same ścieżki, a optymalizator nie błądzi po płaskim kierunku funkcji celu.
+def repair(x, fit_mask, start):
+    x = np.where(fit_mask, x, start)
+    lo = np.array([BOUNDS[f][0] for f in FIELDS])
+    hi = np.array([BOUNDS[f][1] for f in FIELDS])
+    x = np.clip(x, lo, hi)
+    jp = x[:, FIELDS.index("crash_p")] + x[:, FIELDS.index("rally_p")]
+    over = jp > 0.5
+    x[over, FIELDS.index("crash_p")] *= 0.5 / jp[over]
+    x[over, FIELDS.index("rally_p")] *= 0.5 / jp[over]
+    mom_cap = FIELDS.index("mom_cap")
+    x[:, mom_cap] = np.minimum(x[:, mom_cap], x[:, FIELDS.index("mom_strength")])
+    return x
+
+def _params_vector(key: str) -> np.ndarray:
+    return np.array([INSTRUMENTS[key][f] for f in FIELDS], dtype=np.float64)
+
+# Metoda entropii krzyżowej dla jednego instrumentu
+def calibrate_instrument(pool, key: str, targets: dict, fit, population: int, iterations: int,
+                         elite_frac: float, rng, weights=None, log=print) -> dict:
+    weights = weights or {}
+    tail = targets.get("tail_threshold", DEFAULT_TAIL_THRESHOLD)
+    start = _params_vector(key)
+    fit_mask = np.array([f in fit for f in FIELDS])
+    width = np.array([BOUNDS[f][1] - BOUNDS[f][0] for f in FIELDS])
+    mean = start.copy()
+    std = np.where(fit_mask, np.maximum(0.25 * np.abs(start), 0.05 * width), 0.0)
+    n_elite = max(2, int(population * elite_frac))
+
+    def score(cands):
+        chunks = [cands[i:i + CANDIDATES_PER_TASK] for i in range(0, len(cands), CANDIDATES_PER_TASK)]
+        parts = list(pool.map(evaluate, chunks, [tail] * len(chunks)))
+        stats = {s: np.concatenate([p[s] for p in parts]) for s in STATS}
+        return stats, loss(stats, targets, weights)
+
+    best_x, best_loss, best_stats = start, float(score(start[None])[1][0]), None
+    for it in range(iterations):
+        cands = repair(mean + std * rng.standard_normal((population, len(FIELDS))), fit_mask, start)
+        cands[0] = best_x
+        stats, losses = score(cands)
+        order = np.argsort(losses)
+        elite = cands[order[:n_elite]]
+        if losses[order[0]] <= best_loss:
+            best_x, best_loss = cands[order[0]].copy(), float(losses[order[0]])
+            best_stats = {s: float(stats[s][order[0]]) for s in STATS}
+        # Wygładzamy aktualizację, żeby rozrzut nie zapadał się po kilku pokoleniach
+        mean = 0.7 * elite.mean(axis=0) + 0.3 * mean
+        std = 0.7 * elite.std(axis=0) + 0.3 * std
+        log(f"{key}: pokolenie {it + 1}/{iterations}, najlepszy błąd {best_loss:.5f}")
+
+    if best_stats is None:
+        stats, _ = score(best_x[None])
+        best_stats = {s: float(stats[s][0]) for s in STATS}
+    return {
+        "params": {f: float(v) for f, v in zip(FIELDS, best_x)},
+        "stats": best_stats,
+        "targets": targets,
+        "loss": best_loss,
+    }
+
+# Statystyki obecnych parametrów w formacie pliku z celami (dobry punkt wyjścia do edycji)
+def current_stats(pool, keys=RISKY_KEYS) -> dict:
+    out = {}
+    for key in keys:
+        stats = pool.submit(evaluate, _params_vector(key)[None], DEFAULT_TAIL_THRESHOLD).result()
+        out[key] = {s: round(float(stats[s][0]), 4) for s in STATS}
+        out[key]["tail_threshold"] = DEFAULT_TAIL_THRESHOLD
+    return out
+
+def run_calibration(targets: dict, fit=FIELDS, n_paths: int = 20_000, n_rounds: int = TOTAL_ROUNDS,
+                    population: int = 64, iterations: int = 30, elite_frac: float = 0.2, seed: int = 0,
+                    workers=None, log=print) -> dict:
+    rng = np.random.default_rng(seed)
+    result = {"seed": seed, "paths": n_paths, "rounds": n_rounds, "instruments": {}}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(seed, n_paths, n_rounds)) as pool:
+        for key in RISKY_KEYS:
+            if key not in targets:
+                continue
+            t0 = time.perf_counter()
+            result["instruments"][key] = calibrate_instrument(
+                pool, key, targets[key], fit, population, iterations, elite_frac, rng,
+                weights=targets[key].get("weights"), log=log)
+            result["instruments"][key]["seconds"] = round(time.perf_counter() - t0, 2)
+    return result
+
+# Nowy zestaw parametrów w formacie INSTRUMENTS (nieskalibrowane instrumenty bez zmian)
+def calibrated_instruments(result: dict) -> dict:
+    out = {k: dict(v) for k, v in INSTRUMENTS.items()}
+    for key, r in result["instruments"].items():
+        out[key].update(r["params"])
+    return out
+
+def print_report(result: dict):
+    for key, r in result["instruments"].items():
+        print(f"\n{INSTRUMENTS[key]['label']} ({key}), błąd {r['loss']:.5f}, {r['seconds']} s")
+        print(f"{'statystyka':<14}{'cel':>10}{'wynik':>10}")
+        for s in STATS:
+            target = r["targets"].get(s)
+            print(f"{s:<14}{'-' if target is None else f'{target:.4f}':>10}{r['stats'][s]:>10.4f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kalibracja parametrów INSTRUMENTS do docelowych statystyk.")
+    parser.add_argument("targets", nargs="?", help="plik JSON z celami dla instrumentów (klucze z zestawu instrumentów)")
+    parser.add_argument("--current", action="store_true", help="wypisz statystyki obecnych parametrów jako plik celów")
+    parser.add_argument("--out", help="zapisz nowe parametry (format INSTRUMENTS) do pliku JSON")
+    parser.add_argument("--report", help="zapisz pełny raport kalibracji do pliku JSON")
+    parser.add_argument("--fit", nargs="+", choices=FIELDS, default=list(FIELDS), help="kalibrowane parametry")
+    parser.add_argument("--paths", type=int, default=20_000, help="ścieżek na ocenę (domyślnie 20 000)")
+    parser.add_argument("--rounds", type=int, default=TOTAL_ROUNDS, help="rund na ścieżkę")
+    parser.add_argument("--population", type=int, default=64, help="kandydatów w pokoleniu")
+    parser.add_argument("--iterations", type=int, default=30, help="liczba pokoleń")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno szoków i optymalizatora")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="liczba procesów")
+    args = parser.parse_args(argv)
+
+    if args.current:
+        with ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                 initargs=(args.seed, args.paths, args.rounds)) as pool:
+            print(json.dumps(current_stats(pool), indent=2))
+        return
+    if not args.targets:
+        parser.error("podaj plik z celami albo --current")
+
+    with open(args.targets, encoding="utf-8") as f:
+        targets = json.load(f)
+    result = run_calibration(targets, fit=args.fit, n_paths=args.paths, n_rounds=args.rounds,
+                             population=args.population, iterations=args.iterations, seed=args.seed,
+                             workers=args.workers)
+    print_report(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(calibrated_instruments(result), f, indent=2, ensure_ascii=False)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# Moduły aplikacji leżą w katalogu głównym repozytorium; ten plik sprawia, że pytest dodaje go do sys.path
+# (także przy uruchomieniu samego "pytest", bez "python -m pytest").
@@ -0,0 +1,230 @@
+import argparse
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+
+import numpy as np
+
+from game_engine import CHOICE_CODE, CHOICES, INSTRUMENT_SET, LEGACY_INSTRUMENT_SET
+
+# Dziennik wszystkich decyzji graczy: plik binarny tylko do dopisywania, rekordy stałej długości.
+# Rekord to 30 bajtów (sesja, runda, kod instrumentu, dźwignia, zwrot, kapitał) i udziały wszystkich
+# wyborów (4 bajty na wybór; w grze jednym instrumentem 1 przy wybranym), więc miliony
+# decyzji zajmują dziesiątki MB i czyta się je jako tablicę NumPy, bez JSON i pandas.
+# Sesje wrzucają decyzje do kolejki; wątek w tle dopisuje je paczkami i robi jeden fsync na paczkę.
+# Dziennik jest opcjonalny: INVESTMENT_GAME_DECISION_LOG wskazuje plik; bez tej zmiennej (albo z "0")
+# aplikacja niczego nie zapisuje.
+
+LOG_ENV = "INVESTMENT_GAME_DECISION_LOG"
+
+# Domyślny plik dziennika dla narzędzi czytających (main)
+DEFAULT_LOG = "decisions.bin"
+
+# Układ rekordu na dysku: bez wyrównania i zawsze little-endian, niezależnie od maszyny
+_BASE_FIELDS = [
+    ("session", "<u8"),
+    ("round", "<i4"),
+    ("choice", "i1"),
+    ("leverage", "?"),
+    ("return", "<f8"),
+    ("capital", "<f8"),
+]
+LOG_DTYPE = np.dtype(_BASE_FIELDS + [("weights", "<f4", (len(CHOICES),))])
+
+# Rekord pierwszej wersji dziennika (bez udziałów)
+LEGACY_LOG_DTYPE = np.dtype(_BASE_FIELDS)
+
+def _itemsize(dtype) -> bytes:
+    return np.uint64(dtype.itemsize).astype("<u8").tobytes()
+
+# Nagłówek pliku: znacznik formatu, długość rekordu i odcisk zestawu instrumentów (8 + 8 + 16 bajtów);
+# kody wyborów znaczą co innego w innym zestawie, więc dziennika z innego zestawu nie czytamy ani nie dopisujemy
+MAGIC = b"IGDLOG\x00\x03"
+
+def instrument_set_digest(instruments: str) -> bytes:
+    return hashlib.blake2b(instruments.encode(), digest_size=16).digest()
+
+HEADER = MAGIC + _itemsize(LOG_DTYPE) + instrument_set_digest(INSTRUMENT_SET)
+
+# Nagłówek pierwszej wersji (bez odcisku i udziałów): takie dzienniki zapisywano w domyślnym zestawie
+# instrumentów; otwieramy je dalej i dopisujemy rekordy w ich formacie
+LEGACY_HEADER = b"IGDLOG\x00\x01" + _itemsize(LEGACY_LOG_DTYPE)
+
+# Paczka zapisu: najwyżej tyle decyzji, zbieranych najwyżej tyle sekund od pierwszej
+BATCH_SIZE = 4096
+BATCH_WAIT = 0.5
+
+QUEUE_LIMIT = 100_000
+
+# Domyślna liczba rekordów w porcji czytanej przez iter_chunks (~30 MB)
+CHUNK_RECORDS = 1 << 20
+
+logger = logging.getLogger("investment_game.decision_log")
+
+# Plik dziennika z konfiguracji albo None, gdy dziennik jest wyłączony (zmienna nieustawiona, pusta albo "0")
+def configured_log_path():
+    path = os.environ.get(LOG_ENV, "")
+    return None if path in ("", "0") else path
+
+# Identyfikator sesji w dzienniku (osobny dla każdej rozpoczętej gry)
+def new_session_id() -> int:
+    return secrets.randbits(63)
+
+# Sprawdzamy nagłówek otwartego pliku; zwracamy jego długość (początek rekordów) i układ rekordu
+def _read_header(f, path: str):
+    head = f.read(len(HEADER))
+    if head == HEADER:
+        return len(HEADER), LOG_DTYPE
+    if head[:len(LEGACY_HEADER)] == LEGACY_HEADER and INSTRUMENT_SET == LEGACY_INSTRUMENT_SET:
+        return len(LEGACY_HEADER), LEGACY_LOG_DTYPE
+    if head[:len(MAGIC)] == MAGIC or head[:len(LEGACY_HEADER)] == LEGACY_HEADER:
+        raise ValueError(f"{path} zapisano w innym zestawie instrumentów niż obecny ({INSTRUMENT_SET}).")
+    raise ValueError(f"{path} nie jest dziennikiem decyzji w tym formacie.")
+
+# Liczba pełnych rekordów w pliku; niedopisany koniec (np. po awarii) pomijamy
+def _record_count(path: str, header_len: int, dtype) -> int:
+    return max(0, (os.path.getsize(path) - header_len) // dtype.itemsize)
+
+# Udziały wyborów decyzji: z trybu portfela albo 1 przy wybranym instrumencie
+def decision_weights(decision: dict) -> np.ndarray:
+    weights = decision.get("weights")
+    if weights is None:
+        weights = np.zeros(len(CHOICES))
+        weights[CHOICE_CODE[decision["choice"]]] = 1.0
+    return weights
+
+class DecisionLog:
+    def __init__(self, path: str):
+        self.path = path
+        # Tryb "ab" dopisuje każdą paczkę na koniec pliku (O_APPEND), także przy kilku procesach
+        self._file = open(path, "ab")
+        size = self._file.tell()
+        self._dtype = LOG_DTYPE
+        if size == 0:
+            self._file.write(HEADER)
+            self._file.flush()
+        else:
+            with open(path, "rb") as f:
+                header_len, self._dtype = _read_header(f, path)
+            # Ucięty ostatni rekord przesunąłby wszystkie kolejne, więc go obcinamy
+            torn = (size - header_len) % self._dtype.itemsize
+            if torn:
+                self._file.truncate(size - torn)
+
+        self._queue = queue.Queue(maxsize=QUEUE_LIMIT)
+        self._writer = threading.Thread(target=self._write_loop, name="decision-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # Decyzja w formacie zwracanym przez GameState.step
+    def append(self, session: int, decision: dict) -> bool:
+        record = (session, decision["round"], CHOICE_CODE[decision["choice"]], decision["leverage"],
+                  decision["return"], decision["capital"])
+        if self._dtype is LOG_DTYPE:
+            record += (decision_weights(decision),)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("Kolejka dziennika decyzji jest pełna, pomijamy decyzję.")
+            return False
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_WAIT
+        while batch[-1] is not None and len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                records = [r for r in batch if r is not None]
+                if records:
+                    try:
+                        self._file.write(np.array(records, dtype=self._dtype).tobytes())
+                        self._file.flush()
+                        os.fsync(self._file.fileno())
+                    except OSError:
+                        logger.exception("Nie udało się dopisać %d decyzji do dziennika.", len(records))
+                for _ in batch:
+                    self._queue.task_done()
+                if batch[-1] is None:
+                    return
+        finally:
+            self._file.close()
+
+    # Czekamy, aż wszystkie wysłane dotąd decyzje będą na dysku
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join()
+
+# Cały dziennik jako tablica rekordów mapowana z pliku (tylko do odczytu, bez wczytywania do pamięci);
+# dziennik pierwszej wersji ma rekordy LEGACY_LOG_DTYPE, bez pola weights
+def open_log(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        header_len, dtype = _read_header(f, path)
+    n = _record_count(path, header_len, dtype)
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=header_len, shape=(n,))
+
+# Dziennik porcjami po chunk_records rekordów; pamięć nie zależy od rozmiaru pliku.
+# Czytamy rekordy zapisane do chwili wywołania, także gdy aplikacja dalej dopisuje.
+def iter_chunks(path: str, chunk_records: int = CHUNK_RECORDS):
+    with open(path, "rb") as f:
+        header_len, dtype = _read_header(f, path)
+        f.seek(header_len)
+        n = _record_count(path, header_len, dtype)
+        while n > 0:
+            count = min(chunk_records, n)
+            chunk = np.fromfile(f, dtype=dtype, count=count)
+            if len(chunk) == 0:
+                return
+            n -= len(chunk)
+            yield chunk
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Podsumowanie dziennika decyzji.")
+    parser.add_argument("path", nargs="?", default=configured_log_path() or DEFAULT_LOG, help="plik dziennika")
+    parser.add_argument("--chunk", type=int, default=CHUNK_RECORDS, help="rekordów w porcji")
+    args = parser.parse_args(argv)
+
+    total = 0
+    leverage = 0
+    itemsize = LOG_DTYPE.itemsize
+    # Udziały wyborów liczymy z udziałów kapitału (portfele), a w dzienniku bez nich z kodów instrumentów
+    counts = np.zeros(len(CHOICES))
+    for chunk in iter_chunks(args.path, args.chunk):
+        itemsize = chunk.dtype.itemsize
+        total += len(chunk)
+        leverage += int(np.count_nonzero(chunk["leverage"]))
+        if "weights" in chunk.dtype.names:
+            counts += chunk["weights"].sum(axis=0, dtype=np.float64)
+        else:
+            counts += np.bincount(chunk["choice"], minlength=len(CHOICES))
+
+    print(f"{args.path}: {total} decyzji, {os.path.getsize(args.path)} B ({itemsize} B na decyzję)")
+    if total:
+        shares = ", ".join(f"{k} {c / total:.1%}" for k, c in zip(CHOICES, counts))
+        print(f"wybory: {shares}; dźwignia: {leverage / total:.1%}")
+
+if __name__ == "__main__":
+    main()
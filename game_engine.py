@@ -0,0 +1,452 @@
+import numpy as np
+
+from returns_model import CASH_KEY, INSTRUMENTS, RISKY_KEYS, clamp, simulate_paths
+from rng_streams import seeded_path
+
+# Liczba rund w grze
+TOTAL_ROUNDS = 40
+
+# Kapitał startowy gracza i benchmarków
+START_CAPITAL = 10000.0
+
+# Od tej rundy (liczonej od zera) gracz może użyć dźwigni
+LEVERAGE_FROM_ROUND = 20
+
+# Dźwignia x2 i widełki zwrotu z dźwignią dla instrumentów ryzykownych
+LEVERAGE_MULT = 2
+LEVERAGE_CLAMPS = {k: INSTRUMENTS[k]["leverage_cap"] for k in RISKY_KEYS if INSTRUMENTS[k]["leverage_cap"] is not None}
+
+# Dozwolone decyzje gracza: instrumenty z zestawu, gotówka na końcu
+CHOICES = RISKY_KEYS + (CASH_KEY,)
+
+# Zestaw instrumentów jako klucze w kolejności kodów decyzji; zapisujemy go z wynikami gier i w dzienniku,
+# bo kody wyborów i kolumny zwrotów znaczą co innego po zmianie instruments.json
+INSTRUMENT_SET = ",".join(CHOICES)
+
+# Zestaw, w którym zapisywano wyniki i dziennik, zanim trafiły do nich klucze instrumentów
+LEGACY_INSTRUMENT_SET = "SP500,GOLD,BTC,CASH"
+
+# Pozycja instrumentu na osi "instrument" ścieżki zwrotów
+INSTR_INDEX = {k: i for i, k in enumerate(RISKY_KEYS)}
+
+# Kolumna kapitału gracza w buforze historii (po kolumnach benchmarków, w kolejności INSTR_INDEX)
+USER_COL = len(RISKY_KEYS)
+
+# Rekord decyzji w GameState.decisions (22 bajty zamiast słownika ~280 B); choice to kod z CHOICES
+DECISION_DTYPE = np.dtype([
+    ("round", np.int32),
+    ("choice", np.int8),
+    ("leverage", np.bool_),
+    ("return", np.float64),
+    ("capital", np.float64),
+])
+
+# Kody decyzji (indeksy w CHOICES) i widełki dźwigni w tej samej kolejności, do obliczeń wsadowych
+CHOICE_CODE = {k: i for i, k in enumerate(CHOICES)}
+CASH_CODE = CHOICE_CODE[CASH_KEY]
+LEVERAGE_CAP_BY_CODE = np.array([LEVERAGE_CLAMPS.get(k, np.inf) for k in CHOICES])
+
+# Zwrot z dźwignią nie spada poniżej -100% (pozycja traci najwyżej cały kapitał), także dla instrumentów
+# bez widełek leverage_cap albo z widełkami szerszymi niż 100%
+LEVERAGED_LOSS_LIMIT = 1.0
+LEVERAGE_FLOOR_BY_CODE = -np.minimum(LEVERAGE_CAP_BY_CODE, LEVERAGED_LOSS_LIMIT)
+
+# Instrumenty spekulacyjne (parametr oceny "speculative")
+SPECULATIVE_KEYS = tuple(k for k in RISKY_KEYS if INSTRUMENTS[k]["speculative"])
+
+# Tryb portfela: koszt przebudowy jako ułamek obrotu (suma zmian udziałów), domyślnie 0,1%
+REBALANCE_COST = 0.001
+
+# Portfel przed pierwszą rundą: cały kapitał w gotówce
+CASH_WEIGHTS = np.eye(len(CHOICES))[CASH_CODE]
+
+# Notatki oceny wymieniają udziały wszystkich wyborów (krótkie etykiety, od najbardziej ryzykownego według
+# risk_weight), a gdy wyborów jest więcej niż NOTES_TOP_CHOICES, tylko najczęstsze
+NOTES_TOP_CHOICES = 6
+NOTES_ORDER = tuple(sorted(CHOICES, key=lambda k: -INSTRUMENTS[k]["risk_weight"]))
+
+# Do tylu benchmarków wartości liczymy na floatach Pythona; większy zestaw mnożymy jedną operacją NumPy
+PY_BENCHMARK_LIMIT = 8
+
+# Zwrot z dźwignią: podwajamy wynik i przycinamy go do widełek instrumentu, a stratę do -100%
+def leveraged_return(choice: str, ret: float) -> float:
+    ret *= LEVERAGE_MULT
+    if choice in LEVERAGE_CLAMPS:
+        cap = LEVERAGE_CLAMPS[choice]
+        ret = clamp(ret, -cap, cap)
+    return max(ret, -LEVERAGED_LOSS_LIMIT)
+
+# Wersja wsadowa step(): zwroty gracza dla wielu gier naraz.
+# round_returns (... x instrumenty), choices i leverage (...) o tym samym kształcie wiodącym;
+# dostępność dźwigni w danej rundzie sprawdza wywołujący.
+def choice_returns(round_returns, choices, leverage):
+    choices = np.asarray(choices)
+    ext = np.concatenate([round_returns, np.zeros(round_returns.shape[:-1] + (1,))], axis=-1)
+    ret = np.take_along_axis(ext, choices[..., None], axis=-1)[..., 0]
+    lev = np.clip(ret * LEVERAGE_MULT, LEVERAGE_FLOOR_BY_CODE[choices], LEVERAGE_CAP_BY_CODE[choices])
+    return np.where(leverage, lev, ret)
+
+# Zwroty wszystkich pozycji portfela (... x wybory, gotówka w ostatniej kolumnie ze zwrotem 0);
+# z dźwignią każdy instrument ma zwrot x2 przycięty do swoich widełek, jak w choice_returns
+def instrument_returns(round_returns, leverage):
+    ext = np.concatenate([round_returns, np.zeros(np.shape(round_returns)[:-1] + (1,))], axis=-1)
+    lev = np.clip(ext * LEVERAGE_MULT, LEVERAGE_FLOOR_BY_CODE, LEVERAGE_CAP_BY_CODE)
+    return np.where(np.asarray(leverage)[..., None], lev, ext)
+
+# Udziały po rundzie bez przebudowy: każda pozycja rośnie (albo spada) razem ze swoim zwrotem.
+# Portfel, który stracił całą wartość (zwroty z dźwignią do -100%), liczymy dalej jak samą gotówkę.
+def drifted_weights(weights, inst_returns):
+    grown = weights * (1 + inst_returns)
+    total = grown.sum(axis=-1, keepdims=True)
+    alive = total > 0
+    return np.where(alive, grown / np.where(alive, total, 1.0), CASH_WEIGHTS)
+
+# Runda w trybie portfela dla wielu gier naraz: przebudowa z udziałów held do weights kosztuje cost od obrotu,
+# potem kapitał rośnie o iloczyn skalarny udziałów i zwrotów. Zwraca mnożnik kapitału i udziały po rundzie.
+def portfolio_growth(round_returns, weights, leverage, held, cost: float = REBALANCE_COST):
+    inst = instrument_returns(round_returns, leverage)
+    turnover = np.abs(weights - held).sum(axis=-1)
+    growth = (1 - cost * turnover) * (1 + (weights * inst).sum(axis=-1))
+    return growth, drifted_weights(weights, inst)
+
+# Udziały z dowolnych nieujemnych liczb (np. procentów z suwaków), znormalizowane do sumy 1
+def normalize_weights(raw) -> np.ndarray:
+    w = np.asarray(raw, dtype=np.float64)
+    if w.shape != (len(CHOICES),) or not np.all(np.isfinite(w)) or np.any(w < 0):
+        raise ValueError(f"Udziały portfela to {len(CHOICES)} nieujemnych liczb.")
+    total = w.sum()
+    return CASH_WEIGHTS.copy() if total == 0 else w / total
+
+# Decyzje z tablic kodów w formacie GameState.decisions (potrzebnym m.in. do compute_player_scores)
+def decisions_from_codes(choices, leverage) -> list:
+    return [
+        {"round": t + 1, "choice": CHOICES[c], "leverage": bool(lev)}
+        for t, (c, lev) in enumerate(zip(choices, leverage))
+    ]
+
+# Liczymy ocenę gracza na podstawie historii decyzji i zwrotów instrumentów.
+# Wagi, kary i premie zależne od instrumentu bierzemy z zestawu instrumentów (SCORE_DEFAULTS).
+def compute_player_scores(decisions, returns):
+    if not decisions:
+        return {"risk": 0, "rationality": 0, "notes": ["Brak decyzji do oceny."]}
+
+    n = len(decisions)
+    counts = {k: 0 for k in CHOICES}
+    lev_count = 0
+    switches = 0
+
+    prev_choice = None
+    for d in decisions:
+        ch = d["choice"]
+        counts[ch] += 1
+        if d.get("leverage"):
+            lev_count += 1
+        if prev_choice is not None and ch != prev_choice:
+            switches += 1
+        prev_choice = ch
+
+    share = {k: counts[k] / n for k in counts}
+    share_lev = lev_count / n
+    switch_rate = switches / max(1, (n - 1))
+
+    concentration = sum(v**2 for v in share.values())
+
+    risk_raw = sum(INSTRUMENTS[k]["risk_weight"] * share[k] for k in RISKY_KEYS)
+    risk_raw += 0.75 * share_lev
+    risk_raw += 0.25 * concentration
+    risk_raw += INSTRUMENTS[CASH_KEY]["risk_weight"] * share[CASH_KEY]
+    risk = int(max(0, min(100, round(50 + 70 * risk_raw))))
+
+    penalties = 0.0
+    bonuses = 0.0
+
+    def neg_streak(series, upto_index_exclusive, window=3):
+        start = max(0, upto_index_exclusive - window)
+        ctx = series[start:upto_index_exclusive]
+        s = 0
+        for x in reversed(ctx):
+            if x < 0:
+                s += 1
+            else:
+                break
+        return s
+
+    def big_up(series, upto_index_exclusive, threshold=0.08):
+        if upto_index_exclusive - 1 < 0 or upto_index_exclusive - 1 >= len(series):
+            return False
+        return series[upto_index_exclusive - 1] >= threshold
+
+    # Seria spadków instrumentów spekulacyjnych (najdłuższa z nich) przed rundą
+    def speculative_streak(upto_index_exclusive):
+        return max((neg_streak(returns.get(k, []), upto_index_exclusive, window=3) for k in SPECULATIVE_KEYS),
+                   default=0)
+
+    for d in decisions:
+        r = d["round"]
+        ch = d["choice"]
+        lev = d.get("leverage", False)
+
+        if ch == CASH_KEY:
+            if speculative_streak(r - 1) >= 2:
+                bonuses += 0.35
+            continue
+
+        spec = INSTRUMENTS[ch]
+        series = returns.get(ch, [])
+
+        ns = neg_streak(series, r - 1, window=3)
+        if ns >= 2:
+            penalties += spec["streak_mult"] * (ns - 1)
+
+        if lev:
+            last2_start = max(0, (r - 1) - 2)
+            last2 = series[last2_start:(r - 1)]
+            if len(last2) == 2 and all(x < 0 for x in last2):
+                penalties += spec["lev_drop_penalty"]
+
+        if big_up(series, r - 1, threshold=spec["big_up_threshold"]):
+            penalties += spec["big_up_penalty"]
+
+        if not spec["speculative"] and speculative_streak(r - 1) >= 2:
+            bonuses += 0.25
+
+        if (not lev) and ns >= 2:
+            bonuses += 0.12
+
+    if switch_rate > 0.55:
+        penalties += (switch_rate - 0.55) * 3.0
+
+    if concentration > 0.55 and sum(share[k] for k in SPECULATIVE_KEYS) > 0.5:
+        penalties += 1.0
+
+    rationality = 85.0 - 6.5 * penalties + 3.0 * bonuses
+    if risk > 80:
+        rationality -= (risk - 80) * 0.25
+
+    rationality = int(max(0, min(100, round(rationality))))
+
+    notes = score_notes(share, share_lev, switch_rate, concentration)
+    return {"risk": risk, "rationality": rationality, "notes": notes}
+
+# Opis statystyk stojących za oceną (wspólny dla wersji pojedynczej i wsadowej);
+# przy dużym zestawie instrumentów wymieniamy tylko najczęstsze wybory
+def score_notes(share: dict, share_lev: float, switch_rate: float, concentration: float) -> list:
+    if len(CHOICES) <= NOTES_TOP_CHOICES:
+        parts = [f"{INSTRUMENTS[k]['short_label']} {share[k]:.0%}" for k in NOTES_ORDER]
+    else:
+        top = sorted((k for k in CHOICES if share[k] > 0), key=lambda k: -share[k])
+        parts = [f"{INSTRUMENTS[k]['short_label']} {share[k]:.0%}" for k in top[:NOTES_TOP_CHOICES]]
+        if len(top) > NOTES_TOP_CHOICES:
+            parts.append(f"pozostałe {sum(share[k] for k in top[NOTES_TOP_CHOICES:]):.0%}")
+    return [
+        f"Udział wyborów: {', '.join(parts)}.",
+        f"Lewar użyty w {share_lev:.0%} rund.",
+        f"Częstotliwość zmian instrumentu: {switch_rate:.0%} (im wyżej, tym większe ryzyko overtradingu).",
+        f"Koncentracja portfela: {concentration:.2f} (im wyżej, tym mniej dywersyfikacji).",
+    ]
+
+# Stan jednej gry, niezależny od Streamlit: strony aplikacji tylko go wyświetlają,
+# a boty i zadania wsadowe wywołują step() bezpośrednio.
+# path (rundy x instrumenty) pozwala podać gotową ścieżkę zwrotów, np. z simulate_paths
+# albo wiersz banku scenariuszy; tablica nie jest kopiowana, runda gry służy za kursor.
+# seed wyznacza ścieżkę w całości (rng_streams), więc taką grę można powtórzyć,
+# a jej ścieżkę zwolnić i odtworzyć w dowolnym momencie.
+# params (returns_model.scaled_params) i leverage_from pozwalają grać innym horyzontem niż 40 miesięcy.
+# portfolio=True włącza tryb portfela (step_portfolio): udziały każdej rundy trzymamy w tablicy weights,
+# a w decisions zapisujemy pozycję o największym udziale. Dziennik, pokoje, baza wyników i analizy
+# korzystają z weights (choice portfela to tylko skrót do tabel i wykresów).
+# Obiekt żyje w stanie każdej sesji, więc dane gry trzymamy w tablicach alokowanych raz na grę, a atrybuty w __slots__.
+class GameState:
+    __slots__ = ("total_rounds", "start_capital", "leverage_from", "params", "rng", "path", "scenario", "seed",
+                 "round", "capital", "history", "_decisions", "_weights", "rebalance_cost")
+
+    def __init__(self, path=None, rng=None, total_rounds: int = TOTAL_ROUNDS, start_capital: float = START_CAPITAL,
+                 scenario=None, seed=None, params=None, leverage_from: int = LEVERAGE_FROM_ROUND,
+                 portfolio: bool = False, rebalance_cost: float = REBALANCE_COST):
+        self.total_rounds = total_rounds
+        self.start_capital = start_capital
+        self.leverage_from = leverage_from
+        self.params = params
+        self.rng = rng
+        self.path = None if path is None else np.asarray(path)
+        self.scenario = scenario
+        self.seed = seed
+
+        self.round = 0
+        self.capital = start_capital
+        # Historia wartości (rundy x [benchmarki..., gracz]) alokowana raz na całą grę;
+        # runda dopisuje jeden wiersz, a przyszłe rundy to NaN (wykres ma stałą oś)
+        self.history = np.full((total_rounds, USER_COL + 1), np.nan)
+        self.history[0] = start_capital
+        self._decisions = np.zeros(max(0, total_rounds - 1), dtype=DECISION_DTYPE)
+        self._weights = np.zeros((max(0, total_rounds - 1), len(CHOICES))) if portfolio else None
+        self.rebalance_cost = rebalance_cost
+
+    # Rozegrana część historii: widoki na bufor, bez kopiowania
+    @property
+    def history_user(self) -> np.ndarray:
+        return self.history[:self.round + 1, USER_COL]
+
+    @property
+    def hist(self) -> dict:
+        played = self.history[:self.round + 1]
+        return {k: played[:, i] for k, i in INSTR_INDEX.items()}
+
+    # Podjęte decyzje jako tablica rekordów DECISION_DTYPE (widok, bez kopiowania)
+    @property
+    def decisions(self) -> np.ndarray:
+        return self._decisions[:self.round]
+
+    @property
+    def portfolio(self) -> bool:
+        return self._weights is not None
+
+    # Udziały portfela w podjętych decyzjach (rundy x wybory), widok; None poza trybem portfela
+    @property
+    def weights(self):
+        return None if self._weights is None else self._weights[:self.round]
+
+    # Gra kończy się, gdy wykres ma komplet total_rounds punktów
+    @property
+    def finished(self) -> bool:
+        return self.round >= self.total_rounds - 1
+
+    @property
+    def leverage_available(self) -> bool:
+        return self.round >= self.leverage_from
+
+    # Zapewniamy, że zwroty na kolejne rundy są już wylosowane; brakujący odcinek
+    # (do końca gry) losujemy naraz, kontynuując pamięć trendu od dotychczasowych zwrotów
+    def ensure_round_returns(self, next_round_index: int):
+        have = 0 if self.path is None else len(self.path)
+        if have >= next_round_index:
+            return
+
+        if self.seed is not None:
+            self.path = seeded_path(self.seed, max(next_round_index, self.total_rounds), params=self.params)
+            return
+
+        n_new = max(next_round_index, self.total_rounds) - have
+        block = simulate_paths(1, n_new, rng=self.rng, history=self.path, params=self.params)[0]
+        self.path = block if self.path is None else np.concatenate([self.path, block])
+
+    # Aktualizujemy wyniki benchmarków na podstawie wylosowanych zwrotów
+    def apply_benchmarks(self, next_round_index: int, row=None):
+        if row is None:
+            row = self.path[next_round_index - 1].tolist()
+        self.history[next_round_index, :USER_COL] = self._benchmark_values(next_round_index, row)
+
+    # Przy kilku liczbach działania na floatach Pythona są tańsze niż operacje NumPy
+    def _benchmark_values(self, next_round_index: int, row) -> list:
+        prev = self.history[next_round_index - 1, :USER_COL]
+        if USER_COL > PY_BENCHMARK_LIMIT:
+            return (prev * (1 + np.asarray(row))).tolist()
+        return [v * (1 + r) for v, r in zip(prev.tolist(), row)]
+
+    # Rozgrywamy jedną rundę: gracz wybiera instrument i (od rundy 20) dźwignię
+    def step(self, choice: str, leverage: bool = False) -> dict:
+        if choice not in CHOICES:
+            raise ValueError(f"Nieznany instrument: {choice!r}")
+        if self.round >= self.total_rounds - 1:
+            raise ValueError("Gra jest już zakończona.")
+
+        if self._weights is not None:
+            # W trybie portfela wybór jednego instrumentu to portfel z jedną pozycją
+            return self.step_portfolio(np.eye(len(CHOICES))[CHOICE_CODE[choice]], leverage)
+
+        leverage = bool(leverage) and self.round >= self.leverage_from
+        next_round = self.round + 1
+        if self.path is None or next_round > len(self.path):
+            self.ensure_round_returns(next_round)
+        row = self.path[next_round - 1].tolist()
+        values = self._benchmark_values(next_round, row)
+
+        user_ret = 0.0 if choice == CASH_KEY else row[INSTR_INDEX[choice]]
+        if leverage:
+            user_ret = leveraged_return(choice, user_ret)
+
+        new_cap = self.capital * (1 + user_ret)
+
+        # Cały wiersz rundy (benchmarki i gracz) zapisujemy jednym przypisaniem
+        values.append(new_cap)
+        self.history[next_round] = values
+        self._decisions[self.round] = (next_round, CHOICE_CODE[choice], leverage, user_ret, new_cap)
+        self.round = next_round
+        self.capital = new_cap
+
+        return {
+            "round": next_round,
+            "choice": choice,
+            "leverage": leverage,
+            "return": user_ret,
+            "capital": new_cap
+        }
+
+    # Runda w trybie portfela: weights to udziały wyborów w kolejności CHOICES (normalize_weights),
+    # dźwignia (od leverage_from) działa na wszystkie pozycje ryzykowne
+    def step_portfolio(self, weights, leverage: bool = False) -> dict:
+        if self._weights is None:
+            raise ValueError("Gra nie jest w trybie portfela.")
+        if self.round >= self.total_rounds - 1:
+            raise ValueError("Gra jest już zakończona.")
+
+        w = normalize_weights(weights)
+        leverage = bool(leverage) and self.round >= self.leverage_from
+        next_round = self.round + 1
+        if self.path is None or next_round > len(self.path):
+            self.ensure_round_returns(next_round)
+        row = self.path[next_round - 1]
+        values = self._benchmark_values(next_round, row.tolist())
+
+        growth, _ = portfolio_growth(row, w, leverage, self._held_weights(), self.rebalance_cost)
+        new_cap = self.capital * float(growth)
+        user_ret = new_cap / self.capital - 1
+        code = int(np.argmax(w))
+
+        values.append(new_cap)
+        self.history[next_round] = values
+        self._decisions[self.round] = (next_round, code, leverage, user_ret, new_cap)
+        self._weights[self.round] = w
+        self.round = next_round
+        self.capital = new_cap
+
+        return {
+            "round": next_round,
+            "choice": CHOICES[code],
+            "leverage": leverage,
+            "return": user_ret,
+            "capital": new_cap,
+            "weights": w,
+        }
+
+    # Udziały portfela przed bieżącą rundą: poprzednie udziały po zmianach cen (na starcie sama gotówka)
+    def _held_weights(self) -> np.ndarray:
+        if self.round == 0:
+            return CASH_WEIGHTS
+        prev = self._decisions[self.round - 1]
+        return drifted_weights(self._weights[self.round - 1],
+                               instrument_returns(self.path[self.round - 1], prev["leverage"]))
+
+    # Gra z ziarnem nie musi trzymać ścieżki; ensure_round_returns odtworzy ją przy następnej rundzie
+    def release_path(self):
+        if self.seed is not None:
+            self.path = None
+
+    # Wylosowane zwroty instrumentów jako listy (klucz instrumentu -> zwroty kolejnych rund)
+    def returns(self) -> dict:
+        if self.path is None and self.seed is not None:
+            self.ensure_round_returns(self.total_rounds)
+        if self.path is None:
+            return {k: [] for k in INSTR_INDEX}
+        return {k: self.path[:, i].tolist() for k, i in INSTR_INDEX.items()}
+
+    def score(self) -> dict:
+        d = self.decisions
+        if self._weights is not None:
+            # Ocena portfela ma tylko wersję wsadową (scoring importuje game_engine, stąd import tutaj)
+            from scoring import compute_portfolio_scores_batch, game_scores
+            if self.path is None:
+                self.ensure_round_returns(self.total_rounds)
+            batch = compute_portfolio_scores_batch(self.weights[None], d["leverage"][None], self.path[None])
+            return game_scores(batch, 0)
+        return compute_player_scores(decisions_from_codes(d["choice"], d["leverage"]), self.returns())
@@ -0,0 +1,200 @@
+import argparse
+import functools
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from game_engine import GameState
+from horizons import HORIZONS, date_label
+from returns_model import RISKY_KEYS
+
+# Tryb historyczny: gra odtwarza prawdziwe zwroty instrumentów z lokalnych plików z notowaniami.
+# Źródło (INVESTMENT_GAME_HISTORY) to katalog z plikiem na instrument (SP500.csv, GOLD.parquet, ...;
+# kolumny z datą i ceną zamknięcia) albo jeden plik z kolumną daty i kolumną cen dla każdego instrumentu.
+# Pliki parsujemy tylko raz: zwroty (miesięczne albo dzienne) trafiają do pamięci podręcznej .npy,
+# którą proces mapuje do pamięci i współdzieli między sesjami. Gra to widok na okno kolejnych zwrotów,
+# więc losowanie okna kosztuje O(1), a datę startu znajdujemy wyszukiwaniem binarnym.
+
+HISTORY_ENV = "INVESTMENT_GAME_HISTORY"
+
+# Katalog pamięci podręcznej (INVESTMENT_GAME_HISTORY_CACHE)
+CACHE_DIR_ENV = "INVESTMENT_GAME_HISTORY_CACHE"
+DEFAULT_CACHE_DIR = "history_cache"
+
+# Zmiana sposobu przeliczania notowań unieważnia stare pliki pamięci podręcznej
+CACHE_VERSION = 1
+
+SOURCE_SUFFIXES = (".csv", ".parquet")
+
+# Nazwy kolumn rozpoznawane bez względu na wielkość liter (pierwsza pasująca wygrywa)
+DATE_COLUMNS = ("date", "data", "datetime", "time", "timestamp")
+PRICE_COLUMNS = ("adj close", "adj_close", "close", "zamkniecie", "zamknięcie", "price", "cena")
+
+def configured_history_source():
+    return os.environ.get(HISTORY_ENV) or None
+
+def configured_cache_dir() -> str:
+    return os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+
+# Pliki źródła: katalog -> plik na instrument (nazwa pliku to klucz), plik -> jedna tabela dla wszystkich
+def source_files(source: str) -> dict:
+    if not os.path.isdir(source):
+        return {None: source}
+    by_key = {}
+    for name in sorted(os.listdir(source)):
+        stem, suffix = os.path.splitext(name)
+        if suffix.lower() in SOURCE_SUFFIXES:
+            by_key.setdefault(stem.upper(), os.path.join(source, name))
+    files = {k: by_key[k.upper()] for k in RISKY_KEYS if k.upper() in by_key}
+    missing = [k for k in RISKY_KEYS if k not in files]
+    if missing:
+        raise ValueError(f"{source}: brak plików z notowaniami dla: {', '.join(missing)}")
+    return files
+
+def _read_table(path: str):
+    import pandas as pd
+    if path.lower().endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, sep=None, engine="python")
+
+def _find_column(df, names, path: str, what: str) -> str:
+    lower = {str(c).strip().lower(): c for c in df.columns}
+    for name in names:
+        if name in lower:
+            return lower[name]
+    raise ValueError(f"{path}: nie znaleziono kolumny {what} (szukamy: {', '.join(names)})")
+
+# Ceny zamknięcia (daty x instrumenty w kolejności RISKY_KEYS), tylko z dat wspólnych dla wszystkich instrumentów
+def read_prices(source: str):
+    import pandas as pd
+    series = {}
+    for key, path in source_files(source).items():
+        df = _read_table(path)
+        date_col = _find_column(df, DATE_COLUMNS, path, "daty")
+        dates = pd.to_datetime(df[date_col]).dt.tz_localize(None).dt.normalize()
+        if key is None:
+            lower = {str(c).strip().lower(): c for c in df.columns}
+            missing = [k for k in RISKY_KEYS if k.lower() not in lower]
+            if missing:
+                raise ValueError(f"{path}: brak kolumn z cenami dla: {', '.join(missing)}")
+            for k in RISKY_KEYS:
+                series[k] = pd.Series(pd.to_numeric(df[lower[k.lower()]]).to_numpy(), index=dates)
+        else:
+            price_col = _find_column(df, PRICE_COLUMNS, path, "ceny")
+            series[key] = pd.Series(pd.to_numeric(df[price_col]).to_numpy(), index=dates)
+
+    prices = pd.concat([s.groupby(level=0).last() for s in series.values()], axis=1, join="inner", keys=list(series))
+    prices = prices[list(RISKY_KEYS)].sort_index().dropna()
+    if (prices <= 0).any().any():
+        raise ValueError(f"{source}: ceny muszą być dodatnie")
+    return prices
+
+# Zwroty z cen: dla rund miesięcznych z ostatniej ceny każdego miesiąca, dla sesji dziennych z kolejnych notowań.
+# Zwraca daty cen (punkty wykresu) i zwroty między nimi (o jeden wiersz mniej).
+def history_returns(prices, unit: str):
+    if unit == "month":
+        prices = prices.groupby(prices.index.to_period("M")).last()
+        dates = prices.index.to_timestamp().to_numpy().astype("datetime64[D]")
+    else:
+        dates = prices.index.to_numpy().astype("datetime64[D]")
+    values = prices.to_numpy(dtype=np.float64)
+    return dates, values[1:] / values[:-1] - 1.0
+
+# Klucz pamięci podręcznej: pliki źródła (ścieżka, rozmiar, czas modyfikacji), jednostka rundy i instrumenty
+def _cache_key(files: dict, unit: str) -> str:
+    h = hashlib.sha256(f"{CACHE_VERSION}|{unit}|{','.join(RISKY_KEYS)}".encode())
+    for key, path in files.items():
+        st = os.stat(path)
+        h.update(f"|{key}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+def _save_atomic(path: str, array):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+# Pliki pamięci podręcznej dla źródła (budujemy je, jeśli ich jeszcze nie ma albo źródło się zmieniło)
+def build_cache(source: str, unit: str, cache_dir=None):
+    cache_dir = configured_cache_dir() if cache_dir is None else cache_dir
+    base = os.path.join(cache_dir, f"history_{unit}_{_cache_key(source_files(source), unit)}")
+    paths = (base + "_dates.npy", base + "_returns.npy")
+    if not all(os.path.exists(p) for p in paths):
+        dates, returns = history_returns(read_prices(source), unit)
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_atomic(paths[1], returns)
+        _save_atomic(paths[0], dates)
+    return paths
+
+# Notowania zmapowane do pamięci: dates (punkty), returns (zwroty między kolejnymi punktami x instrumenty)
+class History:
+    def __init__(self, dates, returns, unit: str):
+        self.dates = dates
+        self.returns = returns
+        self.unit = unit
+
+    # Liczba możliwych startów gry o n_rounds rundach (ścieżka gry ma n_rounds wierszy, jak w GameState)
+    def window_count(self, n_rounds: int) -> int:
+        return max(0, len(self.returns) - n_rounds + 1)
+
+    # Zwroty gry zaczynającej się w punkcie start: widok, bez kopiowania
+    def window(self, start: int, n_rounds: int):
+        if not 0 <= start < self.window_count(n_rounds):
+            raise ValueError(f"Brak {n_rounds} zwrotów od punktu {start}.")
+        return self.returns[start:start + n_rounds]
+
+    def random_start(self, n_rounds: int, rng=None) -> int:
+        count = self.window_count(n_rounds)
+        if count == 0:
+            raise ValueError(f"Historia ma tylko {len(self.dates)} notowań, a gra potrzebuje {n_rounds + 1}.")
+        rng = np.random.default_rng() if rng is None else rng
+        return int(rng.integers(count))
+
+    # Pierwszy punkt w dniu date lub po nim
+    def start_at(self, date) -> int:
+        return int(np.searchsorted(self.dates, np.datetime64(date, "D")))
+
+    def label(self, index: int) -> str:
+        return date_label(self.unit, self.dates[index])
+
+# Historia dla jednostki rundy ("month" albo "busday"), raz na proces; wszystkie sesje czytają te same strony
+@functools.lru_cache(maxsize=None)
+def load_history(source: str, unit: str) -> History:
+    dates_path, returns_path = build_cache(source, unit)
+    returns = np.load(returns_path, mmap_mode="r")
+    if returns.ndim != 2 or returns.shape[1] != len(RISKY_KEYS):
+        raise ValueError(f"{returns_path}: zwroty mają kształt {returns.shape}, a zestaw instrumentów {len(RISKY_KEYS)}")
+    return History(np.load(dates_path), returns, unit)
+
+# Historia dla horyzontu gry albo None, gdy tryb historyczny jest wyłączony
+def configured_history(horizon: str):
+    source = configured_history_source()
+    if source is None:
+        return None
+    return load_history(os.path.abspath(source), HORIZONS[horizon]["unit"])
+
+# Nowa gra na historycznym oknie horyzontu; bez start losujemy okno. Zwraca grę i punkt startu.
+def game_from_history(history: History, horizon: str, start=None, rng=None, portfolio: bool = False):
+    h = HORIZONS[horizon]
+    if start is None:
+        start = history.random_start(h["rounds"], rng)
+    game = GameState(path=history.window(start, h["rounds"]), total_rounds=h["rounds"],
+                     leverage_from=h["leverage_from"], portfolio=portfolio)
+    return game, start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Przelicza notowania (CSV/Parquet) na zwroty do gry w trybie historycznym.")
+    parser.add_argument("source", help="katalog z plikiem na instrument albo jeden plik z kolumnami instrumentów")
+    parser.add_argument("--horizon", choices=list(HORIZONS), action="append", help="horyzont (domyślnie wszystkie)")
+    args = parser.parse_args(argv)
+
+    for horizon in args.horizon or list(HORIZONS):
+        h = HORIZONS[horizon]
+        t0 = time.perf_counter()
+        history = load_history(os.path.abspath(args.source), h["unit"])
+        print(f"{h['label']}: {len(history.dates)} notowań ({history.label(0)} – {history.label(-1)}), "
+              f"{history.window_count(h['rounds'])} możliwych startów gry, {time.perf_counter() - t0:.2f} s")
+
+if __name__ == "__main__":
+    main()
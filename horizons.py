@@ -0,0 +1,63 @@
+from functools import lru_cache
+
+import numpy as np
+
+from game_engine import LEVERAGE_FROM_ROUND, TOTAL_ROUNDS, GameState
+from memsize import mark_shared
+from returns_model import scaled_params
+
+# Horyzonty gry: liczba rund, ile rund przypada na miesiąc i od kiedy liczymy daty rund.
+# Domyślny horyzont to klasyczna gra (40 miesięcy od września 2022, dźwignia od 20. rundy);
+# dłuższe grają sesjami dziennymi, z parametrami zwrotów przeskalowanymi do długości rundy.
+HORIZONS = {
+    "monthly": {
+        "label": "40 miesięcy",
+        "rounds": TOTAL_ROUNDS,
+        "periods_per_month": 1,
+        "unit": "month",
+        "next_period": "kolejny miesiąc",
+        "start": "2022-09-01",
+        "leverage_from": LEVERAGE_FROM_ROUND,
+    },
+    "daily": {
+        "label": "5 lat, sesje dzienne",
+        "rounds": 1260,
+        "periods_per_month": 21,
+        "unit": "busday",
+        "next_period": "kolejną sesję",
+        "start": "2020-09-01",
+        "leverage_from": 630,
+    },
+}
+
+DEFAULT_HORIZON = "monthly"
+
+MONTHS_PL = ("sty", "lut", "mar", "kwi", "maj", "cze", "lip", "sie", "wrz", "paź", "lis", "gru")
+
+# Etykieta daty rundy liczona na żądanie (bez listy etykiet dla całej gry)
+def round_label(horizon: str, index: int) -> str:
+    h = HORIZONS[horizon]
+    start = np.datetime64(h["start"], "D")
+    if h["unit"] == "month":
+        return date_label("month", start.astype("datetime64[M]") + index)
+    return date_label(h["unit"], np.busday_offset(start, index, roll="forward"))
+
+# Data w formacie etykiet rund: "wrz 22" dla rund miesięcznych, "1 wrz 22" dla sesji dziennych
+def date_label(unit: str, date) -> str:
+    day = np.datetime64(date, "D").item()
+    if unit == "month":
+        return f"{MONTHS_PL[day.month - 1]} {day.year % 100:02d}"
+    return f"{day.day} {MONTHS_PL[day.month - 1]} {day.year % 100:02d}"
+
+# Parametry są wspólne dla wszystkich sesji procesu, więc nie wliczamy ich do pamięci sesji (memsize)
+@lru_cache(maxsize=None)
+def horizon_params(horizon: str) -> dict:
+    return mark_shared(scaled_params(HORIZONS[horizon]["periods_per_month"]))
+
+# Nowa gra w danym horyzoncie; seed działa jak w GameState (ta sama liczba, te same zwroty),
+# portfolio włącza tryb portfela
+def horizon_game(horizon: str, seed=None, rng=None, portfolio: bool = False) -> GameState:
+    h = HORIZONS[horizon]
+    params = None if h["periods_per_month"] == 1 else horizon_params(horizon)
+    return GameState(rng=rng, seed=seed, total_rounds=h["rounds"], params=params,
+                     leverage_from=h["leverage_from"], portfolio=portfolio)
@@ -1,13 +1,38 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import random
-import textwrap  # Renderowanie HTML
+
+import metrics
+from decision_log import DecisionLog, configured_log_path, new_session_id
+from game_engine import CHOICE_CODE, CHOICES, REBALANCE_COST, START_CAPITAL
+from history import configured_history, configured_history_source, game_from_history
+from horizons import DEFAULT_HORIZON, HORIZONS, horizon_game, round_label
+from memsize import deep_sizeof
+from optimal_policy import POLICY_SUPPORTED, decision_regret, horizon_policy, regret_pct
+from results_store import ResultsStore, configured_db_path, game_record
+from returns_model import INSTRUMENTS, RISKY_KEYS
+from rng_streams import MAX_GAME_SEED, new_game_seed
+from risk_stats import risk_stats
+from rooms import CAPITAL_EDGES, RoomRegistry
+from scenario_bank import configured_bank, game_from_bank
+from ui_helpers import (CHART_LIVE_POINTS, capital_hist_frame, chart_frame, chart_spec, fmt_pct, fmt_pln_num,
+                        risk_frame, room_round_frame, score_explanation_md, summary_cards_html, whatif_frame, whatif_spec)
+from whatif import alternative_paths, alternative_paths_ready, replay_finals, replay_portfolio_finals, whatif_summary
+
+# Pomiar czasu faz reruna (tylko gdy włączony zmienną środowiskową, patrz metrics.py)
+metrics.begin_rerun()
 
 # Ustawienia strony aplikacji
 st.set_page_config(page_title="Gra Inwestycyjna", layout="centered")
 
-# Style CSS dla całej aplikacji
-st.markdown("""
+# Style CSS dla całej aplikacji. Kliknięcia w trakcie gry odświeżają tylko fragment rundy,
+# więc style wysyłamy wyłącznie przy pełnych rerunach (zmiana strony), a nie przy każdej decyzji.
+with metrics.phase("css"):
+    st.markdown("""
 <style>
 .stButton>button { height: 3em; font-weight: bold; }
 .instruction-card {
@@ -78,177 +103,130 @@ footer {visibility: hidden;}
 </style>
 """, unsafe_allow_html=True)
 
-# Liczba rund w grze
-TOTAL_ROUNDS = 40
-
-# Etykiety rund do wyświetlenia na ekranie
-LABELS_TEXT = [
-    "wrz 22", "paź 22", "lis 22", "gru 22", "sty 23", "lut 23", "mar 23", "kwi 23", "maj 23", "cze 23",
-    "lip 23", "sie 23", "wrz 23", "paź 23", "lis 23", "gru 23", "sty 24", "lut 24", "mar 24", "kwi 24",
-    "maj 24", "cze 24", "lip 24", "sie 24", "wrz 24", "paź 24", "lis 24", "gru 24", "sty 25", "lut 25",
-    "mar 25", "kwi 25", "maj 25", "cze 25", "lip 25", "sie 25", "wrz 25", "paź 25", "lis 25", "gru 25"
-]
-
-# Uzupełniamy listę historią do stałej długości, żeby wykresy miały stały rozmiar
-def pad_history(history_list, total_length):
-    base = history_list[:total_length]
-    padding = [None] * (total_length - len(base))
-    return base + padding
-
 # Zmieniamy stronę w aplikacji i odświeżamy widok
 def next_page(page_name: str):
     st.session_state.page = page_name
     st.rerun()
 
-# Formatujemy liczbę jako PLN bez części dziesiętnej
-def fmt_pln_num(x: float) -> str:
-    return f"{x:,.0f}".replace(",", " ")
-
-# Formatujemy wartość procentową z plusem dla dodatnich wyników
-def fmt_pct(x: float) -> str:
-    sign = "+" if x >= 0 else ""
-    return f"{sign}{x:.2f}%"
-
-# Parametry instrumentów do losowania zwrotów
-INSTRUMENTS = {
-    "SP500": {
-        "label": "S&P 500",
-        "mean": 0.006,
-        "vol": 0.035,
-        "crash_p": 0.015,
-        "crash_mu": -0.08,
-        "crash_sigma": 0.03,
-        "rally_p": 0.012,
-        "rally_mu": 0.07,
-        "rally_sigma": 0.03,
-        "mom_strength": 0.03,
-        "mom_cap": 0.03,
-        "ret_floor": -0.15,
-        "ret_cap": 0.15,
-    },
-    "GOLD": {
-        "label": "Złoto",
-        "mean": 0.0035,
-        "vol": 0.040,
-        "crash_p": 0.012,
-        "crash_mu": -0.07,
-        "crash_sigma": 0.03,
-        "rally_p": 0.012,
-        "rally_mu": 0.07,
-        "rally_sigma": 0.03,
-        "mom_strength": 0.03,
-        "mom_cap": 0.035,
-        "ret_floor": -0.12,
-        "ret_cap": 0.12,
-    },
-    "BTC": {
-        "label": "Bitcoin",
-        "mean": 0.010,
-        "vol": 0.10,
-        "crash_p": 0.040,
-        "crash_mu": -0.22,
-        "crash_sigma": 0.08,
-        "rally_p": 0.035,
-        "rally_mu": 0.20,
-        "rally_sigma": 0.08,
-        "mom_strength": 0.035,
-        "mom_cap": 0.05,
-        "ret_floor": -0.35,
-        "ret_cap": 0.35,
-    },
-    "CASH": {
-        "label": "Gotówka",
-        "mean": 0.0,
-        "vol": 0.0,
-        "crash_p": 0.0,
-        "crash_mu": 0.0,
-        "crash_sigma": 0.0,
-        "rally_p": 0.0,
-        "rally_mu": 0.0,
-        "rally_sigma": 0.0,
-        "mom_strength": 0.0,
-        "mom_cap": 0.0,
-        "ret_floor": 0.0,
-        "ret_cap": 0.0,
-    }
-}
-
-# Wyliczamy lekką przewagę trendu na podstawie ostatnich zwrotów
-def streak_bias(instr_key: str, lookback: int = 4) -> float:
-    if instr_key == "CASH":
-        return 0.0
-
-    p = INSTRUMENTS[instr_key]
-    key_map = {"SP500": "returns_sp", "GOLD": "returns_gold", "BTC": "returns_btc"}
-    series = st.session_state.get(key_map[instr_key], [])
-    if not series:
-        return 0.0
-
-    last = series[-lookback:]
-    score = sum(1 if x > 0 else (-1 if x < 0 else 0) for x in last)
-    raw = (score / lookback) * p["mom_strength"]
-    return max(-p["mom_cap"], min(p["mom_cap"], raw))
-
-# Ograniczamy wartość do podanego zakresu
-def clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
-
-# Losujemy zwrot instrumentu z uwzględnieniem skrajnych zdarzeń i trendu
-def sample_return(instr_key: str) -> float:
-    p = INSTRUMENTS[instr_key]
-    if instr_key == "CASH":
-        return 0.0
-
-    bias = streak_bias(instr_key)
-    u = random.random()
-
-    if u < p["crash_p"]:
-        r = random.gauss(p["crash_mu"], p["crash_sigma"])
-    elif u < p["crash_p"] + p["rally_p"]:
-        r = random.gauss(p["rally_mu"], p["rally_sigma"])
-    else:
-        r = random.gauss(p["mean"] + bias, p["vol"])
-
-    return clamp(r, p["ret_floor"], p["ret_cap"])
-
 # Inicjujemy stronę startową, jeśli jeszcze jej nie ma w stanie sesji
 if "page" not in st.session_state:
     st.session_state.page = "game1_intro"
 
-# Ustawiamy stan gry na wartości początkowe
-def init_game_state():
-    st.session_state.g1_round = 0
-    st.session_state.g1_capital = 10000.0
-    st.session_state.g1_history_user = [10000.0]
-
-    st.session_state.hist_sp = [10000.0]
-    st.session_state.hist_gold = [10000.0]
-    st.session_state.hist_btc = [10000.0]
-
-    st.session_state.returns_sp = []
-    st.session_state.returns_gold = []
-    st.session_state.returns_btc = []
-
-    st.session_state.g1_decisions = []
-
-# Zapewniamy, że zwroty na kolejne rundy są już wylosowane
-def ensure_round_returns(next_round_index: int):
-    while len(st.session_state.returns_sp) < next_round_index:
-        st.session_state.returns_sp.append(sample_return("SP500"))
-    while len(st.session_state.returns_gold) < next_round_index:
-        st.session_state.returns_gold.append(sample_return("GOLD"))
-    while len(st.session_state.returns_btc) < next_round_index:
-        st.session_state.returns_btc.append(sample_return("BTC"))
-
-# Aktualizujemy wyniki benchmarków na podstawie wylosowanych zwrotów
-def apply_benchmarks(next_round_index: int):
-    r_sp = st.session_state.returns_sp[next_round_index - 1]
-    r_gold = st.session_state.returns_gold[next_round_index - 1]
-    r_btc = st.session_state.returns_btc[next_round_index - 1]
-
-    st.session_state.hist_sp.append(st.session_state.hist_sp[-1] * (1 + r_sp))
-    st.session_state.hist_gold.append(st.session_state.hist_gold[-1] * (1 + r_gold))
-    st.session_state.hist_btc.append(st.session_state.hist_btc[-1] * (1 + r_btc))
+# Ustawiamy stan gry na wartości początkowe.
+# Numer gry (seed) albo numer scenariusza z banku odtwarza dokładnie tę samą grę.
+# Bank scenariuszy zawiera ścieżki klasycznej gry, więc dłuższe horyzonty zawsze losujemy z ziarna.
+# W pokoju klasy gra idzie po wspólnej ścieżce pokoju, a horyzont wybrał prowadzący.
+# portfolio włącza tryb portfela (udziały instrumentów zamiast jednego wyboru na rundę).
+# history gra na prawdziwych notowaniach (history.py) od punktu history_start albo od losowego.
+def init_game_state(seed=None, scenario=None, horizon=DEFAULT_HORIZON, room=None, portfolio=False, history=False,
+                    history_start=None):
+    bank = configured_bank() if horizon == DEFAULT_HORIZON and room is None else None
+    if history and room is None:
+        game, st.session_state.g1_history_start = game_from_history(configured_history(horizon), horizon,
+                                                                    start=history_start, portfolio=portfolio)
+    elif room is not None:
+        game = room.join(portfolio=portfolio)
+        horizon = room.horizon
+        st.session_state.g1_room = room.code
+    elif bank is not None and scenario is not None:
+        game = game_from_bank(bank, scenario, portfolio=portfolio)
+    elif bank is not None and seed is None:
+        game = game_from_bank(bank, portfolio=portfolio)
+    else:
+        game = horizon_game(horizon, seed=new_game_seed() if seed is None else seed, portfolio=portfolio)
+    st.session_state.g1_game = game
+    st.session_state.g1_horizon = horizon
+    st.session_state.g1_log_id = new_session_id()
+    # Ścieżki do powtórki decyzji w podsumowaniu liczymy w tle, zanim gracz skończy grę
+    background_worker().submit(alternative_paths, horizon)
+
+# Czyścimy stan poprzedniej gry i zaczynamy nową na wskazanej stronie;
+# gracz z pokoju klasy najpierw z niego wychodzi, żeby panel prowadzącego go nie liczył
+def restart_game(page_name: str, seed=None, scenario=None, horizon=DEFAULT_HORIZON, room=None, portfolio=False,
+                 history=False, history_start=None):
+    room_left = current_room()
+    if room_left is not None:
+        room_left.leave(st.session_state.g1_game)
+    for k in list(st.session_state.keys()):
+        if k.startswith("g1_"):
+            del st.session_state[k]
+    init_game_state(seed=seed, scenario=scenario, horizon=horizon, room=room, portfolio=portfolio, history=history,
+                    history_start=history_start)
+    next_page(page_name)
+
+# Wspólna baza wyników dla wszystkich sesji procesu (None, gdy zapis jest wyłączony)
+@st.cache_resource
+def results_store():
+    path = configured_db_path()
+    return None if path is None else ResultsStore(path)
+
+# Jeden wątek procesu na cięższe obliczenia w tle (kolejne zadania czekają w kolejce)
+@st.cache_resource
+def background_worker():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="background")
+
+# Kapitał końcowy tych samych decyzji na ścieżkach alternatywnych; wynik zależy tylko od horyzontu
+# i sekwencji decyzji, więc rerun podsumowania (i ta sama sekwencja w innej grze) nie liczy go ponownie
+# W trybie portfela kluczem są udziały z każdej rundy (weights) i koszt przebudowy.
+@st.cache_data(show_spinner=False, max_entries=1000)
+def cached_whatif_finals(horizon: str, choices: bytes, leverage: bytes, start_capital: float, weights=None,
+                         cost: float = REBALANCE_COST):
+    leverage = np.frombuffer(leverage, dtype=np.bool_)
+    if weights is not None:
+        return replay_portfolio_finals(alternative_paths(horizon), np.frombuffer(weights).reshape(len(leverage), -1),
+                                       leverage, start_capital, cost)
+    return replay_finals(alternative_paths(horizon), np.frombuffer(choices, dtype=np.int8), leverage, start_capital)
+
+# Dziennik decyzji wspólny dla wszystkich sesji procesu (None, gdy jest wyłączony)
+@st.cache_resource
+def decision_log():
+    path = configured_log_path()
+    return None if path is None else DecisionLog(path)
+
+# Pokoje klasy są wspólne dla wszystkich sesji procesu
+@st.cache_resource
+def room_registry():
+    return RoomRegistry()
+
+# Pokój, w którym gra bieżąca sesja (None poza trybem klasy albo gdy pokój już wygasł)
+def current_room():
+    code = st.session_state.get("g1_room")
+    return room_registry().get(code) if code else None
+
+# Panel prowadzącego odświeża się co tyle sekund
+ROOM_REFRESH = 2
+
+# Co tyle sekund podsumowanie sprawdza, czy ścieżki alternatywne są już policzone
+WHATIF_POLL = 0.5
+
+# Do tylu instrumentów decyzja to przyciski (po CHOICE_COLUMNS w rzędzie); większy zestaw wybieramy z listy
+BUTTON_CHOICES = 8
+CHOICE_COLUMNS = 4
+
+# Najwięcej kafelków benchmarków w podsumowaniu (przy większym zestawie pokazujemy najlepsze)
+SUMMARY_BENCHMARKS = 7
+
+# Ranking pokazuje tyle najlepszych gier i odświeża się najwyżej co tyle sekund,
+# niezależnie od liczby oglądających go graczy
+LEADERBOARD_SIZE = 20
+LEADERBOARD_TTL = 5
+
+# Tryby gry (klucz to portfolio); ranking prowadzimy osobno dla każdego trybu
+GAME_MODES = {False: "Jeden instrument na rundę", True: "Portfel (udziały instrumentów)"}
+
+@st.cache_data(ttl=LEADERBOARD_TTL, show_spinner=False)
+def cached_leaderboard(horizon: str, period: str, portfolio: bool = False):
+    since = time.time() - 24 * 3600 if period == "day" else None
+    return results_store().leaderboard(horizon, LEADERBOARD_SIZE, since=since, portfolio=portfolio)
+
+# Odczytujemy numer gry wpisany przez gracza; None oznacza nową losową grę
+def parse_game_seed(text: str):
+    text = text.strip()
+    if not text:
+        return None
+    if not text.isdigit() or int(text) >= MAX_GAME_SEED:
+        raise ValueError(f"Numer gry musi być liczbą od 0 do {MAX_GAME_SEED - 1}.")
+    return int(text)
 
 # Budujemy jedno zdanie podsumowania profilu inwestora
 def investor_sentence(rationality: int, risk: int) -> str:
@@ -274,295 +252,415 @@ def investor_sentence(rationality: int, risk: int) -> str:
         f"Twoje decyzje sugerują styl: {style}."
     )
 
-# Liczymy ocenę gracza na podstawie historii decyzji
-def compute_player_scores():
-    decisions = st.session_state.get("g1_decisions", [])
-    if not decisions:
-        return {"risk": 0, "rationality": 0, "notes": ["Brak decyzji do oceny."]}
-
-    key_map = {"SP500": "returns_sp", "GOLD": "returns_gold", "BTC": "returns_btc"}
-
-    n = len(decisions)
-    counts = {"SP500": 0, "GOLD": 0, "BTC": 0, "CASH": 0}
-    lev_count = 0
-    switches = 0
-
-    prev_choice = None
-    for d in decisions:
-        ch = d["choice"]
-        counts[ch] += 1
-        if d.get("leverage"):
-            lev_count += 1
-        if prev_choice is not None and ch != prev_choice:
-            switches += 1
-        prev_choice = ch
-
-    share = {k: counts[k] / n for k in counts}
-    share_lev = lev_count / n
-    switch_rate = switches / max(1, (n - 1))
-
-    concentration = sum(v**2 for v in share.values())
-
-    risk_raw = (
-        0.90 * share["BTC"] +
-        0.25 * share["GOLD"] -
-        0.35 * share["SP500"] +
-        0.75 * share_lev +
-        0.25 * concentration -
-        0.90 * share["CASH"]
-    )
-    risk = int(max(0, min(100, round(50 + 70 * risk_raw))))
-
-    penalties = 0.0
-    bonuses = 0.0
-
-    def neg_streak(series, upto_index_exclusive, window=3):
-        start = max(0, upto_index_exclusive - window)
-        ctx = series[start:upto_index_exclusive]
-        s = 0
-        for x in reversed(ctx):
-            if x < 0:
-                s += 1
-            else:
-                break
-        return s
-
-    def big_up(series, upto_index_exclusive, threshold=0.08):
-        if upto_index_exclusive - 1 < 0 or upto_index_exclusive - 1 >= len(series):
-            return False
-        return series[upto_index_exclusive - 1] >= threshold
-
-    for d in decisions:
-        r = d["round"]
-        ch = d["choice"]
-        lev = d.get("leverage", False)
-
-        if ch == "CASH":
-            btc_series = st.session_state.get("returns_btc", [])
-            btc_ns = neg_streak(btc_series, r - 1, window=3)
-            if btc_ns >= 2:
-                bonuses += 0.35
-            continue
-
-        series = st.session_state.get(key_map[ch], [])
-
-        ns = neg_streak(series, r - 1, window=3)
-        if ns >= 2:
-            mult = 1.0
-            if ch == "BTC":
-                mult = 1.35
-            elif ch == "GOLD":
-                mult = 1.15
-            penalties += mult * (ns - 1)
-
-        if lev:
-            last2_start = max(0, (r - 1) - 2)
-            last2 = series[last2_start:(r - 1)]
-            if len(last2) == 2 and all(x < 0 for x in last2):
-                penalties += 1.2 if ch != "SP500" else 0.9
-
-        if big_up(series, r - 1, threshold=0.10 if ch == "BTC" else 0.06):
-            penalties += 0.25 if ch == "SP500" else 0.35
-
-        btc_series = st.session_state.get("returns_btc", [])
-        btc_ns = neg_streak(btc_series, r - 1, window=3)
-        if btc_ns >= 2 and ch in ("SP500", "GOLD"):
-            bonuses += 0.25
-
-        if (not lev) and ns >= 2:
-            bonuses += 0.12
-
-    if switch_rate > 0.55:
-        penalties += (switch_rate - 0.55) * 3.0
-
-    if concentration > 0.55 and share["BTC"] > 0.5:
-        penalties += 1.0
-
-    rationality = 85.0 - 6.5 * penalties + 3.0 * bonuses
-    if risk > 80:
-        rationality -= (risk - 80) * 0.25
-
-    rationality = int(max(0, min(100, round(rationality))))
-
-    notes = [
-        f"Udział wyborów: BTC {share['BTC']:.0%}, Złoto {share['GOLD']:.0%}, S&P 500 {share['SP500']:.0%}, Gotówka {share['CASH']:.0%}.",
-        f"Lewar użyty w {share_lev:.0%} rund.",
-        f"Częstotliwość zmian instrumentu: {switch_rate:.0%} (im wyżej, tym większe ryzyko overtradingu).",
-        f"Koncentracja portfela: {concentration:.2f} (im wyżej, tym mniej dywersyfikacji).",
-    ]
-    return {"risk": risk, "rationality": rationality, "notes": notes}
-
 def render_summary_cards(items):
-    # ✅ render jak na screenie + pewne HTML (bez bloków kodu)
-    cards = []
-    for it in items:
-        delta = it["delta_pct"]
-        delta_class = "delta-pos" if delta >= 0 else "delta-neg"
-        card = f"""
-<div class="summary-card">
-  <div class="summary-title">{it['title']}</div>
-  <div class="summary-value">{it['value_num_str']} <span class="summary-ccy">PLN</span></div>
-  <div class="summary-delta"><span class="{delta_class}">{fmt_pct(delta)}</span></div>
-</div>
-"""
-        cards.append(textwrap.dedent(card).strip())
-
-    html = '<div class="summary-grid">' + "".join(cards) + "</div>"
-    st.markdown(html, unsafe_allow_html=True)
-
-# --- STRONY ---
-def show_game1_intro():
-    st.header("Gra Inwestycyjna")
-
-    st.markdown("""
+    st.markdown(summary_cards_html(items), unsafe_allow_html=True)
+
+# Lista instrumentów do instrukcji (z opisem z zestawu instrumentów, jeśli go ma); długie zestawy skracamy
+def instrument_items_html(limit: int = BUTTON_CHOICES) -> str:
+    items = []
+    for k in CHOICES[:limit]:
+        desc = INSTRUMENTS[k].get("description")
+        items.append(f"<li><b>{INSTRUMENTS[k]['label']}</b>{' — ' + desc if desc else ''}</li>")
+    if len(CHOICES) > limit:
+        items.append(f"<li>i {len(CHOICES) - limit} innych</li>")
+    return "".join(items)
+
+# Karta instrukcji dla horyzontu. Gra ma tyle rund, ile punktów wykresu (pierwszy to kapitał startowy),
+# więc decyzji jest o jedną mniej: ostatnia decyzja zapada w przedostatniej rundzie.
+def instruction_html(horizon: str) -> str:
+    h = HORIZONS[horizon]
+    return f"""
 <div class="instruction-card">
     <h3>Instrukcja:</h3>
-    Masz <b>40 rund</b>. Startujesz z <b>10 000 PLN</b>.
-    W każdej rundzie wybierasz instrument na kolejny miesiąc:
-    <ul>
-        <li><b>S&P 500</b> — niższe/średnie ryzyko</li>
-        <li><b>Złoto</b> — średnie ryzyko</li>
-        <li><b>Bitcoin</b> — wysokie ryzyko</li>
-        <li><b>Gotówka</b> — 0% (bezpieczna przystań)</li>
-    </ul>
+    Masz <b>{h['rounds']} rund</b> ({h['rounds'] - 1} decyzji). Startujesz z <b>10 000 PLN</b>.
+    W każdej rundzie wybierasz instrument na {h['next_period']} (albo, w trybie portfela, udziały instrumentów):
+    <ul>{instrument_items_html()}</ul>
     <div class="important-text">Cel: maksymalizacja wyniku.</div>
-    Od 20. rundy dostępny będzie <b>Lewar (x2)</b>.
+    Od {h['leverage_from']}. rundy dostępny będzie <b>Lewar (x2)</b>.
     Zwroty są losowe, z lekką „pamięcią” trendu i rzadkimi skokami (w zależności od instrumentu).
 </div>
-    """, unsafe_allow_html=True)
+    """
 
-    if "g1_round" not in st.session_state:
+# --- STRONY ---
+def show_game1_intro():
+    st.header("Gra Inwestycyjna")
+    # Instrukcja zależy od horyzontu wybranego niżej, więc wypełniamy ją po wyborze (na tym samym miejscu)
+    instruction = st.empty()
+
+    if "g1_game" not in st.session_state:
         init_game_state()
 
+    default_horizon = st.query_params.get("horizon", DEFAULT_HORIZON)
+    horizon = st.radio(
+        "Horyzont gry",
+        list(HORIZONS),
+        index=list(HORIZONS).index(default_horizon) if default_horizon in HORIZONS else 0,
+        format_func=lambda k: HORIZONS[k]["label"],
+        horizontal=True,
+    )
+    instruction.markdown(instruction_html(horizon), unsafe_allow_html=True)
+    if horizon != DEFAULT_HORIZON:
+        st.caption(
+            "Każda runda to jedna sesja giełdowa. "
+            "Dzienne zwroty są mniejsze, a krachy i rajdy rzadsze niż miesięczne."
+        )
+
+    portfolio = st.radio(
+        "Tryb gry",
+        list(GAME_MODES),
+        format_func=GAME_MODES.get,
+        horizontal=True,
+    )
+    if portfolio:
+        st.caption(
+            "W każdej rundzie ustawiasz udziały wszystkich instrumentów; kapitał zmienia się o średnią ich zwrotów "
+            f"ważoną udziałami. Przebudowa portfela kosztuje {REBALANCE_COST:.1%} przesuniętej kwoty."
+        )
+
+    # Rynek z notowań pokazujemy tylko, gdy skonfigurowano źródło (INVESTMENT_GAME_HISTORY)
+    history = False
+    history_date = None
+    if configured_history_source() is not None:
+        history = st.radio(
+            "Rynek",
+            [False, True],
+            format_func={False: "Model zwrotów", True: "Prawdziwe notowania"}.get,
+            horizontal=True,
+        )
+        if history:
+            st.caption(
+                "Gra odtwarza prawdziwe zwroty instrumentów z wybranego albo losowego okresu historii; "
+                "daty poznasz w podsumowaniu. Numer gry i pokój dotyczą tylko modelu zwrotów, "
+                "a gry na prawdziwych notowaniach nie trafiają do rankingu."
+            )
+            try:
+                market = configured_history(horizon)
+            except ValueError as e:
+                st.error(f"Nie udało się wczytać notowań: {e}")
+            else:
+                # Zakres dat to możliwe początki gry: od pierwszego notowania do ostatniego, po którym starczy rund
+                last_start = market.window_count(HORIZONS[horizon]["rounds"]) - 1
+                if last_start >= 0:
+                    history_date = st.date_input(
+                        "Początek okresu (opcjonalnie)",
+                        value=None,
+                        min_value=market.dates[0].item(),
+                        max_value=market.dates[last_start].item(),
+                        format="DD.MM.YYYY",
+                        help="Gra zacznie się od pierwszego notowania w tym dniu lub po nim. Zostaw puste, aby wylosować okres.",
+                    )
+
+    if results_store() is not None:
+        player = st.text_input("Pseudonim do rankingu (opcjonalnie)", value=st.session_state.get("player", ""), max_chars=30)
+        st.session_state.player = player.strip()
+
+    with st.expander("Zagraj konkretną grę (numer gry)"):
+        seed_text = st.text_input(
+            "Numer gry",
+            value=st.query_params.get("seed", ""),
+            help="Ta sama liczba oznacza te same zwroty instrumentów. Zostaw puste, aby zagrać losową grę.",
+        )
+
+    with st.expander("Zajęcia: dołącz do pokoju", expanded="room" in st.query_params):
+        room_code = st.text_input(
+            "Kod pokoju",
+            value=st.query_params.get("room", ""),
+            help="Kod podaje prowadzący. W pokoju wszyscy grają na tych samych zwrotach.",
+        )
+
     if st.button("Start gry", use_container_width=True):
-        next_page("game1")
+        try:
+            seed = parse_game_seed(seed_text)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            if room_code.strip():
+                room = room_registry().get(room_code)
+                if room is None:
+                    st.error(f"Nie ma pokoju o kodzie {room_code.strip().upper()}.")
+                else:
+                    restart_game("game1", room=room, portfolio=portfolio)
+            elif (seed is None and history_date is None and horizon == st.session_state.g1_horizon
+                  and "g1_room" not in st.session_state
+                  and st.session_state.g1_game.portfolio == portfolio
+                  and ("g1_history_start" in st.session_state) == history):
+                next_page("game1")
+            else:
+                try:
+                    history_start = None if history_date is None else configured_history(horizon).start_at(history_date)
+                    restart_game("game1", seed=seed, horizon=horizon, portfolio=portfolio, history=history,
+                                 history_start=history_start)
+                except ValueError as e:
+                    st.error(f"Nie udało się wczytać notowań: {e}")
+
+    if results_store() is not None and st.button("Ranking", use_container_width=True):
+        next_page("leaderboard")
+    if st.button("Prowadzę zajęcia (pokój klasy)", use_container_width=True):
+        next_page("room")
 
 def show_game1():
-    current_idx = st.session_state.g1_round
-    if current_idx >= TOTAL_ROUNDS - 1:
+    game = st.session_state.g1_game
+    if game.finished:
         next_page("game1_summary")
         return
 
-    current_cap = st.session_state.g1_history_user[-1]
-    prev_cap = st.session_state.g1_history_user[-2] if len(st.session_state.g1_history_user) > 1 else 10000.0
-    pct_change_show = ((current_cap - prev_cap) / prev_cap) * 100
-
-    label = LABELS_TEXT[current_idx] if current_idx < len(LABELS_TEXT) else f"R{current_idx+1}"
-    st.subheader(f"Runda {current_idx + 1} / {TOTAL_ROUNDS} ({label})")
-
-    st.metric("Twój Kapitał", f"{fmt_pln_num(current_cap)} PLN", fmt_pct(pct_change_show))
-
-    chart_data = pd.DataFrame({
-        "S&P 500": pad_history(st.session_state.hist_sp, TOTAL_ROUNDS),
-        "Złoto": pad_history(st.session_state.hist_gold, TOTAL_ROUNDS),
-        "Bitcoin": pad_history(st.session_state.hist_btc, TOTAL_ROUNDS),
-        "Twój Kapitał": pad_history(st.session_state.g1_history_user, TOTAL_ROUNDS)
-    })
-    st.line_chart(chart_data.iloc[:TOTAL_ROUNDS])
-
-    leverage_active = False
-    if current_idx >= 20:
-        st.warning("⚡ ODBLOKOWANO DŹWIGNIĘ (LEWAR x2)")
-        leverage_active = st.checkbox("Użyj dźwigni (x2 zyski/straty)")
-
-    st.write("W co inwestujesz na kolejny miesiąc?")
-    col1, col2, col3, col4 = st.columns(4)
-
-    choice = None
-    if col1.button(INSTRUMENTS["SP500"]["label"], use_container_width=True):
-        choice = "SP500"
-    if col2.button(INSTRUMENTS["GOLD"]["label"], use_container_width=True):
-        choice = "GOLD"
-    if col3.button(INSTRUMENTS["BTC"]["label"], use_container_width=True):
-        choice = "BTC"
-    if col4.button(INSTRUMENTS["CASH"]["label"], use_container_width=True):
-        choice = "CASH"
-
-    if choice:
-        next_round = current_idx + 1
-        ensure_round_returns(next_round)
-        apply_benchmarks(next_round)
-
-        if choice == "SP500":
-            user_ret = st.session_state.returns_sp[next_round - 1]
-        elif choice == "GOLD":
-            user_ret = st.session_state.returns_gold[next_round - 1]
-        elif choice == "BTC":
-            user_ret = st.session_state.returns_btc[next_round - 1]
+    game_round_panel()
+
+# Decyzja gracza jako callback przycisku: Streamlit wykonuje go przed odświeżeniem,
+# więc widok od razu pokazuje nową rundę bez dodatkowego st.rerun().
+# W trybie portfela decyzją są udziały (weights), a choice to None.
+def decide(choice, weights=None):
+    with metrics.rerun_scope("game1_decision"):
+        game = st.session_state.g1_game
+        if game.finished:
+            return
+        with metrics.phase("sampling"):
+            game.ensure_round_returns(game.round + 1)
+        # Zwroty są już wylosowane, więc step() to aktualizacja benchmarków i kapitału
+        prev_capital = game.capital
+        leverage = st.session_state.get("g1_leverage", False)
+        with metrics.phase("benchmarks"):
+            if weights is None:
+                decision = game.step(choice, leverage)
+            else:
+                decision = game.step_portfolio(weights, leverage)
+        log = decision_log()
+        if log is not None:
+            with metrics.phase("decision_log"):
+                log.append(st.session_state.g1_log_id, decision)
+        room = current_room()
+        if room is not None:
+            with metrics.phase("room"):
+                room.record(decision, prev_capital)
+
+# Decyzja z listy instrumentów (duży zestaw); w callbacku lista ma już wybraną wartość
+def decide_picked():
+    decide(st.session_state.g1_pick)
+
+# Portfel z suwaków udziałów (procenty nie muszą sumować się do 100, normalizuje je step_portfolio)
+def portfolio_raw_weights() -> list:
+    return [st.session_state.get(f"g1_w_{k}", 0) for k in CHOICES]
+
+def decide_portfolio():
+    decide(None, weights=portfolio_raw_weights())
+
+# Widok rundy (wynik, wykres, decyzja) jako fragment: kliknięcie decyzji odświeża tylko ten fragment,
+# bez ponownego wykonania całego skryptu (konfiguracji strony, CSS i routera).
+# Pełny rerun robimy dopiero po ostatniej rundzie, żeby przejść do podsumowania.
+@st.fragment
+def game_round_panel():
+    with metrics.rerun_scope("game1_fragment", state_size=lambda: deep_sizeof(st.session_state.to_dict())):
+        game = st.session_state.g1_game
+        horizon = st.session_state.g1_horizon
+        if game.finished:
+            st.rerun()
+
+        current_idx = game.round
+        current_cap = game.history_user[-1]
+        prev_cap = game.history_user[-2] if len(game.history_user) > 1 else START_CAPITAL
+        pct_change_show = ((current_cap - prev_cap) / prev_cap) * 100
+
+        # W grze na notowaniach daty ukrywamy do podsumowania (znając datę, łatwo zgadnąć dalszy przebieg rynku)
+        title = f"Runda {current_idx + 1} / {game.total_rounds}"
+        if "g1_history_start" not in st.session_state:
+            title += f" ({round_label(horizon, current_idx)})"
+        st.subheader(title)
+        if "g1_room" in st.session_state:
+            st.caption(f"Pokój {st.session_state.g1_room}")
+
+        st.metric("Twój Kapitał", f"{fmt_pln_num(current_cap)} PLN", fmt_pct(pct_change_show))
+
+        with metrics.phase("chart_data"):
+            chart_data = chart_frame(game, CHART_LIVE_POINTS)
+        with metrics.phase("chart_render"):
+            st.vega_lite_chart(chart_data, chart_spec(game.total_rounds))
+
+        if game.leverage_available:
+            st.warning("⚡ ODBLOKOWANO DŹWIGNIĘ (LEWAR x2)")
+            st.checkbox("Użyj dźwigni (x2 zyski/straty)", key="g1_leverage")
+
+        st.write(f"W co inwestujesz na {HORIZONS[horizon]['next_period']}?")
+        if game.portfolio:
+            portfolio_inputs()
+        elif len(CHOICES) <= BUTTON_CHOICES:
+            for start in range(0, len(CHOICES), CHOICE_COLUMNS):
+                cols = st.columns(CHOICE_COLUMNS)
+                for col, key in zip(cols, CHOICES[start:start + CHOICE_COLUMNS]):
+                    col.button(INSTRUMENTS[key]["label"], use_container_width=True, on_click=decide, args=(key,))
         else:
-            user_ret = 0.0
-
-        if leverage_active:
-            user_ret *= 2
-            if choice in ("SP500", "GOLD"):
-                user_ret = clamp(user_ret, -0.25, 0.25)
-            elif choice == "BTC":
-                user_ret = clamp(user_ret, -0.55, 0.55)
-
-        new_cap = current_cap * (1 + user_ret)
-
-        st.session_state.g1_history_user.append(new_cap)
-        st.session_state.g1_round += 1
-        st.session_state.g1_capital = new_cap
-
-        st.session_state.g1_decisions.append({
-            "round": next_round,
-            "choice": choice,
-            "leverage": leverage_active,
-            "return": user_ret,
-            "capital": new_cap
-        })
-
-        st.rerun()
+            st.selectbox("Instrument", CHOICES, format_func=lambda k: INSTRUMENTS[k]["label"], key="g1_pick")
+            st.button("Inwestuję", use_container_width=True, on_click=decide_picked)
+
+# Suwaki udziałów w trybie portfela; wartości zostają w stanie sesji, więc kolejna runda zaczyna od tego samego portfela
+def portfolio_inputs():
+    default = round(100 / len(CHOICES))
+    for start in range(0, len(CHOICES), CHOICE_COLUMNS):
+        cols = st.columns(CHOICE_COLUMNS)
+        for col, key in zip(cols, CHOICES[start:start + CHOICE_COLUMNS]):
+            col.slider(f"{INSTRUMENTS[key]['label']} (%)", 0, 100, value=default, step=5, key=f"g1_w_{key}")
+    raw = np.array(portfolio_raw_weights(), dtype=np.float64)
+    if raw.sum() == 0:
+        st.caption("Wszystkie udziały są zerowe: cały kapitał zostaje w gotówce.")
+    else:
+        st.caption("Portfel po normalizacji: " + portfolio_label(raw / raw.sum()))
+    st.button("Inwestuję", use_container_width=True, on_click=decide_portfolio)
+
+# Opis portfela: niezerowe udziały od największego
+def portfolio_label(weights) -> str:
+    order = np.argsort(-np.asarray(weights), kind="stable")
+    return ", ".join(f"{INSTRUMENTS[CHOICES[c]]['label']} {weights[c]:.0%}" for c in order if weights[c] > 0)
+
+# Klucz podsumowania zakończonej gry: skrót decyzji (z udziałami portfela), zwrotów ścieżki i ustawień gry.
+# Ta sama gra daje ten sam klucz, więc kolejne reruny podsumowania (i powtórki tej samej gry) biorą wynik z pamięci.
+# Ścieżkę gry z ziarnem wyznacza ziarno (z horyzontem), więc klucz nie potrzebuje zwolnionej ścieżki (release_path).
+def summary_key(game, horizon: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{horizon}|{game.start_capital}|{game.rebalance_cost}|{game.portfolio}".encode())
+    h.update(game.decisions.tobytes())
+    if game.weights is not None:
+        h.update(game.weights.tobytes())
+    if game.seed is not None:
+        h.update(f"|seed {game.seed}".encode())
+    else:
+        h.update(np.ascontiguousarray(game.path[:game.total_rounds]).tobytes())
+    return h.hexdigest()
+
+# Wszystko, co podsumowanie liczy z zakończonej gry: dane wykresu, tabela decyzji z kosztem odstępstw
+# od strategii optymalnej, ocena inwestora i miary ryzyka gracza i benchmarków.
+# Gra nie jest częścią klucza pamięci (_game); wyznacza go summary_key. history to gra na prawdziwych notowaniach.
+@st.cache_data(show_spinner=False, max_entries=1000)
+def cached_summary(key: str, horizon: str, history: bool, _game) -> dict:
+    game = _game
+    if game.path is None:
+        game.ensure_round_returns(game.total_rounds)
+    d = game.decisions
+    out = {"chart": chart_frame(game), "decisions": None, "regret": None}
+
+    # Porównanie z optymalną strategią dla modelu zwrotów (tabele liczone raz, patrz optimal_policy.py)
+    # Strategia optymalna wybiera jeden instrument na rundę, więc portfeli z nią nie porównujemy;
+    # zakłada też rynek z modelu zwrotów, więc pomijamy ją w grze na prawdziwych notowaniach
+    regret = None
+    if len(d) and POLICY_SUPPORTED and not game.portfolio and not history:
+        regret = decision_regret(horizon_policy(horizon), game.path, d["choice"], d["leverage"])
+        out["regret"] = {"optimal": int(regret["optimal"].sum()), "total": regret_pct(regret["regret"].sum())}
+    if len(d):
+        df_dec = pd.DataFrame(d)
+        map_choice = {CHOICE_CODE[k]: INSTRUMENTS[k]["label"] for k in CHOICE_CODE}
+        if game.portfolio:
+            df_dec["Instrument"] = [portfolio_label(w) for w in game.weights]
+        else:
+            df_dec["Instrument"] = df_dec["choice"].map(map_choice)
+        df_dec["Lewar"] = df_dec["leverage"].map({True: "Tak", False: "Nie"})
+        df_dec["Zwrot %"] = (df_dec["return"] * 100).round(2)
+        df_dec["Kapitał (PLN)"] = df_dec["capital"].round(2)
+        columns = ["round", "Instrument", "Lewar", "Zwrot %", "Kapitał (PLN)"]
+        if regret is not None:
+            best = pd.Series(regret["best_choice"]).map(map_choice)
+            df_dec["Najlepszy wybór"] = best.where(~regret["best_leverage"], best + " x2")
+            df_dec["Koszt decyzji %"] = regret_pct(regret["regret"]).round(2)
+            columns += ["Najlepszy wybór", "Koszt decyzji %"]
+        out["decisions"] = df_dec[columns].rename(columns={"round": "Runda"})
+
+    out["scores"] = game.score()
+    periods_per_year = 12 * HORIZONS[horizon]["periods_per_month"]
+    out["risk"] = risk_frame(risk_stats(game.history[:game.round + 1], periods_per_year)) if len(d) else None
+    return out
 
 def show_game1_summary():
     st.header("Podsumowanie Gry Inwestycyjnej")
-
-    start_cap = 10000.0
-    end_cap = st.session_state.g1_history_user[-1]
+    game = st.session_state.g1_game
+    horizon = st.session_state.g1_horizon
+    history_start = st.session_state.get("g1_history_start")
+    with metrics.phase("summary"):
+        summary = cached_summary(summary_key(game, horizon), horizon, history_start is not None, game)
+
+    start_cap = game.start_capital
+    end_cap = game.history_user[-1]
     user_ret_pct = ((end_cap - start_cap) / start_cap) * 100
 
-    sp_end = st.session_state.hist_sp[-1]
-    gold_end = st.session_state.hist_gold[-1]
-    btc_end = st.session_state.hist_btc[-1]
-
-    sp_ret = (sp_end / 10000.0 - 1) * 100
-    gold_ret = (gold_end / 10000.0 - 1) * 100
-    btc_ret = (btc_end / 10000.0 - 1) * 100
+    bench_end = game.history[game.round, :len(RISKY_KEYS)]
+    shown = range(len(RISKY_KEYS))
+    if len(RISKY_KEYS) > SUMMARY_BENCHMARKS:
+        shown = np.argsort(-bench_end, kind="stable")[:SUMMARY_BENCHMARKS]
 
     # ✅ kafelki jak na screenie
-    render_summary_cards([
-        {"title": "Twój Wynik", "value_num_str": fmt_pln_num(end_cap), "delta_pct": user_ret_pct},
-        {"title": "S&P 500", "value_num_str": fmt_pln_num(sp_end), "delta_pct": sp_ret},
-        {"title": "Złoto", "value_num_str": fmt_pln_num(gold_end), "delta_pct": gold_ret},
-        {"title": "Bitcoin", "value_num_str": fmt_pln_num(btc_end), "delta_pct": btc_ret},
-    ])
+    with metrics.phase("html"):
+        render_summary_cards(
+            [{"title": "Twój Wynik", "value_num_str": fmt_pln_num(end_cap), "delta_pct": user_ret_pct}] +
+            [{"title": INSTRUMENTS[RISKY_KEYS[i]]["label"], "value_num_str": fmt_pln_num(bench_end[i]),
+              "delta_pct": (bench_end[i] / start_cap - 1) * 100} for i in shown]
+        )
+    if len(RISKY_KEYS) > SUMMARY_BENCHMARKS:
+        st.caption(f"Najlepsze {SUMMARY_BENCHMARKS} z {len(RISKY_KEYS)} instrumentów; wszystkie są na wykresie.")
+
+    history_date = None
+    if history_start is not None:
+        history = configured_history(horizon)
+        history_date = str(history.dates[history_start])
+        st.caption(f"Prawdziwe notowania: {history.label(history_start)} – "
+                   f"{history.label(history_start + game.total_rounds - 1)}")
+    elif "g1_room" in st.session_state:
+        st.caption(f"Gra w pokoju {st.session_state.g1_room} (numer gry: {game.seed})")
+    elif game.scenario is not None:
+        st.caption(f"Scenariusz z banku: nr {game.scenario}")
+    elif game.seed is not None:
+        st.caption(f"Numer gry: {game.seed} (wpisz go na starcie, aby zagrać tę samą grę)")
 
     # ✅ reszta: wraca dokładnie jak w “dobrym końcu gry”
     st.markdown("---")
-    chart_data = pd.DataFrame({
-        "S&P 500": pad_history(st.session_state.hist_sp, TOTAL_ROUNDS),
-        "Złoto": pad_history(st.session_state.hist_gold, TOTAL_ROUNDS),
-        "Bitcoin": pad_history(st.session_state.hist_btc, TOTAL_ROUNDS),
-        "Twój Kapitał": pad_history(st.session_state.g1_history_user, TOTAL_ROUNDS)
-    })
-    st.line_chart(chart_data)
+    with metrics.phase("chart_render"):
+        st.vega_lite_chart(summary["chart"], chart_spec(game.total_rounds))
 
     st.markdown("---")
     st.subheader("Twoje decyzje")
-    if st.session_state.g1_decisions:
-        df_dec = pd.DataFrame(st.session_state.g1_decisions)
-        map_choice = {"SP500": "S&P 500", "GOLD": "Złoto", "BTC": "Bitcoin", "CASH": "Gotówka"}
-        df_dec["Instrument"] = df_dec["choice"].map(map_choice)
-        df_dec["Lewar"] = df_dec["leverage"].map({True: "Tak", False: "Nie"})
-        df_dec["Zwrot %"] = (df_dec["return"] * 100).round(2)
-        df_dec["Kapitał (PLN)"] = df_dec["capital"].round(2)
-        df_dec = df_dec[["round", "Instrument", "Lewar", "Zwrot %", "Kapitał (PLN)"]].rename(columns={"round": "Runda"})
+    if len(game.decisions):
+        df_dec = summary["decisions"]
         st.dataframe(df_dec, use_container_width=True)
+        regret = summary["regret"]
+        if regret is not None:
+            st.caption(
+                f"Decyzje zgodne ze strategią optymalną: {regret['optimal']} z {len(df_dec)}. "
+                f"Łączny koszt odstępstw: {regret['total']:.1f}% kapitału. "
+                "Strategia optymalna maksymalizuje oczekiwany logarytm kapitału końcowego, znając tylko model zwrotów "
+                "i ostatnie wzrosty i spadki (nie zna przyszłości); koszt decyzji to utracony oczekiwany przyrost."
+            )
+
+        st.markdown("---")
+        st.subheader("Szczęście czy decyzje?")
+        if alternative_paths_ready(horizon):
+            whatif_section(game, horizon, history_start is not None)
+        else:
+            # Ścieżki liczą się jeszcze w tle (zlecone przy starcie gry); reszta podsumowania na nie nie czeka
+            background_worker().submit(alternative_paths, horizon)
+            whatif_pending(horizon)
+
+        st.markdown("---")
+        st.subheader("Ryzyko")
+        st.dataframe(summary["risk"], use_container_width=True)
+        st.caption(
+            "Maks. obsunięcie to największy spadek od wcześniejszego szczytu. Zmienność, Sharpe i Sortino są w skali "
+            "roku (stopa wolna od ryzyka 0). VaR to strata w rundzie, której nie przekracza 95% rund; CVaR to średnia "
+            "strata w pozostałych 5%. Pod wodą: rundy poniżej wcześniejszego szczytu."
+        )
 
     st.markdown("---")
     st.subheader("Ocena inwestora")
-    scores = compute_player_scores()
+    scores = summary["scores"]
+
+    # Wynik zapisujemy raz na grę; submit tylko dodaje rekord do kolejki zapisu.
+    # Miejsce w rankingu liczymy też raz (rank liczy tylko lepsze gry, więc nie czeka na zapis)
+    # i trzymamy w stanie sesji, żeby reruny podsumowania nie pytały bazy.
+    store = results_store()
+    if store is not None and not st.session_state.get("g1_saved"):
+        with metrics.phase("save"):
+            store.submit(game_record(game, scores, horizon, st.session_state.get("player"), history_date))
+            if history_start is None:
+                st.session_state.g1_rank = store.rank(horizon, game.capital, game.portfolio)
+        st.session_state.g1_saved = True
+    # Podsumowanie jest już w pamięci podręcznej, a wynik zapisany, więc sesja nie musi trzymać ścieżki gry z ziarnem;
+    # ścieżka pokoju jest wspólna dla uczestników, więc jej nie zwalniamy (odtworzenie dałoby prywatną kopię)
+    if "g1_room" not in st.session_state:
+        game.release_path()
     st.info(investor_sentence(scores["rationality"], scores["risk"]))
 
     c1, c2 = st.columns(2)
@@ -572,35 +670,156 @@ def show_game1_summary():
         st.metric("Skłonność do ryzyka (0–100)", scores["risk"])
 
     st.markdown("**Dlaczego taka ocena?**")
-    st.markdown("""
-- **Racjonalność spada**, jeśli często trzymasz instrument, który ma **serię spadków** oraz jeśli używasz **lewara po spadkach**.  
-- Dodatkowo racjonalność spada przy **overtradingu** (zbyt częste zmiany) oraz przy „**kupowaniu po euforii**” (wejście po dużym wzroście).  
-- **Skłonność do ryzyka rośnie**, jeśli często wybierasz **Bitcoin** i/lub używasz **lewara**, a spada przy częstej **gotówce** oraz (lekko) przy częstym **S&P 500**.  
-- Wliczamy też **koncentrację** (jeśli prawie zawsze jedno aktywo, zwłaszcza ryzykowne).
-""")
+    st.markdown(score_explanation_md())
 
     for n in scores["notes"]:
         st.write("• " + n)
 
     st.markdown("---")
+    if store is not None:
+        if history_start is not None:
+            st.caption("Gry na prawdziwych notowaniach nie trafiają do rankingu.")
+        else:
+            mode = ", tryb portfela" if game.portfolio else ""
+            st.caption(f"Miejsce w rankingu ({HORIZONS[horizon]['label']}{mode}): {st.session_state.g1_rank}.")
+        if st.button("Ranking", use_container_width=True):
+            next_page("leaderboard")
     if st.button("Zagraj ponownie (reset)", use_container_width=True):
-        for k in list(st.session_state.keys()):
-            if k.startswith("g1_") or k.startswith("hist_") or k.startswith("returns_"):
-                del st.session_state[k]
-        init_game_state()
-        st.session_state.page = "game1_intro"
-        st.rerun()
-
-# Router stron aplikacji
-if st.session_state.page == "game1_intro":
-    show_game1_intro()
-elif st.session_state.page == "game1":
-    show_game1()
-elif st.session_state.page == "game1_summary":
-    show_game1_summary()
-
-
-
+        restart_game("game1_intro")
+    if st.button("Powtórz tę samą grę", use_container_width=True):
+        restart_game("game1", seed=game.seed, scenario=game.scenario, horizon=horizon, portfolio=game.portfolio,
+                     history=history_start is not None, history_start=history_start)
+
+# Powtórka decyzji gracza na ścieżkach alternatywnych (muszą być już policzone, alternative_paths_ready)
+def whatif_section(game, horizon: str, history: bool):
+    d = game.decisions
+    with metrics.phase("whatif"):
+        weights = None if game.weights is None else game.weights.tobytes()
+        finals = cached_whatif_finals(horizon, d["choice"].tobytes(), d["leverage"].tobytes(), game.start_capital,
+                                      weights, game.rebalance_cost)
+        whatif = whatif_summary(finals, game.capital, game.start_capital)
+    market = "losowych przebiegach rynku z modelu zwrotów (nie z historii)" if history else "innych przebiegach rynku"
+    st.write(
+        f"Te same decyzje ({'udziały' if game.portfolio else 'instrumenty'} i dźwignia w tych samych rundach) na {whatif['paths']} {market} "
+        f"dają zwykle {fmt_pln_num(whatif['quantiles']['p25'])}–"
+        f"{fmt_pln_num(whatif['quantiles']['p75'])} PLN (mediana {fmt_pln_num(whatif['quantiles']['p50'])} PLN). "
+        f"Twój wynik jest lepszy niż {whatif['percentile']:.0f}% z nich."
+    )
+    st.vega_lite_chart(whatif_frame(whatif), whatif_spec(float(game.capital)), use_container_width=True)
+    st.caption(
+        f"Strata kapitału w {whatif['loss_probability']:.0%} przebiegów. Wysoki percentyl oznacza, "
+        "że rynek Ci sprzyjał; niski, że te same decyzje zwykle kończą się lepiej."
+    )
 
+# Zamiast powtórki decyzji, dopóki ścieżki alternatywne się liczą: fragment co WHATIF_POLL s sprawdza,
+# czy są gotowe, i wtedy rysuje stronę od nowa (podsumowanie jest w pamięci podręcznej, więc to tanie)
+@st.fragment(run_every=WHATIF_POLL)
+def whatif_pending(horizon: str):
+    if alternative_paths_ready(horizon):
+        st.rerun()
+    st.info("Liczymy inne przebiegi rynku do porównania, ta część pojawi się za chwilę.")
 
+def show_leaderboard():
+    st.header("Ranking")
+    store = results_store()
+    if store is None:
+        st.info("Zapis wyników jest wyłączony.")
+    else:
+        horizons = list(HORIZONS)
+        c1, c2 = st.columns(2)
+        horizon = c1.selectbox("Horyzont", horizons, index=horizons.index(st.session_state.g1_horizon),
+                               format_func=lambda k: HORIZONS[k]["label"])
+        period = c2.radio("Okres", ["day", "all"], horizontal=True,
+                          format_func={"day": "Ostatnie 24 h", "all": "Wszystkie gry"}.get)
+        portfolio = st.radio("Tryb gry", list(GAME_MODES), index=int(st.session_state.g1_game.portfolio),
+                             format_func=GAME_MODES.get, horizontal=True)
+
+        with metrics.phase("leaderboard"):
+            rows = cached_leaderboard(horizon, period, portfolio)
+        st.caption(f"Ranking odświeża się co {LEADERBOARD_TTL} s; świeżo zakończona gra pojawi się w nim po chwili.")
+        if rows:
+            df = pd.DataFrame(rows)
+            table = pd.DataFrame({
+                "Miejsce": range(1, len(df) + 1),
+                "Gracz": df["player"].fillna("(bez pseudonimu)"),
+                "Kapitał (PLN)": df["final_capital"].round(0),
+                "Wynik %": ((df["final_capital"] / START_CAPITAL - 1) * 100).round(2),
+                "Ryzyko": df["risk"],
+                "Racjonalność": df["rationality"],
+                "Numer gry": df["seed"],
+            })
+            st.dataframe(table, hide_index=True, use_container_width=True)
+        else:
+            st.write("Brak zapisanych gier.")
+
+    if st.button("Wróć", use_container_width=True):
+        next_page("game1_summary" if st.session_state.g1_game.finished else "game1_intro")
+
+# Panel prowadzącego zajęcia: tworzy pokój i pokazuje na żywo, jak grają uczestnicy
+def show_room():
+    st.header("Pokój klasy")
+    room = room_registry().get(st.session_state.get("room_admin"))
+    if room is None:
+        horizon = st.radio("Horyzont gry w pokoju", list(HORIZONS), format_func=lambda k: HORIZONS[k]["label"],
+                           horizontal=True)
+        if st.button("Utwórz pokój", use_container_width=True):
+            st.session_state.room_admin = room_registry().create(horizon).code
+            st.rerun()
+    else:
+        st.subheader(f"Kod pokoju: {room.code}")
+        st.caption(f"{HORIZONS[room.horizon]['label']}, numer gry {room.seed}. "
+                   f"Uczestnicy wpisują kod na stronie startowej albo otwierają link z ?room={room.code}.")
+        room_dashboard_panel(room)
+        if st.button("Zamknij panel i utwórz nowy pokój", use_container_width=True):
+            del st.session_state.room_admin
+            st.rerun()
+
+    if st.button("Wróć", use_container_width=True):
+        next_page("game1_intro")
+
+# Statystyki pokoju odświeżane cyklicznie samym fragmentem; czytamy gotowe liczniki,
+# więc koszt odświeżenia nie rośnie z liczbą uczestników
+@st.fragment(run_every=ROOM_REFRESH)
+def room_dashboard_panel(room):
+    with metrics.rerun_scope("room_fragment"):
+        with metrics.phase("room_snapshot"):
+            snap = room.snapshot()
+        players = snap["players"]
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Uczestnicy", players)
+        c2.metric("Ukończyli grę", snap["finished"])
+        c3.metric("Średni kapitał", f"{fmt_pln_num(snap['current_sum'] / players) if players else '–'} PLN")
+        if not players:
+            st.write("Czekamy na pierwszych uczestników.")
+            return
+
+        st.markdown("**Kapitał uczestników teraz**")
+        st.bar_chart(capital_hist_frame(snap["current_hist"], CAPITAL_EDGES), x="Kapitał (PLN)", y="Uczestnicy",
+                     sort=False)
+
+        df = room_round_frame(snap, [INSTRUMENTS[k]["label"] for k in CHOICES])
+        if len(df):
+            st.markdown("**Wybory instrumentów w rundach (% decyzji)**")
+            st.area_chart(df[[INSTRUMENTS[k]["label"] for k in CHOICES]])
+            st.markdown("**Użycie dźwigni (% decyzji)**")
+            st.line_chart(df["Dźwignia"].iloc[room.leverage_from:])
+            st.markdown("**Średni kapitał uczestników po rundzie**")
+            st.line_chart(df["Średni kapitał"])
 
+# Router stron aplikacji
+# (st.rerun() przerywa stronę wyjątkiem, więc pomiar reruna zamykamy w finally)
+rerun_page = st.session_state.page
+try:
+    with metrics.phase("page"):
+        if st.session_state.page == "game1_intro":
+            show_game1_intro()
+        elif st.session_state.page == "game1":
+            show_game1()
+        elif st.session_state.page == "game1_summary":
+            show_game1_summary()
+        elif st.session_state.page == "leaderboard":
+            show_leaderboard()
+        elif st.session_state.page == "room":
+            show_room()
+finally:
+    metrics.end_rerun(rerun_page, state_size=lambda: deep_sizeof(st.session_state.to_dict()))
@@ -0,0 +1,178 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import magic
+from streamlit.testing.v1 import AppTest
+
+from game_engine import CHOICES, TOTAL_ROUNDS
+from memsize import deep_sizeof
+from decision_log import LOG_ENV
+from results_store import DB_ENV
+from returns_model import INSTRUMENTS
+
+# Test obciążeniowy: N równoległych sesji przechodzi intro -> rundy gry -> podsumowanie
+# w tym samym procesie (jak wątki skryptów na serwerze Streamlit), bez sieci i przeglądarki.
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "investment_game.py")
+
+# AppTest nie jest pisany pod równoległe sesje w jednym procesie; dwie poprawki, bez których
+# przy szybkich rerunach część sesji kończy się pustą stroną:
+# - AppTest kompiluje skrypt przy każdym run(), a równoległe ast.parse w Pythonie 3.11 potrafi się wysypać
+#   ("AST constructor recursion depth mismatch"). Serwer kompiluje skrypt raz, więc kompilujemy po kolei.
+# - każdy run() podstawia własny atrapowy Runtime pod globalny singleton i na końcu go zeruje, także
+#   w trakcie reruna innej sesji. Po wyzerowaniu zwracamy ostatnią atrapę (są wymienne).
+_compile_lock = threading.Lock()
+_add_magic = magic.add_magic
+_last_runtime = None
+
+def _add_magic_serialized(code, script_path):
+    with _compile_lock:
+        return _add_magic(code, script_path)
+
+def _shared_runtime(cls):
+    global _last_runtime
+    if cls._instance is not None:
+        _last_runtime = cls._instance
+    if _last_runtime is None:
+        raise RuntimeError("Runtime hasn't been created!")
+    return _last_runtime
+
+magic.add_magic = _add_magic_serialized
+Runtime.instance = classmethod(_shared_runtime)
+Runtime.exists = classmethod(lambda cls: cls._instance is not None or _last_runtime is not None)
+
+def _button(at, label: str):
+    for b in at.button:
+        if b.label == label:
+            return b
+    raise LookupError(f"Brak przycisku {label!r} na stronie {at.session_state['page']!r}")
+
+# Czas run() przypisujemy stronie, na której skończył się rerun. Ostatnia decyzja przełącza grę
+# na podsumowanie (st.rerun w tym samym run()), więc jej czas to render podsumowania, a nie rundy gry.
+def _timed(samples, at, action):
+    t0 = time.perf_counter()
+    action()
+    samples.append((at.session_state["page"], time.perf_counter() - t0))
+
+# Jedna sesja gracza: każde run() to jeden pełny rerun skryptu po stronie serwera
+def play_session(session_id: int, seed: int, timeout: float) -> dict:
+    rng = random.Random(seed)
+    samples = []
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    _timed(samples, at, at.run)
+    _timed(samples, at, lambda: _button(at, "Start gry").click().run())
+
+    while at.session_state["page"] == "game1":
+        if at.checkbox:
+            at.checkbox[0].set_value(rng.random() < 0.3)
+        key = rng.choice(CHOICES)
+        if at.selectbox:
+            # Duży zestaw instrumentów: wybór z listy zamiast przycisków
+            at.selectbox(key="g1_pick").set_value(key)
+            label = "Inwestuję"
+        else:
+            label = INSTRUMENTS[key]["label"]
+        _timed(samples, at, lambda: _button(at, label).click().run())
+        if at.exception:
+            raise RuntimeError(f"Sesja {session_id}: {at.exception[0].message}")
+
+    if at.session_state["page"] != "game1_summary":
+        raise RuntimeError(f"Sesja {session_id} skończyła na stronie {at.session_state['page']!r}")
+
+    state = at.session_state.to_dict()
+    return {
+        "samples": samples,
+        "state_bytes": deep_sizeof(state),
+        "state_bytes_by_key": {k: deep_sizeof(v) for k, v in state.items()},
+    }
+
+def _percentiles(values_s) -> dict:
+    ms = np.asarray(values_s) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(ms.mean()), "max": float(ms.max()), "count": int(ms.size)}
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(APP_PATH),
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_load_test(n_sessions: int, concurrency: int, seed: int = 0, timeout: float = 60.0) -> dict:
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+        results = list(pool.map(lambda i: play_session(i, seed + i, timeout), range(n_sessions)))
+    wall = time.perf_counter() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    samples = [s for r in results for s in r["samples"]]
+    by_page = {}
+    for page, dt in samples:
+        by_page.setdefault(page, []).append(dt)
+    state_bytes = np.array([r["state_bytes"] for r in results])
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "sessions": n_sessions,
+        "concurrency": concurrency,
+        "rounds": TOTAL_ROUNDS,
+        "wall_s": wall,
+        "reruns": len(samples),
+        "throughput_reruns_per_s": len(samples) / wall,
+        "throughput_games_per_s": n_sessions / wall,
+        "latency_ms": _percentiles([dt for _, dt in samples]),
+        "latency_ms_by_page": {page: _percentiles(v) for page, v in by_page.items()},
+        "session_state_bytes": {"mean": float(state_bytes.mean()), "max": int(state_bytes.max())},
+        # ru_maxrss na Linuksie jest w KiB; przyrost szczytowego RSS dzielimy na sesje
+        "rss_peak_mb": rss_after / 1024,
+        "rss_growth_per_session_kb": max(0, rss_after - rss_before) / n_sessions,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test obciążeniowy aplikacji: równoległe sesje rozgrywające całą grę.")
+    parser.add_argument("--sessions", type=int, default=20, help="liczba sesji (domyślnie 20)")
+    parser.add_argument("--concurrency", type=int, default=10, help="ile sesji działa jednocześnie (domyślnie 10)")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno decyzji symulowanych graczy")
+    parser.add_argument("--timeout", type=float, default=60.0, help="limit czasu jednego reruna w sekundach")
+    parser.add_argument("--out", help="zapisz wynik JSON do pliku (domyślnie tylko na standardowe wyjście)")
+    parser.add_argument("--db", help=f"baza wyników dla sesji testowych (domyślnie plik tymczasowy, nie {DB_ENV})")
+    args = parser.parse_args(argv)
+
+    # Gry botów zapisujemy jak prawdziwe (to część obciążenia), ale nie do rankingu graczy.
+    # Katalogu nie usuwamy: wątek zapisu dopisuje ostatnią paczkę przy wyjściu z procesu.
+    # Dziennik decyzji botów trafia obok bazy wyników.
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "results.db")
+    os.environ[DB_ENV] = args.db
+    os.environ[LOG_ENV] = os.path.join(os.path.dirname(os.path.abspath(args.db)), "decisions.bin")
+
+    # AppTest loguje ostrzeżenia przy każdym rerunie; przy setkach sesji zagłuszają wynik
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    report = run_load_test(args.sessions, args.concurrency, seed=args.seed, timeout=args.timeout)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import sys
+import weakref
+
+import numpy as np
+
+# Obiekty współdzielone przez wszystkie sesje procesu (ścieżka pokoju, parametry horyzontu z lru_cache).
+# Właściciel rejestruje je raz (mark_shared); deep_sizeof nie wlicza ich ani ich widoków do żadnej sesji,
+# więc w procesie zajmują pamięć raz, a nie raz na sesję. Wpis znika razem z obiektem.
+_shared = {}
+
+def _register(obj):
+    key = id(obj)
+    try:
+        _shared[key] = weakref.ref(obj, lambda _, key=key: _shared.pop(key, None))
+    except TypeError:
+        # Obiekty bez słabych referencji (słowniki) rejestrują tylko właściciele żyjący do końca procesu
+        _shared[key] = lambda obj=obj: obj
+
+# Dla widoku rejestrujemy też tablicę, która jest właścicielem danych: NumPy wskazuje ją jako base
+# każdego kolejnego widoku, także widoku z widoku
+def mark_shared(obj):
+    _register(obj)
+    if isinstance(obj, np.ndarray):
+        root = obj
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        if root is not obj:
+            _register(root)
+    return obj
+
+def is_shared(obj) -> bool:
+    ref = _shared.get(id(obj))
+    return ref is not None and ref() is obj
+
+# Przybliżony rozmiar obiektu razem z zawartością (listy, słowniki, atrybuty obiektów, tablice NumPy).
+# Każdy obiekt liczymy raz; widoki na wspólną pamięć (np. bank scenariuszy, obiekty z mark_shared)
+# liczymy bez danych bazowych.
+def deep_sizeof(obj, seen=None) -> int:
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or is_shared(obj):
+        return 0
+    seen.add(id(obj))
+
+    # getsizeof tablicy wlicza dane tylko wtedy, gdy tablica jest ich właścicielem;
+    # dla widoku doliczamy tablicę bazową, chyba że leży w pliku mapowanym do pamięci albo jest współdzielona
+    if isinstance(obj, np.ndarray):
+        size = sys.getsizeof(obj)
+        root = obj
+        while isinstance(root.base, np.ndarray) and not is_shared(root):
+            root = root.base
+        if root is not obj and root.base is None and not is_shared(root):
+            size += deep_sizeof(root, seen)
+        return size
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    return size
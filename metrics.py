@@ -0,0 +1,196 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+# Opcjonalny pomiar czasu faz każdego reruna aplikacji.
+# Włączamy go zmienną INVESTMENT_GAME_METRICS (katalog na pliki albo "1" dla ./metrics);
+# INVESTMENT_GAME_METRICS_PORT dodatkowo wystawia metryki w formacie Prometheus przez HTTP.
+# Bez tych zmiennych phase() to pusty kontekst, a pozostałe funkcje nic nie robią.
+
+METRICS_ENV = "INVESTMENT_GAME_METRICS"
+PORT_ENV = "INVESTMENT_GAME_METRICS_PORT"
+DEFAULT_DIR = "metrics"
+
+LOG_FILE = "reruns.jsonl"
+PROM_FILE = "metrics.prom"
+LOG_MAX_BYTES = 5_000_000
+LOG_BACKUPS = 5
+
+# Plik Prometheus odświeżamy co tyle sekund (przy końcu reruna), żeby nie pisać go przy każdym kliknięciu
+PROM_WRITE_INTERVAL = 5.0
+
+# Progi histogramu czasu faz w sekundach
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_setting = os.environ.get(METRICS_ENV, "")
+ENABLED = bool(_setting) and _setting != "0"
+METRICS_DIR = (DEFAULT_DIR if _setting == "1" else _setting) if ENABLED else None
+
+# Zbiorcze statystyki procesu: histogram na fazę i ostatnie rozmiary stanu sesji
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.reruns = 0
+        self.state_bytes_sum = 0
+        self.state_bytes_max = 0
+        self.last_prom_write = 0.0
+
+    def observe(self, name: str, seconds: float):
+        hist = self.phases.get(name)
+        if hist is None:
+            hist = self.phases[name] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, le in enumerate(BUCKETS):
+            if seconds <= le:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP investment_game_phase_seconds Czas fazy reruna aplikacji.",
+            "# TYPE investment_game_phase_seconds histogram",
+        ]
+        with self.lock:
+            for name, h in sorted(self.phases.items()):
+                for le, n in zip(BUCKETS, h["buckets"]):
+                    lines.append(f'investment_game_phase_seconds_bucket{{phase="{name}",le="{le}"}} {n}')
+                lines.append(f'investment_game_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {h["count"]}')
+                lines.append(f'investment_game_phase_seconds_sum{{phase="{name}"}} {h["sum"]:.6f}')
+                lines.append(f'investment_game_phase_seconds_count{{phase="{name}"}} {h["count"]}')
+            lines += [
+                "# HELP investment_game_reruns_total Liczba zmierzonych rerunów.",
+                "# TYPE investment_game_reruns_total counter",
+                f"investment_game_reruns_total {self.reruns}",
+                "# HELP investment_game_session_state_bytes_sum Suma rozmiarów stanu sesji na koniec rerunów.",
+                "# TYPE investment_game_session_state_bytes_sum counter",
+                f"investment_game_session_state_bytes_sum {self.state_bytes_sum}",
+                "# HELP investment_game_session_state_bytes_max Największy zmierzony stan sesji.",
+                "# TYPE investment_game_session_state_bytes_max gauge",
+                f"investment_game_session_state_bytes_max {self.state_bytes_max}",
+            ]
+        return "\n".join(lines) + "\n"
+
+_registry = _Registry()
+_local = threading.local()
+_logger = None
+_setup_lock = threading.Lock()
+
+class _PromHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = _registry.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Przygotowujemy log i (opcjonalnie) serwer HTTP raz na proces, przy pierwszym rerunie
+def _ensure_setup():
+    global _logger
+    if _logger is not None:
+        return
+    with _setup_lock:
+        if _logger is not None:
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        logger = logging.getLogger("investment_game.metrics")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(os.path.join(METRICS_DIR, LOG_FILE), maxBytes=LOG_MAX_BYTES,
+                                      backupCount=LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+        port = os.environ.get(PORT_ENV)
+        if port:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _PromHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _logger = logger
+
+# Zaczynamy pomiar reruna w bieżącym wątku skryptu. Zwraca False, gdy pomiar już trwa
+# (np. fragment wykonywany w ramach pełnego reruna), żeby go nie zaczynać od nowa.
+def begin_rerun() -> bool:
+    if not ENABLED or getattr(_local, "record", None) is not None:
+        return False
+    _local.record = {"start": time.perf_counter(), "phases": {}}
+    return True
+
+# Pomiar fragmentu strony: przy częściowym rerunie to osobny wpis, przy pełnym - część reruna
+@contextlib.contextmanager
+def rerun_scope(page: str, state_size=None):
+    started = begin_rerun()
+    try:
+        yield
+    finally:
+        if started:
+            end_rerun(page, state_size)
+
+# Mierzymy czas fazy reruna; fazy o tej samej nazwie w jednym rerunie sumujemy
+@contextlib.contextmanager
+def _timed_phase(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record = getattr(_local, "record", None)
+        if record is not None:
+            phases = record["phases"]
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - t0
+
+def phase(name: str):
+    return _timed_phase(name) if ENABLED else contextlib.nullcontext()
+
+# Kończymy pomiar: wpis do logu, aktualizacja histogramów i okresowy zapis pliku Prometheus.
+# state_size to funkcja licząca rozmiar stanu sesji; wywołujemy ją tylko przy włączonym pomiarze.
+def end_rerun(page: str, state_size=None):
+    record = getattr(_local, "record", None)
+    if not ENABLED or record is None:
+        return
+    _local.record = None
+    _ensure_setup()
+
+    total = time.perf_counter() - record["start"]
+    state_bytes = state_size() if state_size is not None else None
+    entry = {
+        "ts": time.time(),
+        "thread": threading.current_thread().name,
+        "page": page,
+        "total_ms": round(total * 1000, 3),
+        "phases_ms": {k: round(v * 1000, 3) for k, v in record["phases"].items()},
+        "state_bytes": state_bytes,
+    }
+    _logger.info(json.dumps(entry, ensure_ascii=False))
+
+    now = time.monotonic()
+    with _registry.lock:
+        _registry.reruns += 1
+        _registry.observe("rerun", total)
+        for name, seconds in record["phases"].items():
+            _registry.observe(name, seconds)
+        if state_bytes is not None:
+            _registry.state_bytes_sum += state_bytes
+            _registry.state_bytes_max = max(_registry.state_bytes_max, state_bytes)
+        write_prom = now - _registry.last_prom_write >= PROM_WRITE_INTERVAL
+        if write_prom:
+            _registry.last_prom_write = now
+    if write_prom:
+        write_prometheus_file()
+
+# Zapis atomowy: Prometheus (node_exporter textfile) nigdy nie widzi połowy pliku
+def write_prometheus_file():
+    if not ENABLED:
+        return
+    path = os.path.join(METRICS_DIR, PROM_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(_registry.prometheus_text())
+    os.replace(tmp, path)
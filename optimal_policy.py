@@ -0,0 +1,301 @@
+import argparse
+import functools
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from game_engine import CHOICES, LEVERAGE_CAP_BY_CODE, LEVERAGE_FLOOR_BY_CODE, LEVERAGE_MULT, START_CAPITAL
+from horizons import DEFAULT_HORIZON, HORIZONS, horizon_params
+from returns_model import MOMENTUM_LOOKBACK, PARAMS, RISKY_KEYS
+from ui_helpers import fmt_pln_num
+
+# Wzorcowa strategia dla modelu zwrotów, liczona programowaniem dynamicznym (indukcja wsteczna).
+# Stan rynku przed rundą t to, dla każdego instrumentu, znaki jego ostatnich MOMENTUM_LOOKBACK zwrotów
+# (od nich zależy streak_bias); do tego numer rundy, który wyznacza też dostępność dźwigni.
+# Okno znaków zapisujemy jako bity (najnowszy znak w bicie 0, 1 = wzrost); w pierwszych rundach
+# okno jest krótsze (zwroty sprzed gry liczą się jako 0). Stan łączny to 16 x 16 x 16 okien.
+# Decyzje gracza nie wpływają na rynek, więc wartość stanu zależy tylko od rynku i rundy.
+#
+# Cele: "log" maksymalizuje oczekiwany logarytm kapitału końcowego (kryterium Kelly'ego),
+# "ev" oczekiwany kapitał końcowy. Tabele (wartości i najlepsza akcja dla każdej rundy i stanu)
+# zapisujemy do plików .npz, więc podsumowanie gry tylko z nich czyta.
+
+OBJECTIVES = ("log", "ev")
+DEFAULT_OBJECTIVE = "log"
+
+# Katalog plików z tabelami (INVESTMENT_GAME_POLICY_DIR); "0" wyłącza zapis na dysk
+POLICY_DIR_ENV = "INVESTMENT_GAME_POLICY_DIR"
+DEFAULT_POLICY_DIR = "policy_cache"
+
+# Zmiana sposobu liczenia tabel unieważnia stare pliki
+TABLE_VERSION = 3
+
+# Akcje: kody instrumentów bez dźwigni, potem instrumenty ryzykowne z dźwignią
+N_RISKY = len(RISKY_KEYS)
+ACTION_CHOICE = np.array(list(range(len(CHOICES))) + list(range(N_RISKY)))
+ACTION_LEVERAGE = np.array([False] * len(CHOICES) + [True] * N_RISKY)
+WINDOW = 1 << MOMENTUM_LOOKBACK
+
+# Stan łączny rośnie jak 16^N z liczbą instrumentów, więc tabele liczymy tylko dla zestawów
+# z trzema instrumentami ryzykownymi (jak domyślny); dla innych podsumowanie gry pomija porównanie
+POLICY_SUPPORTED = N_RISKY == 3
+
+# Liczba wzrostów w oknie znaków
+_POPCOUNT = np.array([bin(b).count("1") for b in range(WINDOW)])
+
+# Punkty siatki do całkowania rozkładu zwrotu między widełkami
+GRID_POINTS = 4001
+
+def _norm_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+# Rozkład zwrotu instrumentu przy danym przesunięciu trendu: mieszanka trzech rozkładów normalnych
+# (krach, rajd, zwykła runda) przycięta do widełek. Zwraca siatkę, gęstość na siatce
+# oraz masy prawdopodobieństwa w samych widełkach (zwroty przycięte do floor i cap).
+def _return_distribution(p: dict, i: int, bias: float):
+    lo, hi = p["ret_floor"][i], p["ret_cap"][i]
+    crash, rally = p["crash_p"][i], p["rally_p"][i]
+    parts = (
+        (crash, p["crash_mu"][i], p["crash_sigma"][i]),
+        (rally, p["rally_mu"][i], p["rally_sigma"][i]),
+        (1.0 - crash - rally, p["mean"][i] + bias, p["vol"][i]),
+    )
+    x = np.linspace(lo, hi, GRID_POINTS)
+    pdf = np.zeros(GRID_POINTS)
+    mass_lo = mass_hi = 0.0
+    for w, mu, sd in parts:
+        if w <= 0:
+            continue
+        pdf += w * np.exp(-0.5 * ((x - mu) / sd) ** 2) / (sd * math.sqrt(2 * math.pi))
+        mass_lo += w * _norm_cdf((lo - mu) / sd)
+        mass_hi += w * (1.0 - _norm_cdf((hi - mu) / sd))
+    return x, pdf, mass_lo, mass_hi
+
+# E[g(r) * 1{r > 0}] i E[g(r) * 1{r <= 0}] dla rozkładu z _return_distribution
+def _split_expectation(g, x, pdf, mass_lo, mass_hi):
+    up = x > 0
+    dens = g(x) * pdf
+    w = np.full(len(x), x[1] - x[0])
+    w[[0, -1]] *= 0.5
+    e_up = float((dens * w)[up].sum()) + g(x[-1]) * mass_hi
+    e_down = float((dens * w)[~up].sum()) + g(x[0]) * mass_lo
+    return e_up, e_down
+
+# Tabele jednego instrumentu indeksowane wynikiem trendu (liczba wzrostów minus spadków w oknie, +4):
+# prawdopodobieństwo wzrostu oraz E[g(zwrot) * 1{znak}] dla akcji bez i z dźwignią
+def instrument_moments(p: dict, objective: str) -> dict:
+    scores = np.arange(-MOMENTUM_LOOKBACK, MOMENTUM_LOOKBACK + 1)
+    p_up = np.zeros((N_RISKY, len(scores)))
+    gain = np.zeros((N_RISKY, 2, 2, len(scores)))
+    for i in range(N_RISKY):
+        lev_clip = (LEVERAGE_FLOOR_BY_CODE[i], LEVERAGE_CAP_BY_CODE[i])
+        for k, s in enumerate(scores):
+            bias = float(np.clip(s / MOMENTUM_LOOKBACK * p["mom_strength"][i], -p["mom_cap"][i], p["mom_cap"][i]))
+            x, pdf, m_lo, m_hi = _return_distribution(p, i, bias)
+            # Dzielimy przez całą masę z siatki, żeby błąd całkowania nie przesuwał wartości oczekiwanych
+            up, down = _split_expectation(np.ones_like, x, pdf, m_lo, m_hi)
+            p_up[i, k] = up / (up + down)
+            # Widełki dźwigni (leverage_cap i strata najwyżej 100%) obcinają tylko zwrot z dźwignią,
+            # jak w game_engine.leveraged_return
+            for lev, mult in ((0, 1.0), (1, float(LEVERAGE_MULT))):
+                clip = lev_clip if lev else (-np.inf, np.inf)
+                if objective == "log":
+                    g = lambda r, mult=mult, clip=clip: np.log1p(np.clip(r * mult, *clip))
+                else:
+                    g = lambda r, mult=mult, clip=clip: 1.0 + np.clip(r * mult, *clip)
+                up_g, down_g = _split_expectation(g, x, pdf, m_lo, m_hi)
+                gain[i, lev, 1, k] = up_g / (up + down)
+                gain[i, lev, 0, k] = down_g / (up + down)
+    return {"p_up": p_up, "gain": gain}
+
+# Długość okna znaków przed rundą t
+def window_length(t: int) -> int:
+    return min(t, MOMENTUM_LOOKBACK)
+
+# Wynik trendu (wzrosty minus spadki) dla każdego okna o długości length
+def window_scores(length: int) -> np.ndarray:
+    return 2 * _POPCOUNT[:1 << length] - length
+
+# Okno po dopisaniu znaku (0 spadek, 1 wzrost): tablica (okna x 2)
+def window_next(length: int) -> np.ndarray:
+    mask = (1 << min(length + 1, MOMENTUM_LOOKBACK)) - 1
+    bits = np.arange(1 << length)
+    return np.stack([(bits << 1) & mask, ((bits << 1) | 1) & mask], axis=1)
+
+def _cache_key(params: dict, total_rounds: int, leverage_from: int, objective: str) -> str:
+    h = hashlib.sha1()
+    h.update(json.dumps([TABLE_VERSION, total_rounds, leverage_from, objective, GRID_POINTS]).encode())
+    for k in sorted(params):
+        h.update(k.encode())
+        h.update(np.ascontiguousarray(params[k], dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+# Indukcja wsteczna. Wartość po ostatniej rundzie to 1 (ev, mnożnik kapitału) albo 0 (log).
+# value[t] i policy[t] mają kształt 16 x 16 x 16; w rundach t < 4 ważne są tylko
+# pierwsze 2**t okien na każdej osi.
+def solve(params=None, total_rounds: int = HORIZONS[DEFAULT_HORIZON]["rounds"],
+          leverage_from: int = HORIZONS[DEFAULT_HORIZON]["leverage_from"], objective: str = DEFAULT_OBJECTIVE) -> dict:
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Nieznany cel: {objective!r}")
+    if not POLICY_SUPPORTED:
+        raise ValueError(f"Strategię optymalną liczymy dla 3 instrumentów ryzykownych, a zestaw ma {N_RISKY}")
+    p = PARAMS if params is None else params
+    mom = instrument_moments(p, objective)
+    n_decisions = total_rounds - 1
+    value = np.zeros((n_decisions + 1, WINDOW, WINDOW, WINDOW), dtype=np.float32)
+    policy = np.zeros((n_decisions, WINDOW, WINDOW, WINDOW), dtype=np.int8)
+    value[n_decisions] = 1.0 if objective == "ev" else 0.0
+
+    for t in range(n_decisions - 1, -1, -1):
+        length = window_length(t)
+        n = 1 << length
+        nxt = window_next(length)
+        k = window_scores(length) + MOMENTUM_LOOKBACK
+        v_next = value[t + 1].astype(np.float64)
+        w = v_next[nxt[:, :, None, None, None, None], nxt[None, None, :, :, None, None], nxt[None, None, None, None, :, :]]
+        prob = [np.stack([1.0 - mom["p_up"][i, k], mom["p_up"][i, k]], axis=1) for i in range(N_RISKY)]
+
+        cont = np.einsum("ax,by,cz,axbycz->abc", *prob, w, optimize=True)
+        q = np.full((len(ACTION_CHOICE), n, n, n), -np.inf)
+        for a, (c, lev) in enumerate(zip(ACTION_CHOICE, ACTION_LEVERAGE)):
+            if lev and t < leverage_from:
+                continue
+            if c >= N_RISKY:
+                # Gotówka: kapitał bez zmian
+                q[a] = cont
+                continue
+            g = mom["gain"][c, int(lev)][:, k].T
+            if objective == "ev":
+                weights = list(prob)
+                weights[c] = g
+                q[a] = np.einsum("ax,by,cz,axbycz->abc", *weights, w, optimize=True)
+            else:
+                expand = [None] * N_RISKY
+                expand[c] = slice(None)
+                q[a] = cont + g.sum(axis=1)[tuple(expand)]
+        best = q.argmax(axis=0)
+        value[t, :n, :n, :n] = np.take_along_axis(q, best[None], axis=0)[0]
+        policy[t, :n, :n, :n] = best
+
+    return {"value": value, "policy": policy, "p_up": mom["p_up"], "gain": mom["gain"],
+            "objective": objective, "leverage_from": leverage_from}
+
+def configured_policy_dir():
+    path = os.environ.get(POLICY_DIR_ENV, DEFAULT_POLICY_DIR)
+    return None if path in ("", "0") else path
+
+# Tabele dla parametrów gry: z pliku, jeśli już były liczone, a w przeciwnym razie liczymy i zapisujemy
+def load_or_solve(params, total_rounds: int, leverage_from: int, objective: str = DEFAULT_OBJECTIVE) -> dict:
+    directory = configured_policy_dir()
+    path = None
+    if directory is not None:
+        key = _cache_key(PARAMS if params is None else params, total_rounds, leverage_from, objective)
+        path = os.path.join(directory, f"policy_{objective}_{total_rounds}_{key}.npz")
+        if os.path.exists(path):
+            with np.load(path) as f:
+                table = {k: f[k] for k in f.files}
+            table["objective"] = objective
+            table["leverage_from"] = leverage_from
+            return table
+
+    table = solve(params, total_rounds, leverage_from, objective)
+    if path is not None:
+        os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **{k: table[k] for k in ("value", "policy", "p_up", "gain")})
+        os.replace(tmp, path)
+    return table
+
+# Tabele dla horyzontu, raz na proces
+@functools.lru_cache(maxsize=None)
+def horizon_policy(horizon: str, objective: str = DEFAULT_OBJECTIVE) -> dict:
+    h = HORIZONS[horizon]
+    params = None if h["periods_per_month"] == 1 else horizon_params(horizon)
+    return load_or_solve(params, h["rounds"], h["leverage_from"], objective)
+
+# Okna znaków przed każdą z rund 0..n-1 dla ścieżki zwrotów (rundy x instrumenty)
+def path_windows(path, n: int) -> np.ndarray:
+    up = (np.asarray(path[:n]) > 0).astype(np.int64)
+    windows = np.zeros((n, N_RISKY), dtype=np.int64)
+    for lag in range(1, MOMENTUM_LOOKBACK + 1):
+        windows[lag:] |= up[:n - lag] << (lag - 1)
+    return windows
+
+# Ocena wszystkich akcji w rundach 0..n-1 na danej ścieżce: tablica (n x akcje);
+# akcje niedostępne (dźwignia przed odblokowaniem) mają -inf
+def path_action_values(table: dict, path, n: int) -> np.ndarray:
+    windows = path_windows(path, n)
+    t = np.arange(n)
+    lengths = np.minimum(t, MOMENTUM_LOOKBACK)
+    k = 2 * _POPCOUNT[windows] - lengths[:, None] + MOMENTUM_LOOKBACK
+    mask = (1 << np.minimum(t + 1, MOMENTUM_LOOKBACK)) - 1
+
+    # Wartości następnego stanu dla każdej kombinacji znaków (n x 2 x 2 x 2)
+    nxt = [(windows[:, i, None] << 1 | np.arange(2)) & mask[:, None] for i in range(N_RISKY)]
+    v_next = table["value"][t + 1].astype(np.float64)
+    w = v_next[t[:, None, None, None], nxt[0][:, :, None, None], nxt[1][:, None, :, None], nxt[2][:, None, None, :]]
+    prob = [np.stack([1.0 - table["p_up"][i, k[:, i]], table["p_up"][i, k[:, i]]], axis=1) for i in range(N_RISKY)]
+    cont = np.einsum("tx,ty,tz,txyz->t", *prob, w)
+
+    q = np.empty((n, len(ACTION_CHOICE)))
+    for a, (c, lev) in enumerate(zip(ACTION_CHOICE, ACTION_LEVERAGE)):
+        if c >= N_RISKY:
+            q[:, a] = cont
+            continue
+        g = table["gain"][c, int(lev)][:, k[:, c]].T
+        if table["objective"] == "ev":
+            weights = list(prob)
+            weights[c] = g
+            q[:, a] = np.einsum("tx,ty,tz,txyz->t", *weights, w)
+        else:
+            q[:, a] = cont + g.sum(axis=1)
+    q[np.ix_(t < table["leverage_from"], ACTION_LEVERAGE)] = -np.inf
+    return q
+
+# Najlepsza akcja i strata każdej decyzji gracza względem strategii optymalnej.
+# Dla celu "log" strata to utracony oczekiwany logarytmiczny przyrost kapitału (0 = decyzja optymalna),
+# dla "ev" to utracony oczekiwany kapitał końcowy w PLN przy kapitale sprzed decyzji.
+def decision_regret(table: dict, path, choices, leverage, capital_before=None) -> dict:
+    choices = np.asarray(choices, dtype=np.int64)
+    leverage = np.asarray(leverage, dtype=bool) & (choices < N_RISKY)
+    n = len(choices)
+    q = path_action_values(table, path, n)
+    best = q.argmax(axis=1)
+    played = np.where(leverage, len(CHOICES) + np.minimum(choices, N_RISKY - 1), choices)
+    gap = q[np.arange(n), best] - q[np.arange(n), played]
+    if table["objective"] == "ev":
+        before = np.full(n, START_CAPITAL) if capital_before is None else np.asarray(capital_before)
+        gap = gap * before
+    return {
+        "best_choice": ACTION_CHOICE[best],
+        "best_leverage": ACTION_LEVERAGE[best],
+        "regret": gap,
+        "optimal": gap <= 1e-12,
+    }
+
+# Strata decyzji w logarytmie jako procent kapitału (ekwiwalent pewny)
+def regret_pct(regret) -> np.ndarray:
+    return -np.expm1(-np.asarray(regret)) * 100
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Liczy tabele optymalnej strategii dla horyzontów gry.")
+    parser.add_argument("--horizon", choices=list(HORIZONS), action="append",
+                        help="horyzont (można podać kilka razy; domyślnie wszystkie)")
+    parser.add_argument("--objective", choices=OBJECTIVES, action="append", help="cel (domyślnie oba)")
+    args = parser.parse_args(argv)
+
+    for horizon in args.horizon or HORIZONS:
+        for objective in args.objective or OBJECTIVES:
+            t0 = time.perf_counter()
+            table = horizon_policy(horizon, objective)
+            v0 = float(table["value"][0, 0, 0, 0])
+            expected = START_CAPITAL * (v0 if objective == "ev" else math.exp(v0))
+            print(f"{HORIZONS[horizon]['label']} ({objective}): {time.perf_counter() - t0:.2f} s, "
+                  f"oczekiwany wynik strategii optymalnej {fmt_pln_num(expected)} PLN")
+
+if __name__ == "__main__":
+    main()
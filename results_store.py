@@ -0,0 +1,273 @@
+import atexit
+import contextlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from game_engine import CHOICES, DECISION_DTYPE, INSTR_INDEX, INSTRUMENT_SET, LEGACY_INSTRUMENT_SET
+
+# Trwały zapis wyników zakończonych gier w lokalnej bazie SQLite (tryb WAL) i zapytania rankingu.
+# Sesje tylko wrzucają rekord do kolejki; osobny wątek zapisuje je paczkami w jednej transakcji,
+# więc setki gier kończonych naraz pod koniec zajęć nie blokują rerunów.
+# Zapis jest opcjonalny: INVESTMENT_GAME_DB wskazuje plik bazy; bez tej zmiennej (albo z "0") aplikacja
+# niczego nie zapisuje i nie tworzy plików w katalogu roboczym.
+
+DB_ENV = "INVESTMENT_GAME_DB"
+
+# Domyślny plik bazy dla narzędzi czytających wyniki (analytics.py)
+DEFAULT_DB = "results.db"
+
+# Paczka zapisu: najwyżej tyle rekordów, zbieranych najwyżej tyle sekund od pierwszego
+BATCH_SIZE = 200
+BATCH_WAIT = 0.25
+
+# Tyle rekordów może czekać w kolejce; przy pełnej kolejce rekord odrzucamy z ostrzeżeniem
+QUEUE_LIMIT = 10_000
+
+# Połączenia do odczytu (ranking) współdzielone przez sesje; WAL pozwala czytać w trakcie zapisu
+READ_POOL_SIZE = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    player TEXT,
+    horizon TEXT NOT NULL,
+    seed INTEGER,
+    scenario INTEGER,
+    rounds INTEGER NOT NULL,
+    final_capital REAL NOT NULL,
+    sp500 REAL NOT NULL,
+    gold REAL NOT NULL,
+    btc REAL NOT NULL,
+    risk INTEGER NOT NULL,
+    rationality INTEGER NOT NULL,
+    decisions BLOB NOT NULL,
+    returns BLOB NOT NULL,
+    instruments TEXT,
+    portfolio INTEGER,
+    weights BLOB,
+    history INTEGER,
+    history_start TEXT
+);
+CREATE INDEX IF NOT EXISTS games_by_capital ON games (horizon, final_capital DESC);
+CREATE INDEX IF NOT EXISTS games_by_time ON games (horizon, finished_at);
+"""
+
+INSERT = """
+INSERT INTO games (finished_at, player, horizon, seed, scenario, rounds, final_capital,
+                   sp500, gold, btc, risk, rationality, decisions, returns, instruments, portfolio, weights,
+                   history, history_start)
+VALUES (:finished_at, :player, :horizon, :seed, :scenario, :rounds, :final_capital,
+        :sp500, :gold, :btc, :risk, :rationality, :decisions, :returns, :instruments, :portfolio, :weights,
+        :history, :history_start)
+"""
+
+# Kolumny dodane po pierwszej wersji schematu; starsze bazy dostają je przy otwarciu (stare wiersze mają NULL)
+ADDED_COLUMNS = {
+    "instruments": "TEXT",
+    "portfolio": "INTEGER",
+    "weights": "BLOB",
+    "history": "INTEGER",
+    "history_start": "TEXT",
+}
+
+# Zestaw instrumentów wiersza; NULL to gra zapisana przed dodaniem kolumny, czyli w zestawie domyślnym
+LEGACY_INSTRUMENTS_SQL = f"'{LEGACY_INSTRUMENT_SET}'"
+INSTRUMENTS_SQL = f"COALESCE(instruments, {LEGACY_INSTRUMENTS_SQL})"
+
+# Tryb gry wiersza: 1 to tryb portfela, 0 (i NULL ze starszych wersji) to jeden instrument na rundę
+PORTFOLIO_SQL = "COALESCE(portfolio, 0)"
+
+# Gry na prawdziwych notowaniach (history = 1) mają inny rynek niż model zwrotów, więc nie trafiają
+# do rankingu ani do analytics.py; starsze wiersze (NULL) to gry na modelu
+MODEL_GAMES_SQL = "COALESCE(history, 0) = 0"
+
+logger = logging.getLogger("investment_game.results")
+
+# Plik bazy z konfiguracji albo None, gdy zapis jest wyłączony (zmienna nieustawiona, pusta albo "0")
+def configured_db_path():
+    path = os.environ.get(DB_ENV, "")
+    return None if path in ("", "0") else path
+
+# Dopisujemy brakujące kolumny do tabeli ze starszej wersji aplikacji
+def _migrate(conn: sqlite3.Connection):
+    have = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+    for name, sql_type in ADDED_COLUMNS.items():
+        if name not in have:
+            conn.execute(f"ALTER TABLE games ADD COLUMN {name} {sql_type}")
+
+# Wyrażenie SQL kolumny dodanej później, z wartością domyślną dla starych wierszy;
+# działa też na bazie otwartej tylko do odczytu, której nie zmigrowaliśmy (wtedy kolumny nie ma wcale)
+def column_or(conn: sqlite3.Connection, name: str, default_sql: str) -> str:
+    have = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+    return f"COALESCE({name}, {default_sql})" if name in have else default_sql
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# Kolumny sp500/gold/btc trzymają końcowe wartości benchmarków domyślnego zestawu instrumentów
+# (0, gdy zestaw ich nie ma, patrz kolumna instruments); zwroty wszystkich instrumentów są w kolumnie returns
+def _benchmark_end(end, key: str) -> float:
+    return float(end[INSTR_INDEX[key]]) if key in INSTR_INDEX else 0.0
+
+# Rekord zakończonej gry. Decyzje zapisujemy jako bajty tablicy DECISION_DTYPE,
+# a zwroty instrumentów rozegranych rund jako float64 (rundy x instrumenty);
+# instruments mówi, w jakim zestawie liczyć kody wyborów i kolumny zwrotów.
+# Gra w trybie portfela ma portfolio = 1 i udziały z każdej rundy (rundy x wybory, float64) w weights;
+# jej decisions.choice to tylko pozycja o największym udziale.
+# Gra na prawdziwych notowaniach ma history = 1 i datę pierwszego notowania okna (ISO) w history_start;
+# jej seed jest pusty, bo gry nie odtworzy model zwrotów.
+def game_record(game, scores: dict, horizon: str, player=None, history_start=None) -> dict:
+    end = game.history[game.round]
+    path = np.asarray(game.path[:game.round], dtype=np.float64)
+    return {
+        "finished_at": time.time(),
+        "player": player or None,
+        "horizon": horizon,
+        "seed": game.seed,
+        "scenario": game.scenario,
+        "rounds": game.round,
+        "final_capital": float(game.capital),
+        "sp500": _benchmark_end(end, "SP500"),
+        "gold": _benchmark_end(end, "GOLD"),
+        "btc": _benchmark_end(end, "BTC"),
+        "risk": int(scores["risk"]),
+        "rationality": int(scores["rationality"]),
+        "decisions": game.decisions.tobytes(),
+        "returns": path.tobytes(),
+        "instruments": INSTRUMENT_SET,
+        "portfolio": int(game.portfolio),
+        "weights": None if game.weights is None else np.ascontiguousarray(game.weights, dtype=np.float64).tobytes(),
+        "history": int(history_start is not None),
+        "history_start": history_start,
+    }
+
+# Bloby z innego zestawu instrumentów dałyby po cichu złe kody i kolumny, więc je odrzucamy
+def _check_instruments(instruments):
+    if (instruments or LEGACY_INSTRUMENT_SET) != INSTRUMENT_SET:
+        raise ValueError(f"Gra zapisana w zestawie instrumentów {instruments or LEGACY_INSTRUMENT_SET}, "
+                         f"a obecny zestaw to {INSTRUMENT_SET}.")
+
+# Kolumny BLOB z powrotem jako tablice (instruments to kolumna zestawu z tego samego wiersza)
+def decisions_from_blob(blob, instruments) -> np.ndarray:
+    _check_instruments(instruments)
+    return np.frombuffer(blob, dtype=DECISION_DTYPE)
+
+def returns_from_blob(blob, instruments) -> np.ndarray:
+    _check_instruments(instruments)
+    return np.frombuffer(blob, dtype=np.float64).reshape(-1, len(INSTR_INDEX))
+
+def weights_from_blob(blob, instruments) -> np.ndarray:
+    _check_instruments(instruments)
+    return np.frombuffer(blob, dtype=np.float64).reshape(-1, len(CHOICES))
+
+class ResultsStore:
+    def __init__(self, path: str, read_pool_size: int = READ_POOL_SIZE):
+        self.path = path
+        with contextlib.closing(_connect(path)) as conn:
+            conn.executescript(SCHEMA)
+            _migrate(conn)
+
+        self._queue = queue.Queue(maxsize=QUEUE_LIMIT)
+        self._readers = queue.LifoQueue()
+        for _ in range(read_pool_size):
+            self._readers.put(_connect(path))
+        self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self._writer.start()
+        # Przy zamykaniu procesu dopisujemy to, co zostało w kolejce
+        atexit.register(self.close)
+
+    # Nie czekamy na zapis: rekord trafia do kolejki wątku zapisującego
+    def submit(self, record: dict) -> bool:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("Kolejka zapisu wyników jest pełna, pomijamy wynik gry.")
+            return False
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + BATCH_WAIT
+        while batch[-1] is not None and len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        try:
+            while True:
+                batch = self._next_batch()
+                records = [r for r in batch if r is not None]
+                if records:
+                    try:
+                        with conn:
+                            conn.executemany(INSERT, records)
+                    except sqlite3.Error:
+                        logger.exception("Nie udało się zapisać %d wyników gier.", len(records))
+                for _ in batch:
+                    self._queue.task_done()
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+    # Czekamy, aż wszystkie wysłane dotąd rekordy trafią do bazy
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+    @contextlib.contextmanager
+    def reader(self):
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    # Najlepsze gry w horyzoncie (opcjonalnie tylko zakończone od podanej chwili); korzysta z indeksów.
+    # Ranking obejmuje tylko gry na modelu zwrotów, w obecnym zestawie instrumentów i w jednym trybie gry (portfolio).
+    def leaderboard(self, horizon: str, limit: int = 20, since=None, portfolio: bool = False) -> list:
+        sql = ("SELECT player, final_capital, sp500, gold, btc, risk, rationality, seed, scenario, finished_at "
+               f"FROM games WHERE horizon = ? AND {INSTRUMENTS_SQL} = ? AND {PORTFOLIO_SQL} = ? AND {MODEL_GAMES_SQL}")
+        args = [horizon, INSTRUMENT_SET, int(portfolio)]
+        if since is not None:
+            sql += " AND finished_at >= ?"
+            args.append(since)
+        sql += " ORDER BY final_capital DESC LIMIT ?"
+        args.append(limit)
+        with self.reader() as conn:
+            rows = conn.execute(sql, args).fetchall()
+        cols = ("player", "final_capital", "sp500", "gold", "btc", "risk", "rationality", "seed", "scenario", "finished_at")
+        return [dict(zip(cols, row)) for row in rows]
+
+    # Miejsce wyniku w rankingu horyzontu (1 = najlepszy). Liczymy tylko lepsze gry,
+    # więc wynik jest poprawny także wtedy, gdy sama gra czeka jeszcze w kolejce zapisu.
+    def rank(self, horizon: str, final_capital: float, portfolio: bool = False) -> int:
+        with self.reader() as conn:
+            better = conn.execute(f"SELECT COUNT(*) FROM games WHERE horizon = ? AND {INSTRUMENTS_SQL} = ? "
+                                  f"AND {PORTFOLIO_SQL} = ? AND {MODEL_GAMES_SQL} AND final_capital > ?",
+                                  (horizon, INSTRUMENT_SET, int(portfolio), final_capital)).fetchone()[0]
+        return better + 1
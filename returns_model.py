@@ -0,0 +1,178 @@
+import json
+import os
+import random
+
+import numpy as np
+
+# Zestaw instrumentów wczytujemy z pliku JSON (INVESTMENT_GAME_INSTRUMENTS, domyślnie instruments.json obok
+# aplikacji): klucz instrumentu -> etykieta, parametry modelu zwrotów (MODEL_FIELDS), widełki zwrotu
+# z dźwignią (leverage_cap) i parametry oceny gracza (SCORE_DEFAULTS). Dokładnie jeden instrument ma
+# "cash": true; to gotówka ze zwrotem 0, która nie potrzebuje parametrów modelu.
+# Plik ma format INSTRUMENTS, więc wynik calibrate.py --out można wskazać bezpośrednio.
+INSTRUMENTS_ENV = "INVESTMENT_GAME_INSTRUMENTS"
+DEFAULT_INSTRUMENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instruments.json")
+
+MODEL_FIELDS = ("mean", "vol", "crash_p", "crash_mu", "crash_sigma", "rally_p", "rally_mu", "rally_sigma",
+                "mom_strength", "mom_cap", "ret_floor", "ret_cap")
+
+# Parametry oceny gracza (scoring.py); instrument podaje tylko te, które różnią się od domyślnych.
+# speculative oznacza instrumenty spekulacyjne: ich seria spadków nagradza ucieczkę do gotówki
+# i instrumentów niespekulacyjnych, a przewaga w portfelu dodaje karę za koncentrację
+SCORE_DEFAULTS = {
+    "risk_weight": 0.0,
+    "streak_mult": 1.0,
+    "lev_drop_penalty": 1.2,
+    "big_up_threshold": 0.06,
+    "big_up_penalty": 0.35,
+    "speculative": False,
+}
+
+# Kod decyzji zajmuje jeden bajt (DECISION_DTYPE, dziennik decyzji), więc tyle wyborów mieści gra
+MAX_CHOICES = 127
+
+def configured_instruments_path() -> str:
+    return os.environ.get(INSTRUMENTS_ENV) or DEFAULT_INSTRUMENTS
+
+# Wczytujemy i sprawdzamy zestaw instrumentów; brakujące parametry oceny uzupełniamy domyślnymi
+def load_instruments(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        instruments = json.load(f)
+    cash = [k for k, spec in instruments.items() if spec.get("cash")]
+    if len(cash) != 1:
+        raise ValueError(f"{path}: potrzebny jest dokładnie jeden instrument z \"cash\": true")
+    if not 1 < len(instruments) <= MAX_CHOICES:
+        raise ValueError(f"{path}: zestaw musi mieć od 2 do {MAX_CHOICES} instrumentów")
+    for key, spec in instruments.items():
+        spec.setdefault("label", key)
+        spec.setdefault("short_label", spec["label"])
+        spec.setdefault("risk_weight", SCORE_DEFAULTS["risk_weight"])
+        if spec.get("cash"):
+            continue
+        missing = [f for f in MODEL_FIELDS if f not in spec]
+        if missing:
+            raise ValueError(f"{path}: instrument {key} nie ma parametrów: {', '.join(missing)}")
+        spec.setdefault("leverage_cap", None)
+        for f, v in SCORE_DEFAULTS.items():
+            spec.setdefault(f, v)
+    return instruments
+
+INSTRUMENTS = load_instruments(configured_instruments_path())
+
+# Gotówka i instrumenty z losowymi zwrotami, w kolejności osi "instrument" w tablicach ścieżek
+CASH_KEY = next(k for k, spec in INSTRUMENTS.items() if spec.get("cash"))
+RISKY_KEYS = tuple(k for k in INSTRUMENTS if k != CASH_KEY)
+
+# Liczba ostatnich zwrotów, z których liczymy pamięć trendu
+MOMENTUM_LOOKBACK = 4
+
+# Ograniczamy wartość do podanego zakresu
+def clamp(x: float, lo: float, hi: float) -> float:
+    return max(lo, min(hi, x))
+
+# Wyliczamy lekką przewagę trendu na podstawie ostatnich zwrotów
+def streak_bias(instr_key: str, series, lookback: int = MOMENTUM_LOOKBACK) -> float:
+    if instr_key == CASH_KEY or not series:
+        return 0.0
+
+    p = INSTRUMENTS[instr_key]
+    last = series[-lookback:]
+    score = sum(1 if x > 0 else (-1 if x < 0 else 0) for x in last)
+    raw = (score / lookback) * p["mom_strength"]
+    return max(-p["mom_cap"], min(p["mom_cap"], raw))
+
+# Losujemy pojedynczy zwrot instrumentu (wersja skalarna, wzorcowa dla silnika wsadowego)
+def sample_return(instr_key: str, series, rng=random) -> float:
+    if instr_key == CASH_KEY:
+        return 0.0
+    p = INSTRUMENTS[instr_key]
+
+    bias = streak_bias(instr_key, series)
+    u = rng.random()
+
+    if u < p["crash_p"]:
+        r = rng.gauss(p["crash_mu"], p["crash_sigma"])
+    elif u < p["crash_p"] + p["rally_p"]:
+        r = rng.gauss(p["rally_mu"], p["rally_sigma"])
+    else:
+        r = rng.gauss(p["mean"] + bias, p["vol"])
+
+    return clamp(r, p["ret_floor"], p["ret_cap"])
+
+# Zamieniamy słownik parametrów na tablice kolumnowe (jedna wartość na instrument), więc losowanie
+# liczy wszystkie instrumenty jedną operacją na tablicach, bez rozgałęzień per instrument
+def param_table(keys=RISKY_KEYS) -> dict:
+    return {f: np.array([INSTRUMENTS[k][f] for k in keys], dtype=np.float64) for f in MODEL_FIELDS}
+
+PARAMS = param_table()
+
+# Parametry dla krótszych rund (np. 21 sesji w miesiącu): średnią, momentum i częstość skoków
+# dzielimy przez liczbę rund w miesiącu, a zmienność przez jej pierwiastek.
+# Wielkość skoków i widełki zwrotów zostają, więc pojedynczy krach jest tak samo dotkliwy, tylko rzadszy.
+def scaled_params(periods_per_month: float, keys=RISKY_KEYS) -> dict:
+    p = param_table(keys)
+    if periods_per_month == 1:
+        return p
+    k = float(periods_per_month)
+    for f in ("mean", "mom_strength", "mom_cap", "crash_p", "rally_p"):
+        p[f] = p[f] / k
+    p["vol"] = p["vol"] / np.sqrt(k)
+    return p
+
+# Domyślny generator dla wywołań bez jawnego rng
+_default_rng = np.random.default_rng()
+
+# Losujemy surowe szoki: u ~ U(0,1) wybiera reżim, z ~ N(0,1) wyznacza wielkość zwrotu.
+# Tablice mają kształt (ścieżki x rundy x instrumenty), ale w pamięci leżą rundami,
+# żeby pętla po rundach w paths_from_shocks czytała ciągłe bloki.
+def draw_shocks(rng, n_paths: int, n_rounds: int, n_instruments: int = len(RISKY_KEYS)):
+    shape = (n_rounds, n_paths, n_instruments)
+    u = rng.random(shape)
+    z = rng.standard_normal(shape)
+    return u.transpose(1, 0, 2), z.transpose(1, 0, 2)
+
+# Zamieniamy szoki na zwroty: mieszanka crash/rally, momentum z limitem mom_cap i widełki zwrotów.
+# Pętla idzie tylko po rundach; wszystkie ścieżki i instrumenty liczymy naraz.
+# history (N x h x I lub h x I) to zwroty sprzed pierwszej rundy, od których startuje pamięć trendu.
+def paths_from_shocks(u, z, history=None, params=None, lookback: int = MOMENTUM_LOOKBACK):
+    p = PARAMS if params is None else params
+    n_paths, n_rounds, n_instr = u.shape
+    crash_lim = p["crash_p"]
+    jump_lim = p["crash_p"] + p["rally_p"]
+
+    # Bufor cykliczny znaków ostatnich zwrotów; slot t % lookback zostanie nadpisany w rundzie t,
+    # więc najstarszy znak trzymamy w slocie 0
+    signs = np.zeros((lookback, n_paths, n_instr))
+    if history is not None:
+        hist = np.asarray(history, dtype=np.float64)
+        if hist.ndim == 2:
+            hist = hist[None]
+        last = hist[:, -lookback:]
+        if last.shape[1]:
+            signs[lookback - last.shape[1]:] = np.sign(last).transpose(1, 0, 2)
+    score = signs.sum(axis=0)
+
+    out = np.empty((n_rounds, n_paths, n_instr))
+    for t in range(n_rounds):
+        ut = u[:, t]
+        zt = z[:, t]
+        bias = np.clip((score / lookback) * p["mom_strength"], -p["mom_cap"], p["mom_cap"])
+
+        r = out[t]
+        np.add(p["mean"], bias, out=r)
+        r += p["vol"] * zt
+        jump_ret = np.where(ut < crash_lim, p["crash_mu"] + p["crash_sigma"] * zt, p["rally_mu"] + p["rally_sigma"] * zt)
+        np.copyto(r, jump_ret, where=ut < jump_lim)
+        np.clip(r, p["ret_floor"], p["ret_cap"], out=r)
+
+        slot = t % lookback
+        s = np.sign(r)
+        score += s - signs[slot]
+        signs[slot] = s
+
+    return out.transpose(1, 0, 2)
+
+# Generujemy tensor zwrotów (ścieżki x rundy x instrumenty) jednym przebiegiem wektorowym
+def simulate_paths(n_paths: int, n_rounds: int, rng=None, history=None, params=None):
+    rng = _default_rng if rng is None else rng
+    u, z = draw_shocks(rng, n_paths, n_rounds)
+    return paths_from_shocks(u, z, history=history, params=params)
@@ -0,0 +1,48 @@
+import numpy as np
+
+# Miary ryzyka przebiegów kapitału (gracz i benchmarki) do podsumowania gry.
+# values to historia wartości (punkty x serie), jak GameState.history; każda miara to jedno
+# przejście po całej tablicy naraz dla wszystkich serii, bez pętli po seriach.
+# Sharpe i Sortino liczymy ze stopą wolną od ryzyka 0 (gotówka w grze nic nie zarabia).
+
+VAR_LEVEL = 0.95
+
+# Dzielenie z NaN tam, gdzie mianownik jest zerowy (np. stała seria samej gotówki)
+def _safe_div(a, b):
+    return np.divide(a, b, out=np.full(np.shape(a), np.nan), where=b > 0)
+
+def risk_stats(values, periods_per_year: int, level: float = VAR_LEVEL) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    # Po utracie całego kapitału (zwrot z dźwignią -100%) seria stoi na zerze, więc jej dalsze zwroty to 0
+    prev = values[:-1]
+    ret = np.divide(values[1:], prev, out=np.ones_like(prev), where=prev > 0) - 1.0
+
+    # Obsunięcie: spadek od dotychczasowego szczytu; pod wodą, dopóki szczyt nie zostanie odrobiony
+    peak = np.maximum.accumulate(values, axis=0)
+    drawdown = values / peak - 1.0
+    under = drawdown < 0
+    idx = np.arange(n)[:, None]
+    last_peak = np.maximum.accumulate(np.where(under, 0, idx), axis=0)
+
+    mean = ret.mean(axis=0)
+    vol = ret.std(axis=0, ddof=1) if len(ret) > 1 else np.zeros(values.shape[1])
+    downside = np.sqrt(np.mean(np.minimum(ret, 0.0) ** 2, axis=0))
+    scale = np.sqrt(periods_per_year)
+
+    # Historyczny VaR i CVaR: strata (dodatnia liczba) w najgorszych (1 - level) rund; "0.0 -" zamiast
+    # minusa, żeby serie bez strat nie pokazywały -0
+    cutoff = np.quantile(ret, 1.0 - level, axis=0)
+    tail = ret <= cutoff
+    cvar = 0.0 - np.where(tail, ret, 0.0).sum(axis=0) / tail.sum(axis=0)
+
+    return {
+        "max_drawdown": 0.0 - drawdown.min(axis=0),
+        "volatility": vol * scale,
+        "sharpe": _safe_div(mean * scale, vol),
+        "sortino": _safe_div(mean * scale, downside),
+        "var": 0.0 - cutoff,
+        "cvar": cvar,
+        "under_water": under[1:].mean(axis=0),
+        "longest_under_water": (idx - last_peak).max(axis=0),
+    }
@@ -0,0 +1,68 @@
+import secrets
+
+import numpy as np
+
+from returns_model import RISKY_KEYS, paths_from_shocks
+
+# Generator licznikowy: każdą liczbę losową wyznacza skrót (seed, runda, instrument, strumień),
+# więc szok dla rundy k instrumentu i liczymy bezpośrednio, bez losowania rund 0..k-1,
+# a gry o różnych ziarnach nie dzielą żadnego stanu.
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Strumienie liczb dla jednego (runda, instrument): wybór reżimu i dwie liczby do Boxa-Mullera
+_STREAM_REGIME = 0
+_STREAM_NORMAL_1 = 1
+_STREAM_NORMAL_2 = 2
+_STREAMS = 4
+
+# Największy numer gry, jaki losujemy dla nowych sesji (krótki do przepisania z ekranu)
+MAX_GAME_SEED = 10**9
+
+# Funkcja mieszająca SplitMix64 (działa na tablicach uint64, przepełnienia są zamierzone)
+def _mix64(x):
+    x = x ^ (x >> np.uint64(30))
+    x = x * _MIX_1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+# Liczby jednostajne z [0, 1) dla podanych ziaren i liczników (broadcasting jak w NumPy)
+def counter_uniforms(seeds, counters):
+    with np.errstate(over="ignore"):
+        key = _mix64(np.asarray(seeds, dtype=np.uint64))
+        x = _mix64(key + np.asarray(counters, dtype=np.uint64) * _GOLDEN_GAMMA)
+    return (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+# Szoki (u, z) w kształcie (ziarna x rundy x instrumenty) dla rund start_round..start_round+n_rounds-1
+def counter_shocks(seeds, n_rounds: int, start_round: int = 0, n_instruments: int = len(RISKY_KEYS)):
+    seeds = np.asarray(seeds, dtype=np.uint64).reshape(-1, 1, 1)
+    rounds = np.arange(start_round, start_round + n_rounds, dtype=np.uint64).reshape(1, -1, 1)
+    instr = np.arange(n_instruments, dtype=np.uint64).reshape(1, 1, -1)
+    base = (rounds * np.uint64(n_instruments) + instr) * np.uint64(_STREAMS)
+
+    u = counter_uniforms(seeds, base + np.uint64(_STREAM_REGIME))
+    u1 = 1.0 - counter_uniforms(seeds, base + np.uint64(_STREAM_NORMAL_1))
+    u2 = counter_uniforms(seeds, base + np.uint64(_STREAM_NORMAL_2))
+    z = np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+    return u, z
+
+# Szok jednej rundy jednego instrumentu, np. do sprawdzenia powtórki bez liczenia całej ścieżki
+def round_shock(seed: int, round_index: int, instrument: int):
+    u, z = counter_shocks([seed], 1, start_round=round_index)
+    return float(u[0, 0, instrument]), float(z[0, 0, instrument])
+
+# Ścieżki zwrotów (ziarna x rundy x instrumenty) wyznaczone w pełni przez ziarna.
+# Ścieżka dłuższa ma ten sam początek co krótsza, więc grę można wydłużać bez zmiany historii.
+def seeded_paths(seeds, n_rounds: int, params=None):
+    u, z = counter_shocks(seeds, n_rounds)
+    return paths_from_shocks(u, z, params=params)
+
+def seeded_path(seed: int, n_rounds: int, params=None):
+    return seeded_paths([seed], n_rounds, params=params)[0]
+
+# Losowy numer nowej gry; bierzemy go z entropii systemu, a nie ze wspólnego generatora procesu
+def new_game_seed() -> int:
+    return secrets.randbelow(MAX_GAME_SEED)
@@ -0,0 +1,160 @@
+import bisect
+import secrets
+import threading
+import time
+
+import numpy as np
+
+from game_engine import CHOICE_CODE, CHOICES, START_CAPITAL, GameState
+from horizons import HORIZONS, horizon_params
+from memsize import mark_shared
+from rng_streams import new_game_seed, seeded_path
+
+# Tryb klasy: wszyscy uczestnicy pokoju grają na tej samej ścieżce zwrotów (wylosowanej raz
+# z ziarna pokoju), a pokój na bieżąco zbiera statystyki decyzji i kapitału.
+# Każda decyzja aktualizuje liczniki w O(1), więc panel prowadzącego nie przelicza gier wszystkich graczy.
+# Pokoje żyją w pamięci procesu (jeden rejestr na serwer), pod blokadami, bo sesje działają w osobnych wątkach.
+
+ROOM_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+ROOM_CODE_LENGTH = 5
+
+# Pokój bez nowych uczestników znika po tylu sekundach
+ROOM_TTL = 12 * 3600
+
+# Granice kubełków kapitału (skala logarytmiczna); pierwszy i ostatni kubełek są otwarte
+CAPITAL_EDGES = tuple(float(x) for x in np.geomspace(START_CAPITAL / 10, START_CAPITAL * 10, 21))
+
+def capital_bin(capital: float) -> int:
+    return bisect.bisect_right(CAPITAL_EDGES, capital)
+
+class Room:
+    def __init__(self, code: str, horizon: str, seed: int):
+        h = HORIZONS[horizon]
+        self.code = code
+        self.horizon = horizon
+        self.seed = seed
+        self.total_rounds = h["rounds"]
+        self.leverage_from = h["leverage_from"]
+        self.params = None if h["periods_per_month"] == 1 else horizon_params(horizon)
+        self.created = time.time()
+        self.last_join = self.created
+
+        # Jedna ścieżka na pokój, tylko do odczytu; gry uczestników trzymają do niej widoki
+        self.path = mark_shared(seeded_path(seed, self.total_rounds, params=self.params))
+        self.path.setflags(write=False)
+
+        self.lock = threading.Lock()
+        n_bins = len(CAPITAL_EDGES) + 1
+        n_decisions = self.total_rounds - 1
+        self.players = 0
+        self.finished = 0
+        # Statystyki per runda: liczba wyborów instrumentów i dźwigni w decyzji t (runda t + 1)
+        # oraz kapitał w punkcie wykresu t (ilu graczy go osiągnęło, suma i kubełki).
+        # Portfel dodaje do wyborów swoje udziały, więc liczniki wyborów są zmiennoprzecinkowe.
+        self.choice_counts = np.zeros((n_decisions, len(CHOICES)))
+        self.leverage_counts = np.zeros(n_decisions, dtype=np.int64)
+        self.reached = np.zeros(self.total_rounds, dtype=np.int64)
+        self.capital_sum = np.zeros(self.total_rounds)
+        self.capital_hist = np.zeros((self.total_rounds, n_bins), dtype=np.int64)
+        # Bieżący kapitał wszystkich uczestników (ostatnia rozegrana runda każdego)
+        self.current_hist = np.zeros(n_bins, dtype=np.int64)
+        self.current_sum = 0.0
+
+    # Nowa gra uczestnika na wspólnej ścieżce pokoju
+    def join(self, portfolio: bool = False) -> GameState:
+        game = GameState(path=self.path, seed=self.seed, total_rounds=self.total_rounds,
+                         params=self.params, leverage_from=self.leverage_from, portfolio=portfolio)
+        b = capital_bin(game.capital)
+        with self.lock:
+            self.players += 1
+            self.last_join = time.time()
+            self.reached[0] += 1
+            self.capital_sum[0] += game.capital
+            self.capital_hist[0, b] += 1
+            self.current_hist[b] += 1
+            self.current_sum += game.capital
+        return game
+
+    # Decyzja uczestnika (słownik zwrócony przez GameState.step) i jego kapitał sprzed niej
+    def record(self, decision: dict, prev_capital: float):
+        t = decision["round"]
+        capital = decision["capital"]
+        b_prev = capital_bin(prev_capital)
+        b = capital_bin(capital)
+        with self.lock:
+            if "weights" in decision:
+                self.choice_counts[t - 1] += decision["weights"]
+            else:
+                self.choice_counts[t - 1, CHOICE_CODE[decision["choice"]]] += 1
+            self.leverage_counts[t - 1] += decision["leverage"]
+            self.reached[t] += 1
+            self.capital_sum[t] += capital
+            self.capital_hist[t, b] += 1
+            self.current_hist[b_prev] -= 1
+            self.current_hist[b] += 1
+            self.current_sum += capital - prev_capital
+            if t == self.total_rounds - 1:
+                self.finished += 1
+
+    # Uczestnik wychodzi z pokoju (nowa gra albo powrót na start): odejmujemy go od liczby uczestników
+    # i od bieżącego kapitału; statystyki rund, które już rozegrał, zostają
+    def leave(self, game: GameState):
+        b = capital_bin(game.capital)
+        with self.lock:
+            self.players -= 1
+            self.current_hist[b] -= 1
+            self.current_sum -= game.capital
+            if game.finished:
+                self.finished -= 1
+
+    # Spójna kopia statystyk do wyświetlenia; koszt zależy od liczby rund, nie uczestników
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "players": self.players,
+                "finished": self.finished,
+                "choice_counts": self.choice_counts.copy(),
+                "leverage_counts": self.leverage_counts.copy(),
+                "reached": self.reached.copy(),
+                "capital_sum": self.capital_sum.copy(),
+                "capital_hist": self.capital_hist.copy(),
+                "current_hist": self.current_hist.copy(),
+                "current_sum": self.current_sum,
+            }
+
+class RoomRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}
+
+    def create(self, horizon: str, seed=None) -> Room:
+        seed = new_game_seed() if seed is None else seed
+        with self._lock:
+            self._drop_expired()
+            while True:
+                code = "".join(secrets.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+                if code not in self._rooms:
+                    break
+            # Miejsce w rejestrze rezerwujemy od razu, a ścieżkę liczymy już poza blokadą rejestru
+            self._rooms[code] = None
+        # Gdy budowa pokoju się nie uda, zwalniamy zarezerwowany kod, żeby w rejestrze nie został pusty wpis
+        room = None
+        try:
+            room = Room(code, horizon, seed)
+        finally:
+            with self._lock:
+                if room is None:
+                    del self._rooms[code]
+                else:
+                    self._rooms[code] = room
+        return room
+
+    def get(self, code: str):
+        code = (code or "").strip().upper()
+        with self._lock:
+            return self._rooms.get(code)
+
+    def _drop_expired(self):
+        now = time.time()
+        for code in [c for c, r in self._rooms.items() if r is not None and now - r.last_join > ROOM_TTL]:
+            del self._rooms[code]
@@ -0,0 +1,65 @@
+import argparse
+import functools
+import os
+
+import numpy as np
+
+from game_engine import TOTAL_ROUNDS, GameState
+from returns_model import RISKY_KEYS, simulate_paths
+
+# Zmienna środowiskowa ze ścieżką do pliku banku; gdy jest ustawiona, aplikacja losuje gry z banku
+BANK_ENV = "INVESTMENT_GAME_BANK"
+
+# Tyle ścieżek generujemy i zapisujemy naraz, żeby budowa dużego banku nie trzymała wszystkiego w RAM
+BUILD_CHUNK = 100_000
+
+# Generujemy bank scenariuszy (ścieżki x rundy x instrumenty) do pliku .npy.
+# float32 wystarcza dla zwrotów miesięcznych i zmniejsza plik o połowę.
+def build_bank(out_path: str, n_paths: int, n_rounds: int = TOTAL_ROUNDS, seed=None, dtype=np.float32):
+    rng = np.random.default_rng(seed)
+    shape = (n_paths, n_rounds, len(RISKY_KEYS))
+    bank = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype, shape=shape)
+    for start in range(0, n_paths, BUILD_CHUNK):
+        stop = min(n_paths, start + BUILD_CHUNK)
+        bank[start:stop] = simulate_paths(stop - start, n_rounds, rng=rng)
+    bank.flush()
+    del bank
+
+# Mapujemy bank do pamięci raz na proces; wszystkie sesje czytają te same strony tylko do odczytu
+@functools.lru_cache(maxsize=None)
+def load_bank(path: str):
+    bank = np.load(path, mmap_mode="r")
+    if bank.shape[-1] != len(RISKY_KEYS):
+        raise ValueError(f"{path}: bank ma {bank.shape[-1]} instrumentów, a zestaw instrumentów {len(RISKY_KEYS)}")
+    return bank
+
+# Bank wskazany w zmiennej środowiskowej albo None, gdy tryb banku jest wyłączony
+def configured_bank():
+    path = os.environ.get(BANK_ENV)
+    if not path:
+        return None
+    return load_bank(os.path.abspath(path))
+
+# Nowa gra na scenariuszu z banku; bez indeksu losujemy scenariusz.
+# Sesja trzyma tylko widok na wiersz banku, numer scenariusza i bieżącą rundę.
+def game_from_bank(bank, index=None, rng=None, portfolio: bool = False) -> GameState:
+    if index is None:
+        rng = np.random.default_rng() if rng is None else rng
+        index = int(rng.integers(len(bank)))
+    return GameState(path=bank[index], scenario=index, portfolio=portfolio)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generuje bank scenariuszy zwrotów instrumentów z zestawu do pliku .npy.")
+    parser.add_argument("out", help="plik wyjściowy .npy")
+    parser.add_argument("--paths", type=int, default=100_000, help="liczba ścieżek (domyślnie 100 000)")
+    parser.add_argument("--rounds", type=int, default=TOTAL_ROUNDS, help=f"liczba rund na ścieżkę (domyślnie {TOTAL_ROUNDS})")
+    parser.add_argument("--seed", type=int, default=None, help="ziarno generatora")
+    parser.add_argument("--float64", action="store_true", help="zapis w pełnej precyzji zamiast float32")
+    args = parser.parse_args(argv)
+
+    build_bank(args.out, args.paths, args.rounds, seed=args.seed, dtype=np.float64 if args.float64 else np.float32)
+    size_mb = os.path.getsize(args.out) / 1e6
+    print(f"Zapisano {args.paths} ścieżek x {args.rounds} rund do {args.out} ({size_mb:.1f} MB).")
+
+if __name__ == "__main__":
+    main()
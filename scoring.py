@@ -0,0 +1,206 @@
+import numpy as np
+
+from game_engine import CASH_CODE, CHOICES, INSTR_INDEX, SPECULATIVE_KEYS, score_notes
+from returns_model import INSTRUMENTS, RISKY_KEYS
+
+# Wsadowa wersja compute_player_scores: ocenia naraz G gier o tej samej liczbie decyzji.
+# choices (G x T) to kody z CHOICES, leverage (G x T), returns (G x R x instrumenty) z R >= T.
+# Kary i premie dodajemy w tej samej kolejności co wersja pojedyncza, więc wyniki są identyczne co do bitu.
+
+CASH = CASH_CODE
+N_RISKY = len(RISKY_KEYS)
+
+# Parametry oceny z zestawu instrumentów jako tablice indeksowane kodem decyzji (gotówka nie dostaje kar)
+def _by_code(field: str, cash_value) -> np.ndarray:
+    return np.array([INSTRUMENTS[k][field] for k in RISKY_KEYS] + [cash_value])
+
+RISK_WEIGHT = _by_code("risk_weight", INSTRUMENTS[CHOICES[CASH]]["risk_weight"])
+STREAK_MULT = _by_code("streak_mult", 0.0)
+LEV_DROP_PENALTY = _by_code("lev_drop_penalty", 0.0)
+BIG_UP_THRESHOLD = _by_code("big_up_threshold", np.inf)
+BIG_UP_PENALTY = _by_code("big_up_penalty", 0.0)
+SPECULATIVE = _by_code("speculative", False).astype(bool)
+
+# Kolumny instrumentów spekulacyjnych w tablicy zwrotów
+_SPECULATIVE_COLUMNS = [INSTR_INDEX[k] for k in SPECULATIVE_KEYS]
+
+# Kolumna zwrotów dla każdego kodu decyzji (gotówka ma zawsze zwrot 0)
+_RETURN_COLUMN = np.array([INSTR_INDEX.get(k, 0) for k in CHOICES])
+
+# Długość serii spadków kończącej się tuż przed rundą t (okno 3 rund), dla każdej rundy naraz
+def neg_streaks(returns, window: int = 3):
+    neg = returns < 0
+    n_rounds = returns.shape[1]
+    out = np.zeros(returns.shape, dtype=np.int64)
+    alive = np.ones(returns.shape, dtype=bool)
+    for lag in range(1, window + 1):
+        if lag > n_rounds:
+            break
+        prev = np.zeros(returns.shape, dtype=bool)
+        prev[:, lag:] = neg[:, :-lag]
+        alive &= prev
+        out += alive
+    return out
+
+# Wejścia "po euforii": decyzja t wybiera instrument, który w rundzie t - 1 urósł co najmniej o próg
+# (ten sam warunek co kara big_up w compute_player_scores_batch); gotówka i pierwsza decyzja to False
+def big_up_mask(choices, returns):
+    choices = np.asarray(choices)
+    n_games, n = choices.shape
+    out = np.zeros((n_games, n), dtype=bool)
+    if n < 2:
+        return out
+    prev = np.take_along_axis(np.asarray(returns)[:, :n - 1], _RETURN_COLUMN[choices[:, 1:]][:, :, None], axis=2)[:, :, 0]
+    out[:, 1:] = (prev >= BIG_UP_THRESHOLD[choices[:, 1:]]) & (choices[:, 1:] != CASH)
+    return out
+
+# Koncentracja i skłonność do ryzyka z udziałów wyborów (G x wybory) i udziału rund z dźwignią
+def _risk(share, share_lev):
+    concentration = share[:, 0] ** 2
+    for c in range(1, len(CHOICES)):
+        concentration = concentration + share[:, c] ** 2
+
+    risk_raw = RISK_WEIGHT[0] * share[:, 0]
+    for c in range(1, N_RISKY):
+        risk_raw = risk_raw + RISK_WEIGHT[c] * share[:, c]
+    risk_raw = risk_raw + 0.75 * share_lev
+    risk_raw = risk_raw + 0.25 * concentration
+    risk_raw = risk_raw + RISK_WEIGHT[CASH] * share[:, CASH]
+    risk = np.clip(np.rint(50 + 70 * risk_raw), 0, 100).astype(np.int64)
+    return concentration, risk
+
+# Rundy, przed którymi któryś instrument spekulacyjny miał co najmniej dwa spadki z rzędu (G x T)
+def _speculative_down(ns_all):
+    if _SPECULATIVE_COLUMNS:
+        return ns_all[:, :, _SPECULATIVE_COLUMNS].max(axis=2) >= 2
+    return np.zeros(ns_all.shape[:2], dtype=bool)
+
+# Kary za całą grę (overtrading, koncentracja w instrumentach spekulacyjnych) i wynik racjonalności
+def _rationality(penalties, bonuses, risk, share, switch_rate, concentration):
+    penalties = penalties + np.where(switch_rate > 0.55, (switch_rate - 0.55) * 3.0, 0.0)
+    speculative_share = share[:, SPECULATIVE].sum(axis=1)
+    penalties = penalties + np.where((concentration > 0.55) & (speculative_share > 0.5), 1.0, 0.0)
+
+    rationality = 85.0 - 6.5 * penalties + 3.0 * bonuses
+    rationality = np.where(risk > 80, rationality - (risk - 80) * 0.25, rationality)
+    return np.clip(np.rint(rationality), 0, 100).astype(np.int64)
+
+def compute_player_scores_batch(choices, leverage, returns) -> dict:
+    choices = np.asarray(choices)
+    leverage = np.asarray(leverage, dtype=bool)
+    returns = np.asarray(returns, dtype=np.float64)
+    n_games, n = choices.shape
+    if n == 0:
+        zeros = np.zeros(n_games, dtype=np.int64)
+        return {"risk": zeros, "rationality": zeros.copy(), "n": 0}
+
+    counts = np.stack([(choices == c).sum(axis=1) for c in range(len(CHOICES))], axis=1)
+    share = counts / n
+    share_lev = leverage.sum(axis=1) / n
+    switch_rate = (choices[:, 1:] != choices[:, :-1]).sum(axis=1) / max(1, (n - 1))
+    concentration, risk = _risk(share, share_lev)
+
+    ns_all = neg_streaks(returns[:, :n])
+    speculative_down = _speculative_down(ns_all)
+    rows = np.arange(n_games)
+    penalties = np.zeros(n_games)
+    bonuses = np.zeros(n_games)
+
+    for t in range(n):
+        ch = choices[:, t]
+        lev = leverage[:, t]
+        cash = ch == CASH
+        col = _RETURN_COLUMN[ch]
+
+        ns = np.where(cash, 0, ns_all[rows, t, col])
+        streak = ns >= 2
+
+        penalties = penalties + np.where(streak, STREAK_MULT[ch] * (ns - 1), 0.0)
+        if t >= 2:
+            drops = (returns[rows, t - 1, col] < 0) & (returns[rows, t - 2, col] < 0)
+            penalties = penalties + np.where(lev & drops & ~cash, LEV_DROP_PENALTY[ch], 0.0)
+        if t >= 1:
+            big = returns[rows, t - 1, col] >= BIG_UP_THRESHOLD[ch]
+            penalties = penalties + np.where(big & ~cash, BIG_UP_PENALTY[ch], 0.0)
+
+        spec_down = speculative_down[:, t]
+        bonuses = bonuses + np.where(cash & spec_down, 0.35, 0.0)
+        bonuses = bonuses + np.where(spec_down & ~cash & ~SPECULATIVE[ch], 0.25, 0.0)
+        bonuses = bonuses + np.where(~cash & ~lev & streak, 0.12, 0.0)
+
+    rationality = _rationality(penalties, bonuses, risk, share, switch_rate, concentration)
+
+    return {
+        "risk": risk,
+        "rationality": rationality,
+        "n": n,
+        "share": share,
+        "share_lev": share_lev,
+        "switch_rate": switch_rate,
+        "concentration": concentration,
+    }
+
+# Ocena portfeli (tryb portfela): weights (G x T x wybory) to udziały z każdej decyzji.
+# Udział instrumentu to jego średni udział w rundach, zmiana instrumentu to połowa obrotu portfela,
+# a kary i premie rundy ważymy udziałami pozycji, których dotyczą. Portfel z jedną pozycją
+# dostaje dokładnie tę samą ocenę co ten sam wybór w compute_player_scores_batch.
+def compute_portfolio_scores_batch(weights, leverage, returns) -> dict:
+    weights = np.asarray(weights, dtype=np.float64)
+    leverage = np.asarray(leverage, dtype=bool)
+    returns = np.asarray(returns, dtype=np.float64)
+    n_games, n = weights.shape[:2]
+    if n == 0:
+        zeros = np.zeros(n_games, dtype=np.int64)
+        return {"risk": zeros, "rationality": zeros.copy(), "n": 0}
+
+    share = weights.sum(axis=1) / n
+    share_lev = leverage.sum(axis=1) / n
+    switch_rate = (0.5 * np.abs(np.diff(weights, axis=1)).sum(axis=2)).sum(axis=1) / max(1, (n - 1))
+    concentration, risk = _risk(share, share_lev)
+
+    ns_all = neg_streaks(returns[:, :n])
+    speculative_down = _speculative_down(ns_all)
+    streak_pen = np.where(ns_all >= 2, STREAK_MULT[:N_RISKY] * (ns_all - 1), 0.0)
+    streak_w = np.where(ns_all >= 2, 1.0, 0.0)
+    calm_w = (~SPECULATIVE[:N_RISKY]).astype(np.float64)
+    risky = weights[:, :, :N_RISKY]
+    penalties = np.zeros(n_games)
+    bonuses = np.zeros(n_games)
+
+    for t in range(n):
+        w = risky[:, t]
+        lev = leverage[:, t]
+
+        penalties = penalties + (w * streak_pen[:, t]).sum(axis=1)
+        if t >= 2:
+            drops = (returns[:, t - 1, :] < 0) & (returns[:, t - 2, :] < 0)
+            pen = (w * np.where(drops, LEV_DROP_PENALTY[:N_RISKY], 0.0)).sum(axis=1)
+            penalties = penalties + np.where(lev, pen, 0.0)
+        if t >= 1:
+            big = returns[:, t - 1, :] >= BIG_UP_THRESHOLD[:N_RISKY]
+            penalties = penalties + (w * np.where(big, BIG_UP_PENALTY[:N_RISKY], 0.0)).sum(axis=1)
+
+        spec_down = speculative_down[:, t]
+        bonuses = bonuses + np.where(spec_down, 0.35 * weights[:, t, CASH], 0.0)
+        bonuses = bonuses + np.where(spec_down, 0.25 * (w * calm_w).sum(axis=1), 0.0)
+        bonuses = bonuses + np.where(lev, 0.0, 0.12 * (w * streak_w[:, t]).sum(axis=1))
+
+    rationality = _rationality(penalties, bonuses, risk, share, switch_rate, concentration)
+
+    return {
+        "risk": risk,
+        "rationality": rationality,
+        "n": n,
+        "share": share,
+        "share_lev": share_lev,
+        "switch_rate": switch_rate,
+        "concentration": concentration,
+    }
+
+# Wynik jednej gry z partii w formacie compute_player_scores (z notatkami)
+def game_scores(batch: dict, g: int) -> dict:
+    if batch["n"] == 0:
+        return {"risk": 0, "rationality": 0, "notes": ["Brak decyzji do oceny."]}
+    share = {k: float(batch["share"][g, c]) for c, k in enumerate(CHOICES)}
+    notes = score_notes(share, float(batch["share_lev"][g]), float(batch["switch_rate"][g]), float(batch["concentration"][g]))
+    return {"risk": int(batch["risk"][g]), "rationality": int(batch["rationality"][g]), "notes": notes}
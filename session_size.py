@@ -0,0 +1,75 @@
+import argparse
+import json
+import random
+
+from game_engine import CHOICES
+from horizons import HORIZONS, horizon_game
+from memsize import deep_sizeof
+
+# Ile bajtów zajmuje stan jednej sesji gracza na początku, w połowie i na końcu gry.
+# Domyślnie bez Streamlit: gra toczy się losowymi decyzjami, a mierzymy te same klucze,
+# które aplikacja trzyma w st.session_state. --app mierzy prawdziwy stan sesji przez AppTest.
+
+# Obiekty współdzielone przez wszystkie sesje procesu (parametry horyzontu, ścieżka pokoju)
+# rejestrują ich właściciele (memsize.mark_shared), więc deep_sizeof ich nie liczy
+def session_bytes(game, horizon: str, page: str) -> dict:
+    state = {"page": page, "g1_game": game, "g1_horizon": horizon}
+    total = deep_sizeof(state)
+    parts = {}
+    for name in type(game).__slots__:
+        parts[name] = deep_sizeof(getattr(game, name))
+    return {"round": game.round, "total": total, "game_parts": parts}
+
+def measure_horizon(horizon: str, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    game = horizon_game(horizon, seed=seed)
+    checkpoints = {0, (game.total_rounds - 1) // 2}
+    rows = []
+    while True:
+        if game.round in checkpoints:
+            rows.append(session_bytes(game, horizon, "game1"))
+        if game.finished:
+            break
+        game.step(rng.choice(CHOICES), rng.random() < 0.3)
+    rows.append(session_bytes(game, horizon, "game1_summary"))
+    return rows
+
+# Prawdziwy stan sesji Streamlit po całej grze (klasyczny horyzont), klucz po kluczu
+def measure_app(seed: int = 0, timeout: float = 60.0) -> dict:
+    # loadtest.py ładuje AppTest i podmienia części Streamlit, więc importujemy go tylko dla --app
+    from loadtest import play_session
+
+    result = play_session(0, seed, timeout)
+    return {"total": result["state_bytes"], "by_key": result["state_bytes_by_key"]}
+
+def print_report(report: dict):
+    for horizon, rows in report.items():
+        print(f"\n{HORIZONS[horizon]['label']} ({horizon})")
+        print(f"{'runda':>8}{'sesja [B]':>12}{'sesji / GB':>12}   największe części gry")
+        for r in rows:
+            top = sorted(r["game_parts"].items(), key=lambda kv: -kv[1])[:3]
+            parts = ", ".join(f"{k} {v}" for k, v in top)
+            print(f"{r['round']:>8}{r['total']:>12}{2**30 // r['total']:>12}   {parts}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rozmiar stanu jednej sesji gracza w bajtach.")
+    parser.add_argument("--horizon", choices=list(HORIZONS), action="append",
+                        help="mierzony horyzont (można podać kilka razy; domyślnie wszystkie)")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno gry i decyzji")
+    parser.add_argument("--app", action="store_true", help="zmierz też prawdziwy stan sesji przez AppTest")
+    parser.add_argument("--json", action="store_true", help="wynik jako JSON")
+    args = parser.parse_args(argv)
+
+    report = {h: measure_horizon(h, args.seed) for h in (args.horizon or HORIZONS)}
+    app = measure_app(args.seed) if args.app else None
+
+    if args.json:
+        print(json.dumps({"headless": report, "app": app}, indent=2))
+        return
+    print_report(report)
+    if app is not None:
+        by_key = ", ".join(f"{k} {v}" for k, v in sorted(app["by_key"].items(), key=lambda kv: -kv[1]))
+        print(f"\nAppTest, stan sesji po całej grze: {app['total']} B ({by_key})")
+
+if __name__ == "__main__":
+    main()
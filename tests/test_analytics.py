@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from analytics import run_analytics
+from game_engine import CHOICES
+from horizons import horizon_game
+from results_store import ResultsStore, game_record
+
+# Statystyki analytics.py liczone strumieniowo (porcje, zakresy id, procesy) muszą się zgadzać z ocenami
+# zapisanymi przy każdej grze i z udziałami wyborów policzonymi gra po grze; gry na prawdziwych notowaniach
+# i gry drugiego trybu nie wchodzą do statystyk.
+
+# Gra z n_decisions losowymi decyzjami (w trybie portfela losowe udziały)
+def played_game(rng, n_decisions: int, portfolio: bool):
+    game = horizon_game("monthly", seed=int(rng.integers(1, 10**9)), portfolio=portfolio)
+    for _ in range(n_decisions):
+        leverage = rng.random() < 0.3
+        if portfolio:
+            game.step_portfolio(rng.random(len(CHOICES)) ** 3, leverage)
+        else:
+            game.step(CHOICES[rng.integers(len(CHOICES))], leverage)
+    return game
+
+@pytest.fixture(scope="module")
+def games_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("analytics") / "results.db")
+    rng = np.random.default_rng(3)
+    expected = {False: [], True: []}
+    store = ResultsStore(path, read_pool_size=1)
+    for i in range(60):
+        portfolio = i % 3 == 0
+        game = played_game(rng, 39 if i % 4 else int(rng.integers(1, 39)), portfolio)
+        scores = game.score()
+        # Co piąta gra udaje grę na prawdziwych notowaniach: zapisana, ale pominięta w statystykach
+        history_start = "2020-01-02" if i % 5 == 0 else None
+        store.submit(game_record(game, scores, "monthly", history_start=history_start))
+        if history_start is None:
+            expected[portfolio].append((game, scores))
+    store.close()
+    return path, expected
+
+@pytest.mark.parametrize("portfolio", [False, True])
+def test_report_matches_per_game_scores(games_db, portfolio):
+    path, expected = games_db
+    games = expected[portfolio]
+    report = run_analytics([path], "monthly", workers=2, shard_games=7, chunk_games=3, portfolio=portfolio)
+
+    assert report["games"] == len(games)
+    assert report["portfolio"] is portfolio
+    risk = np.bincount([s["risk"] for _, s in games], minlength=101)
+    rationality = np.bincount([s["rationality"] for _, s in games], minlength=101)
+    assert report["risk"]["hist"] == risk.tolist()
+    assert report["rationality"]["hist"] == rationality.tolist()
+
+    decisions = sum(game.round for game, _ in games)
+    assert report["decisions"] == decisions
+    if portfolio:
+        counts = sum(game.weights.sum(axis=0) for game, _ in games)
+    else:
+        counts = sum(np.bincount(game.decisions["choice"], minlength=len(CHOICES)) for game, _ in games)
+    for c, k in enumerate(CHOICES):
+        assert report["choice_share"][k] == pytest.approx(counts[c] / decisions, rel=1e-9)
+
+def test_other_horizon_is_empty(games_db):
+    path, _ = games_db
+    report = run_analytics([path], "daily", workers=1)
+    assert report["games"] == 0
+    assert report["decisions"] == 0
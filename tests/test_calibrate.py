@@ -0,0 +1,34 @@
+import numpy as np
+
+from calibrate import BOUNDS, FIELDS, repair
+from returns_model import PARAMS, draw_shocks, paths_from_shocks
+
+# Naprawa kandydatów kalibracji: losowi kandydaci daleko poza zakresami muszą wrócić do poprawnego modelu,
+# a przycięcie mom_cap do mom_strength nie może zmienić ani jednej ścieżki zwrotów.
+
+def test_repaired_candidates_are_valid():
+    rng = np.random.default_rng(0)
+    lo = np.array([BOUNDS[f][0] for f in FIELDS])
+    hi = np.array([BOUNDS[f][1] for f in FIELDS])
+    start = (lo + hi) / 2
+    x = repair(start + 3 * (hi - lo) * rng.standard_normal((5000, len(FIELDS))), np.ones(len(FIELDS), bool), start)
+    col = {f: x[:, j] for j, f in enumerate(FIELDS)}
+    assert np.all((x >= lo) & (x <= hi))
+    assert np.all(col["ret_floor"] < 0) and np.all(col["ret_cap"] > 0)
+    assert np.all(col["crash_p"] + col["rally_p"] <= 0.5 + 1e-12)
+    assert np.all(col["mom_cap"] <= col["mom_strength"])
+
+def test_fields_outside_fit_keep_start_values():
+    start = np.array([PARAMS[f][0] for f in FIELDS])
+    fit_mask = np.array([f == "vol" for f in FIELDS])
+    x = repair(np.full((3, len(FIELDS)), 0.1), fit_mask, start)
+    expected = np.tile(start, (3, 1))
+    expected[:, FIELDS.index("vol")] = 0.1
+    expected[:, FIELDS.index("mom_cap")] = np.minimum(start[FIELDS.index("mom_cap")], start[FIELDS.index("mom_strength")])
+    np.testing.assert_array_equal(x, expected)
+
+def test_mom_cap_above_strength_does_not_change_paths():
+    u, z = draw_shocks(np.random.default_rng(1), 200, 40)
+    capped = dict(PARAMS, mom_cap=np.asarray(PARAMS["mom_strength"]))
+    loose = dict(PARAMS, mom_cap=2 * np.asarray(PARAMS["mom_strength"]) + 0.1)
+    np.testing.assert_array_equal(paths_from_shocks(u, z, params=capped), paths_from_shocks(u, z, params=loose))
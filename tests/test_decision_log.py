@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+import decision_log
+from decision_log import (HEADER, LEGACY_HEADER, LEGACY_LOG_DTYPE, LOG_DTYPE, LOG_ENV, MAGIC, DecisionLog,
+                          configured_log_path, instrument_set_digest, iter_chunks, open_log)
+from game_engine import CHOICE_CODE, CHOICES, INSTRUMENT_SET, LEGACY_INSTRUMENT_SET
+
+# Dziennik decyzji: opcjonalny zapis, nagłówki obu wersji formatu, obcinanie niedopisanego rekordu
+# i odrzucanie dzienników zapisanych w innym zestawie instrumentów.
+
+def decision(t: int, choice: str, weights=None) -> dict:
+    d = {"round": t, "choice": choice, "leverage": t % 2 == 0, "return": 0.01 * t, "capital": 1000.0 + t}
+    if weights is not None:
+        d["weights"] = weights
+    return d
+
+def write_log(path, decisions, session: int = 7):
+    log = DecisionLog(str(path))
+    for d in decisions:
+        assert log.append(session, d)
+    log.close()
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("0", None), ("d.bin", "d.bin")])
+def test_log_is_opt_in(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv(LOG_ENV, raising=False)
+    else:
+        monkeypatch.setenv(LOG_ENV, value)
+    assert configured_log_path() == expected
+
+def test_round_trip_with_weights(tmp_path):
+    path = tmp_path / "d.bin"
+    mix = np.linspace(1, 2, len(CHOICES)) / np.linspace(1, 2, len(CHOICES)).sum()
+    write_log(path, [decision(1, CHOICES[0]), decision(2, CHOICES[-1], weights=mix)])
+    # Drugie otwarcie dopisuje na koniec, bez drugiego nagłówka
+    write_log(path, [decision(3, CHOICES[1])], session=8)
+
+    assert path.read_bytes()[:len(HEADER)] == HEADER
+    log = open_log(str(path))
+    assert log.dtype == LOG_DTYPE
+    assert log["session"].tolist() == [7, 7, 8]
+    assert log["round"].tolist() == [1, 2, 3]
+    assert log["choice"].tolist() == [0, CHOICE_CODE[CHOICES[-1]], 1]
+    assert log["leverage"].tolist() == [False, True, False]
+    np.testing.assert_array_equal(log["weights"][0], np.eye(len(CHOICES))[0])
+    np.testing.assert_allclose(log["weights"][1], mix, rtol=1e-6)
+    chunks = list(iter_chunks(str(path), chunk_records=2))
+    assert [len(c) for c in chunks] == [2, 1]
+    np.testing.assert_array_equal(np.concatenate(chunks), log)
+
+def test_torn_last_record_is_truncated(tmp_path):
+    path = tmp_path / "d.bin"
+    write_log(path, [decision(1, CHOICES[0]), decision(2, CHOICES[1])])
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (LOG_DTYPE.itemsize // 2))
+    # Odczyt pomija niedopisany koniec, a zapis go obcina i dopisuje pełne rekordy zaraz po ostatnim
+    assert len(open_log(str(path))) == 2
+    write_log(path, [decision(3, CHOICES[2])])
+    assert path.stat().st_size == len(HEADER) + 3 * LOG_DTYPE.itemsize
+    assert open_log(str(path))["round"].tolist() == [1, 2, 3]
+
+@pytest.mark.skipif(INSTRUMENT_SET != LEGACY_INSTRUMENT_SET, reason="dziennik v1 istnieje tylko w zestawie domyślnym")
+def test_legacy_log_is_read_and_appended_in_its_format(tmp_path):
+    path = tmp_path / "v1.bin"
+    old = np.array([(5, 1, 2, False, 0.5, 1500.0)], dtype=LEGACY_LOG_DTYPE)
+    path.write_bytes(LEGACY_HEADER + old.tobytes())
+    write_log(path, [decision(2, CHOICES[0], weights=np.full(len(CHOICES), 1 / len(CHOICES)))])
+
+    assert path.stat().st_size == len(LEGACY_HEADER) + 2 * LEGACY_LOG_DTYPE.itemsize
+    log = open_log(str(path))
+    assert log.dtype == LEGACY_LOG_DTYPE
+    assert log["session"].tolist() == [5, 7]
+    assert log["round"].tolist() == [1, 2]
+
+def test_other_instrument_set_is_rejected(tmp_path):
+    path = tmp_path / "inny.bin"
+    header = MAGIC + HEADER[len(MAGIC):len(MAGIC) + 8] + instrument_set_digest("SP500,CASH")
+    path.write_bytes(header)
+    with pytest.raises(ValueError, match="zestawie instrumentów"):
+        open_log(str(path))
+    with pytest.raises(ValueError, match="zestawie instrumentów"):
+        DecisionLog(str(path))
+    assert path.read_bytes() == header
+
+# Dziennik v1 zapisano w zestawie domyślnym, więc przy innym zestawie jego kody znaczą co innego
+def test_legacy_log_is_rejected_with_another_instrument_set(tmp_path, monkeypatch):
+    path = tmp_path / "v1.bin"
+    path.write_bytes(LEGACY_HEADER)
+    monkeypatch.setattr(decision_log, "INSTRUMENT_SET", "SP500,CASH")
+    with pytest.raises(ValueError, match="zestawie instrumentów"):
+        open_log(str(path))
+
+def test_unknown_file_is_rejected(tmp_path):
+    path = tmp_path / "obcy.bin"
+    path.write_bytes(b"to nie jest dziennik decyzji")
+    with pytest.raises(ValueError, match="nie jest dziennikiem"):
+        open_log(str(path))
@@ -0,0 +1,240 @@
+import numpy as np
+import pytest
+
+from game_engine import CHOICES, INSTR_INDEX, compute_player_scores, decisions_from_codes
+from returns_model import MOMENTUM_LOOKBACK, PARAMS, RISKY_KEYS, draw_shocks, paths_from_shocks, simulate_paths
+from rng_streams import counter_shocks, counter_uniforms, round_shock, seeded_path, seeded_paths
+from scoring import compute_player_scores_batch, compute_portfolio_scores_batch, game_scores
+
+# Równoważności, na których opierają się szybkie ścieżki gry: ocena pojedyncza, wsadowa i portfelowa
+# względem oceny z pierwotnej wersji aplikacji, generator licznikowy (numer gry odtwarza grę)
+# i symulacja z buforem cyklicznym względem prostej pętli po historii zwrotów.
+# Testy zakładają domyślny zestaw instrumentów (instruments.json).
+
+N_ROUNDS = 40
+
+# Ocena gracza z pierwotnej wersji aplikacji (investment_game.py przed wydzieleniem silnika gry),
+# przepisana bez st.session_state: returns to słownik instrument -> lista zwrotów rund
+def baseline_scores(decisions, returns):
+    if not decisions:
+        return {"risk": 0, "rationality": 0, "notes": ["Brak decyzji do oceny."]}
+
+    n = len(decisions)
+    counts = {"SP500": 0, "GOLD": 0, "BTC": 0, "CASH": 0}
+    lev_count = 0
+    switches = 0
+
+    prev_choice = None
+    for d in decisions:
+        ch = d["choice"]
+        counts[ch] += 1
+        if d.get("leverage"):
+            lev_count += 1
+        if prev_choice is not None and ch != prev_choice:
+            switches += 1
+        prev_choice = ch
+
+    share = {k: counts[k] / n for k in counts}
+    share_lev = lev_count / n
+    switch_rate = switches / max(1, (n - 1))
+
+    concentration = sum(v**2 for v in share.values())
+
+    risk_raw = (
+        0.90 * share["BTC"] +
+        0.25 * share["GOLD"] -
+        0.35 * share["SP500"] +
+        0.75 * share_lev +
+        0.25 * concentration -
+        0.90 * share["CASH"]
+    )
+    risk = int(max(0, min(100, round(50 + 70 * risk_raw))))
+
+    penalties = 0.0
+    bonuses = 0.0
+
+    def neg_streak(series, upto_index_exclusive, window=3):
+        start = max(0, upto_index_exclusive - window)
+        ctx = series[start:upto_index_exclusive]
+        s = 0
+        for x in reversed(ctx):
+            if x < 0:
+                s += 1
+            else:
+                break
+        return s
+
+    def big_up(series, upto_index_exclusive, threshold=0.08):
+        if upto_index_exclusive - 1 < 0 or upto_index_exclusive - 1 >= len(series):
+            return False
+        return series[upto_index_exclusive - 1] >= threshold
+
+    for d in decisions:
+        r = d["round"]
+        ch = d["choice"]
+        lev = d.get("leverage", False)
+
+        if ch == "CASH":
+            btc_ns = neg_streak(returns["BTC"], r - 1, window=3)
+            if btc_ns >= 2:
+                bonuses += 0.35
+            continue
+
+        series = returns[ch]
+
+        ns = neg_streak(series, r - 1, window=3)
+        if ns >= 2:
+            mult = 1.0
+            if ch == "BTC":
+                mult = 1.35
+            elif ch == "GOLD":
+                mult = 1.15
+            penalties += mult * (ns - 1)
+
+        if lev:
+            last2_start = max(0, (r - 1) - 2)
+            last2 = series[last2_start:(r - 1)]
+            if len(last2) == 2 and all(x < 0 for x in last2):
+                penalties += 1.2 if ch != "SP500" else 0.9
+
+        if big_up(series, r - 1, threshold=0.10 if ch == "BTC" else 0.06):
+            penalties += 0.25 if ch == "SP500" else 0.35
+
+        btc_ns = neg_streak(returns["BTC"], r - 1, window=3)
+        if btc_ns >= 2 and ch in ("SP500", "GOLD"):
+            bonuses += 0.25
+
+        if (not lev) and ns >= 2:
+            bonuses += 0.12
+
+    if switch_rate > 0.55:
+        penalties += (switch_rate - 0.55) * 3.0
+
+    if concentration > 0.55 and share["BTC"] > 0.5:
+        penalties += 1.0
+
+    rationality = 85.0 - 6.5 * penalties + 3.0 * bonuses
+    if risk > 80:
+        rationality -= (risk - 80) * 0.25
+
+    rationality = int(max(0, min(100, round(rationality))))
+
+    notes = [
+        f"Udział wyborów: BTC {share['BTC']:.0%}, Złoto {share['GOLD']:.0%}, S&P 500 {share['SP500']:.0%}, Gotówka {share['CASH']:.0%}.",
+        f"Lewar użyty w {share_lev:.0%} rund.",
+        f"Częstotliwość zmian instrumentu: {switch_rate:.0%} (im wyżej, tym większe ryzyko overtradingu).",
+        f"Koncentracja portfela: {concentration:.2f} (im wyżej, tym mniej dywersyfikacji).",
+    ]
+    return {"risk": risk, "rationality": rationality, "notes": notes}
+
+# Losowe gry o n_decisions decyzjach: kody wyborów, dźwignia i ścieżki zwrotów (gry x rundy x instrumenty).
+# Wybory losujemy z przewagą powtórek poprzedniego wyboru, żeby trafiały się też rzadkie zmiany i koncentracja.
+def random_games(n_games: int, n_decisions: int, seed: int):
+    rng = np.random.default_rng(seed)
+    fresh = rng.integers(len(CHOICES), size=(n_games, n_decisions))
+    repeat = rng.random((n_games, n_decisions)) < rng.random((n_games, 1))
+    choices = fresh.copy()
+    for t in range(1, n_decisions):
+        choices[:, t] = np.where(repeat[:, t], choices[:, t - 1], fresh[:, t])
+    leverage = rng.random((n_games, n_decisions)) < rng.random((n_games, 1))
+    returns = simulate_paths(n_games, N_ROUNDS, rng=rng)
+    return choices, leverage, returns
+
+def returns_dict(path) -> dict:
+    return {k: path[:, i].tolist() for k, i in INSTR_INDEX.items()}
+
+@pytest.mark.parametrize("n_decisions", [0, 1, 2, 5, 20, 39])
+def test_scalar_scores_match_baseline(n_decisions):
+    choices, leverage, returns = random_games(300, n_decisions, seed=n_decisions)
+    for g in range(len(choices)):
+        decisions = decisions_from_codes(choices[g], leverage[g])
+        expected = baseline_scores(decisions, returns_dict(returns[g]))
+        assert compute_player_scores(decisions, returns_dict(returns[g])) == expected
+
+@pytest.mark.parametrize("n_decisions", [1, 2, 5, 20, 39])
+def test_batch_scores_match_scalar(n_decisions):
+    choices, leverage, returns = random_games(300, n_decisions, seed=100 + n_decisions)
+    batch = compute_player_scores_batch(choices, leverage, returns)
+    for g in range(len(choices)):
+        decisions = decisions_from_codes(choices[g], leverage[g])
+        assert game_scores(batch, g) == compute_player_scores(decisions, returns_dict(returns[g]))
+
+# Portfel z całym kapitałem w jednej pozycji to zwykły wybór instrumentu
+@pytest.mark.parametrize("n_decisions", [1, 2, 5, 20, 39])
+def test_one_hot_portfolio_scores_match_batch(n_decisions):
+    choices, leverage, returns = random_games(300, n_decisions, seed=200 + n_decisions)
+    weights = np.eye(len(CHOICES))[choices]
+    portfolio = compute_portfolio_scores_batch(weights, leverage, returns)
+    batch = compute_player_scores_batch(choices, leverage, returns)
+    np.testing.assert_array_equal(portfolio["risk"], batch["risk"])
+    np.testing.assert_array_equal(portfolio["rationality"], batch["rationality"])
+    for g in range(len(choices)):
+        assert game_scores(portfolio, g) == game_scores(batch, g)
+
+# Numer gry musi odtwarzać tę samą grę także po aktualizacji kodu: przypinamy kilka pierwszych liczb
+def test_counter_rng_golden_values():
+    assert float(counter_uniforms(1, 0)) == 0.4793099186055877
+    u, z = round_shock(12345, 0, 0)
+    assert u == 0.4752310172130674
+    assert z == pytest.approx(-1.1350759829791857, rel=1e-12)
+    u, z = round_shock(12345, 39, 2)
+    assert u == 0.9995401012181971
+    assert z == pytest.approx(-0.920721948768148, rel=1e-12)
+
+def test_counter_shocks_are_addressable_by_round():
+    seeds = [0, 1, 12345, 10**9 - 1]
+    u, z = counter_shocks(seeds, N_ROUNDS)
+    assert u.shape == z.shape == (len(seeds), N_ROUNDS, len(RISKY_KEYS))
+    assert np.all((u >= 0) & (u < 1))
+    u_tail, z_tail = counter_shocks(seeds, 10, start_round=30)
+    np.testing.assert_array_equal(u_tail, u[:, 30:])
+    np.testing.assert_array_equal(z_tail, z[:, 30:])
+    for s, seed in enumerate(seeds):
+        for t in (0, 17, N_ROUNDS - 1):
+            for i in range(len(RISKY_KEYS)):
+                assert round_shock(seed, t, i) == (u[s, t, i], z[s, t, i])
+
+def test_seeded_paths_are_deterministic_and_extendable():
+    seeds = [3, 7, 123456789]
+    paths = seeded_paths(seeds, N_ROUNDS)
+    for s, seed in enumerate(seeds):
+        np.testing.assert_array_equal(seeded_path(seed, N_ROUNDS), paths[s])
+        np.testing.assert_array_equal(seeded_path(seed, 2 * N_ROUNDS)[:N_ROUNDS], paths[s])
+    assert not np.array_equal(paths[0], paths[1])
+
+# Symulacja z pierwotnej wersji (streak_bias i sample_return) jako pętla po rundach i instrumentach:
+# trend z sumy znaków ostatnich lookback zwrotów, potem reżim (krach, rajd albo zwykły zwrot) i widełki
+def reference_paths(u, z, history=None, params=PARAMS, lookback: int = MOMENTUM_LOOKBACK):
+    n_paths, n_rounds, n_instr = u.shape
+    out = np.empty((n_paths, n_rounds, n_instr))
+    for g in range(n_paths):
+        for i in range(n_instr):
+            p = {f: v[i] for f, v in params.items()}
+            series = [] if history is None else list(history[g, :, i])
+            for t in range(n_rounds):
+                last = series[-lookback:]
+                score = sum(1 if x > 0 else (-1 if x < 0 else 0) for x in last)
+                bias = max(-p["mom_cap"], min(p["mom_cap"], (score / lookback) * p["mom_strength"]))
+                if u[g, t, i] < p["crash_p"]:
+                    r = p["crash_mu"] + p["crash_sigma"] * z[g, t, i]
+                elif u[g, t, i] < p["crash_p"] + p["rally_p"]:
+                    r = p["rally_mu"] + p["rally_sigma"] * z[g, t, i]
+                else:
+                    r = (p["mean"] + bias) + p["vol"] * z[g, t, i]
+                r = max(p["ret_floor"], min(p["ret_cap"], r))
+                out[g, t, i] = r
+                series.append(r)
+    return out
+
+def test_ring_buffer_simulation_matches_reference():
+    u, z = draw_shocks(np.random.default_rng(5), 50, N_ROUNDS)
+    np.testing.assert_array_equal(paths_from_shocks(u, z), reference_paths(u, z))
+
+# Dalszy ciąg ścieżki od historii zwrotów (np. wydłużanie gry) to ta sama ścieżka co liczona od początku
+@pytest.mark.parametrize("split", [1, 3, MOMENTUM_LOOKBACK, 25])
+def test_simulation_continues_from_history(split):
+    u, z = draw_shocks(np.random.default_rng(split), 50, N_ROUNDS)
+    full = paths_from_shocks(u, z)
+    tail = paths_from_shocks(u[:, split:], z[:, split:], history=full[:, :split])
+    np.testing.assert_array_equal(tail, full[:, split:])
+    np.testing.assert_array_equal(tail, reference_paths(u[:, split:], z[:, split:], history=full[:, :split]))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import game_engine
+from game_engine import (CASH_CODE, CASH_WEIGHTS, CHOICES, LEVERAGE_CAP_BY_CODE, LEVERAGE_MULT, choice_returns,
+                         drifted_weights, instrument_returns, leveraged_return, portfolio_growth)
+from returns_model import RISKY_KEYS
+
+# Dźwignia i udziały portfela na krańcach: zwrot z dźwignią nigdy nie odbiera więcej niż cały kapitał
+# (także bez widełek leverage_cap), a portfel, który stracił wszystko, nie dzieli przez zero.
+
+# Zestaw bez widełek dźwigni (leverage_cap: null przy każdym instrumencie)
+@pytest.fixture
+def no_leverage_caps(monkeypatch):
+    caps = np.full(len(CHOICES), np.inf)
+    monkeypatch.setattr(game_engine, "LEVERAGE_CLAMPS", {})
+    monkeypatch.setattr(game_engine, "LEVERAGE_CAP_BY_CODE", caps)
+    monkeypatch.setattr(game_engine, "LEVERAGE_FLOOR_BY_CODE", -np.minimum(caps, game_engine.LEVERAGED_LOSS_LIMIT))
+
+def test_leveraged_loss_stops_at_total_loss(no_leverage_caps):
+    key = RISKY_KEYS[0]
+    assert leveraged_return(key, -0.7) == -1.0
+    assert leveraged_return(key, 0.7) == pytest.approx(0.7 * LEVERAGE_MULT)
+    row = np.full(len(RISKY_KEYS), -0.7)
+    np.testing.assert_array_equal(choice_returns(row[None], [0], [True]), [-1.0])
+    inst = instrument_returns(row, True)
+    np.testing.assert_array_equal(inst[:len(RISKY_KEYS)], -1.0)
+    assert inst[CASH_CODE] == 0.0
+
+def test_caps_still_apply_with_loss_limit():
+    for code, key in enumerate(RISKY_KEYS):
+        cap = LEVERAGE_CAP_BY_CODE[code]
+        assert leveraged_return(key, -10.0) == -min(cap, 1.0)
+        assert leveraged_return(key, 10.0) == (cap if np.isfinite(cap) else 20.0)
+
+def test_drifted_weights_fall_back_to_cash_after_total_loss(no_leverage_caps):
+    # Cały kapitał w instrumentach, które tracą 100%: udziały po rundzie to sama gotówka, a nie NaN
+    weights = np.zeros(len(CHOICES))
+    weights[:len(RISKY_KEYS)] = 1 / len(RISKY_KEYS)
+    row = np.full(len(RISKY_KEYS), -0.7)
+    growth, held = portfolio_growth(row, weights, True, CASH_WEIGHTS, cost=0.0)
+    assert growth == 0.0
+    np.testing.assert_array_equal(held, CASH_WEIGHTS)
+
+    # Wsadowo: zbankrutowany portfel nie psuje sąsiednich
+    batch = np.stack([weights, CASH_WEIGHTS])
+    rows = np.stack([row, row])
+    held = drifted_weights(batch, instrument_returns(rows, np.array([True, True])))
+    np.testing.assert_array_equal(held, np.stack([CASH_WEIGHTS, CASH_WEIGHTS]))
+
+def test_drifted_weights_sum_to_one():
+    rng = np.random.default_rng(0)
+    weights = rng.dirichlet(np.ones(len(CHOICES)), size=100)
+    inst = instrument_returns(rng.normal(0, 0.1, (100, len(RISKY_KEYS))), rng.random(100) < 0.5)
+    held = drifted_weights(weights, inst)
+    np.testing.assert_allclose(held.sum(axis=1), 1.0)
+    assert np.all(held >= 0)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import history
+from history import History, build_cache, game_from_history, history_returns, read_prices
+from horizons import HORIZONS
+from returns_model import RISKY_KEYS
+
+# Tryb historyczny na małych syntetycznych notowaniach: łączenie plików po wspólnych datach, zwroty
+# miesięczne i dzienne, pamięć podręczna .npy, okna gry (widoki) i gra na oknie zgodna z cenami.
+
+N_DAYS = 1500
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2014-01-01", periods=N_DAYS)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (N_DAYS, len(RISKY_KEYS))), axis=0))
+    return pd.DataFrame(values, index=dates, columns=list(RISKY_KEYS))
+
+# Katalog z plikiem CSV na instrument; pierwszy instrument nie ma notowań z trzech dni
+@pytest.fixture(scope="module")
+def source_dir(prices, tmp_path_factory):
+    path = tmp_path_factory.mktemp("notowania")
+    for i, key in enumerate(RISKY_KEYS):
+        df = prices[[key]].rename(columns={key: "Close"}).rename_axis("Date").reset_index()
+        if i == 0:
+            df = df.drop(index=[10, 11, 500])
+        df.to_csv(path / f"{key.lower()}.csv", index=False)
+    return str(path)
+
+def test_directory_and_single_file_give_the_same_prices(prices, source_dir, tmp_path):
+    from_dir = read_prices(source_dir)
+    assert len(from_dir) == N_DAYS - 3
+    assert list(from_dir.columns) == list(RISKY_KEYS)
+    np.testing.assert_allclose(from_dir.to_numpy(), prices.drop(index=prices.index[[10, 11, 500]]).to_numpy())
+
+    single = tmp_path / "wszystko.csv"
+    prices.rename_axis("data").reset_index().to_csv(single, index=False, sep=";")
+    np.testing.assert_allclose(read_prices(str(single)).to_numpy(), prices.to_numpy())
+
+def test_monthly_returns_use_last_price_of_month(prices):
+    dates, returns = history_returns(prices, "month")
+    month_end = prices.groupby(prices.index.to_period("M")).last().to_numpy()
+    assert len(dates) == len(returns) + 1 == len(month_end)
+    assert dates[0] == np.datetime64("2014-01-01")
+    np.testing.assert_allclose(returns, month_end[1:] / month_end[:-1] - 1)
+
+    dates, returns = history_returns(prices, "busday")
+    assert len(dates) == N_DAYS
+    np.testing.assert_allclose(returns[0], prices.iloc[1].to_numpy() / prices.iloc[0].to_numpy() - 1)
+
+def test_cache_is_built_once(source_dir, tmp_path, monkeypatch):
+    paths = build_cache(source_dir, "month", cache_dir=str(tmp_path))
+    assert all(np.load(p).shape[0] > 0 for p in paths)
+
+    def no_parsing(source):
+        raise AssertionError("notowania czytane drugi raz")
+
+    monkeypatch.setattr(history, "read_prices", no_parsing)
+    assert build_cache(source_dir, "month", cache_dir=str(tmp_path)) == paths
+
+def make_history(n_points: int = 50, unit: str = "month") -> History:
+    dates = np.datetime64("2010-01-01", "M") + np.arange(n_points)
+    returns = np.linspace(-0.05, 0.05, (n_points - 1) * len(RISKY_KEYS)).reshape(n_points - 1, len(RISKY_KEYS))
+    return History(dates.astype("datetime64[D]"), returns, unit)
+
+def test_windows_are_views_within_bounds():
+    h = make_history(50)
+    assert h.window_count(40) == 10
+    assert h.window_count(49) == 1
+    assert h.window_count(60) == 0
+    window = h.window(9, 40)
+    assert np.shares_memory(window, h.returns)
+    np.testing.assert_array_equal(window, h.returns[9:49])
+    for start in (-1, 10):
+        with pytest.raises(ValueError):
+            h.window(start, 40)
+    with pytest.raises(ValueError):
+        h.random_start(60)
+    starts = {h.random_start(40, np.random.default_rng(s)) for s in range(200)}
+    assert starts == set(range(10))
+
+def test_start_at_finds_first_point_on_or_after_date():
+    h = make_history(50)
+    assert h.start_at("2010-01-01") == 0
+    assert h.start_at("2010-01-02") == 1
+    assert h.start_at("2010-03-01") == 2
+    assert h.start_at("2009-06-15") == 0
+    assert h.label(2) == "mar 10"
+
+@pytest.mark.parametrize("portfolio", [False, True])
+def test_game_plays_the_window(source_dir, tmp_path, monkeypatch, portfolio):
+    monkeypatch.setenv(history.CACHE_DIR_ENV, str(tmp_path))
+    h = history.load_history(source_dir, "month")
+    rounds = HORIZONS["monthly"]["rounds"]
+    start = h.window_count(rounds) - 1
+    game, got = game_from_history(h, "monthly", start=start, portfolio=portfolio)
+    assert got == start
+    assert game.seed is None
+    assert np.shares_memory(game.path, h.returns)
+    while not game.finished:
+        game.step(RISKY_KEYS[0])
+    # Cały kapitał w jednym instrumencie przez całą grę rośnie jak jego cena
+    # (portfel płaci raz koszt przebudowy z gotówki: obrót 2 w pierwszej rundzie)
+    growth = np.prod(1 + h.window(start, rounds)[:rounds - 1], axis=0)
+    cost = 1 - 2 * game.rebalance_cost if portfolio else 1.0
+    assert game.capital == pytest.approx(game.start_capital * growth[0] * cost, rel=1e-9)
+    np.testing.assert_allclose(game.history[game.round, :len(RISKY_KEYS)], game.start_capital * growth, rtol=1e-9)
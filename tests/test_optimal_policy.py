@@ -0,0 +1,122 @@
+import functools
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from game_engine import CHOICES, instrument_returns
+from optimal_policy import (ACTION_CHOICE, ACTION_LEVERAGE, MOMENTUM_LOOKBACK, N_RISKY, PARAMS, POLICY_SUPPORTED,
+                            decision_regret, instrument_moments, path_action_values, path_windows, solve)
+from returns_model import draw_shocks, paths_from_shocks
+from rng_streams import seeded_path
+
+# Programowanie dynamiczne strategii optymalnej: tabele z solve() porównujemy z rekurencją po drzewie
+# znaków zwrotów (expectimax z pamięcią), a ocenę decyzji na ścieżce z tabelami i z definicją straty.
+
+pytestmark = pytest.mark.skipif(not POLICY_SUPPORTED, reason="tabele liczymy dla 3 instrumentów ryzykownych")
+
+SMALL_ROUNDS = 6
+SMALL_LEVERAGE_FROM = 2
+
+# Wartość stanu liczona wprost: najlepsza akcja i suma po 2^3 kombinacjach znaków następnej rundy.
+# Tabela gain zawiera E[g(zwrot) * 1{znak}], więc dzielimy ją przez prawdopodobieństwo znaku instrumentu.
+def reference_value(table: dict, total_rounds: int, leverage_from: int):
+    p_up, gain, ev = table["p_up"], table["gain"], table["objective"] == "ev"
+
+    @functools.lru_cache(maxsize=None)
+    def value(t: int, windows: tuple) -> float:
+        if t == total_rounds - 1:
+            return 1.0 if ev else 0.0
+        length = min(t, MOMENTUM_LOOKBACK)
+        mask = (1 << min(t + 1, MOMENTUM_LOOKBACK)) - 1
+        k = [2 * bin(w).count("1") - length + MOMENTUM_LOOKBACK for w in windows]
+        best = -np.inf
+        for c, lev in zip(ACTION_CHOICE, ACTION_LEVERAGE):
+            if lev and t < leverage_from:
+                continue
+            total = 0.0
+            for signs in itertools.product((0, 1), repeat=N_RISKY):
+                probs = [p_up[i, k[i]] if s else 1.0 - p_up[i, k[i]] for i, s in enumerate(signs)]
+                prob = math.prod(probs)
+                v = value(t + 1, tuple(((w << 1) | s) & mask for w, s in zip(windows, signs)))
+                if c >= N_RISKY:
+                    total += prob * v
+                    continue
+                g = gain[c, int(lev), signs[c], k[c]] * prob / probs[c]
+                total += prob * v + g if not ev else g * v
+            best = max(best, total)
+        return best
+
+    return value
+
+@pytest.mark.parametrize("objective", ["log", "ev"])
+def test_solve_matches_expectimax(objective):
+    table = solve(total_rounds=SMALL_ROUNDS, leverage_from=SMALL_LEVERAGE_FROM, objective=objective)
+    value = reference_value(table, SMALL_ROUNDS, SMALL_LEVERAGE_FROM)
+    for t in range(SMALL_ROUNDS):
+        n = 1 << min(t, MOMENTUM_LOOKBACK)
+        for windows in itertools.product(range(n), repeat=N_RISKY):
+            assert table["value"][(t,) + windows] == pytest.approx(value(t, windows), rel=1e-5, abs=1e-6)
+
+# Model z widełkami zwrotów szerszymi niż widełki dźwigni: widełki dźwigni nie mogą obcinać zwrotu bez dźwigni
+WIDE_PARAMS = dict(PARAMS, ret_floor=np.full(N_RISKY, -0.9), ret_cap=np.full(N_RISKY, 1.5),
+                   vol=np.full(N_RISKY, 0.3))
+
+# Momenty z całkowania rozkładu porównujemy z próbą zwrotów z modelu (pierwsza runda po historii
+# o zadanym trendzie), z dźwignią liczoną jak w grze (instrument_returns)
+@pytest.mark.parametrize("params", [PARAMS, WIDE_PARAMS], ids=["default", "wide"])
+@pytest.mark.parametrize("objective", ["log", "ev"])
+@pytest.mark.parametrize("trend", [-1, 0, 1])
+def test_moments_match_simulated_returns(params, objective, trend):
+    n = 400_000
+    mom = instrument_moments(params, objective)
+    k = trend * MOMENTUM_LOOKBACK + MOMENTUM_LOOKBACK
+    u, z = draw_shocks(np.random.default_rng(trend + 10), n, 1)
+    r = paths_from_shocks(u, z, history=np.full((MOMENTUM_LOOKBACK, N_RISKY), 0.01 * trend), params=params)[:, 0]
+    up = r > 0
+    se = np.sqrt(up.mean(axis=0) * (1 - up.mean(axis=0)) / n)
+    np.testing.assert_array_less(np.abs(mom["p_up"][:, k] - up.mean(axis=0)), 5 * se + 1e-4)
+    for lev in (0, 1):
+        inst = instrument_returns(r, np.full(n, bool(lev)))[:, :N_RISKY]
+        g = np.log1p(inst) if objective == "log" else 1.0 + inst
+        for sign, mask in ((1, up), (0, ~up)):
+            sample = g * mask
+            tol = 5 * sample.std(axis=0) / np.sqrt(n) + 1e-4
+            np.testing.assert_array_less(np.abs(mom["gain"][:, lev, sign, k] - sample.mean(axis=0)), tol)
+
+@pytest.fixture(scope="module")
+def monthly_table():
+    return solve()
+
+def test_path_values_agree_with_tables(monthly_table):
+    path = seeded_path(2024, 40)
+    n = 39
+    q = path_action_values(monthly_table, path, n)
+    windows = path_windows(path, n)
+    expected = monthly_table["value"][np.arange(n), windows[:, 0], windows[:, 1], windows[:, 2]]
+    np.testing.assert_allclose(q.max(axis=1), expected, rtol=1e-5, atol=1e-6)
+    assert np.all(np.isneginf(q[:monthly_table["leverage_from"], ACTION_LEVERAGE]))
+    np.testing.assert_array_equal(q.argmax(axis=1),
+                                  monthly_table["policy"][np.arange(n), windows[:, 0], windows[:, 1], windows[:, 2]])
+
+def test_regret_is_zero_for_the_optimal_strategy(monthly_table):
+    path = seeded_path(99, 40)
+    n = 39
+    q = path_action_values(monthly_table, path, n)
+    best = q.argmax(axis=1)
+    regret = decision_regret(monthly_table, path, ACTION_CHOICE[best], ACTION_LEVERAGE[best])
+    assert np.all(regret["optimal"])
+    np.testing.assert_array_equal(regret["regret"], 0.0)
+    np.testing.assert_array_equal(regret["best_choice"], ACTION_CHOICE[best])
+
+    # Każda inna strategia ma nieujemną stratę, równą różnicy wartości akcji
+    rng = np.random.default_rng(1)
+    choices = rng.integers(len(CHOICES), size=n)
+    # Jak w grze: dźwignia dopiero od leverage_from, a przy gotówce nic nie zmienia
+    leverage = (rng.random(n) < 0.5) & (np.arange(n) >= monthly_table["leverage_from"])
+    regret = decision_regret(monthly_table, path, choices, leverage)
+    assert np.all(regret["regret"] >= 0)
+    assert not regret["best_leverage"][:monthly_table["leverage_from"]].any()
+    played = np.where(leverage & (choices < N_RISKY), len(CHOICES) + np.minimum(choices, N_RISKY - 1), choices)
+    np.testing.assert_allclose(regret["regret"], q[np.arange(n), best] - q[np.arange(n), played])
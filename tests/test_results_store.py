@@ -0,0 +1,141 @@
+import contextlib
+import sqlite3
+
+import numpy as np
+import pytest
+
+from game_engine import DECISION_DTYPE, INSTR_INDEX, INSTRUMENT_SET, LEGACY_INSTRUMENT_SET
+from results_store import (ADDED_COLUMNS, DB_ENV, ResultsStore, configured_db_path, decisions_from_blob,
+                           returns_from_blob)
+
+# Baza wyników: opcjonalny zapis (zmienna środowiskowa), migracja bazy z pierwszej wersji schematu
+# i filtry rankingu (horyzont, tryb gry, gry na prawdziwych notowaniach, zestaw instrumentów, czas).
+
+# Schemat tabeli z pierwszej wersji aplikacji, sprzed kolumn z ADDED_COLUMNS
+OLD_SCHEMA = """
+CREATE TABLE games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    player TEXT,
+    horizon TEXT NOT NULL,
+    seed INTEGER,
+    scenario INTEGER,
+    rounds INTEGER NOT NULL,
+    final_capital REAL NOT NULL,
+    sp500 REAL NOT NULL,
+    gold REAL NOT NULL,
+    btc REAL NOT NULL,
+    risk INTEGER NOT NULL,
+    rationality INTEGER NOT NULL,
+    decisions BLOB NOT NULL,
+    returns BLOB NOT NULL
+);
+"""
+
+OLD_INSERT = """
+INSERT INTO games (finished_at, player, horizon, seed, scenario, rounds, final_capital,
+                   sp500, gold, btc, risk, rationality, decisions, returns)
+VALUES (?, ?, 'monthly', 1, 0, 2, ?, 1.0, 1.0, 1.0, 50, 50, ?, ?)
+"""
+
+# Rekord w formacie game_record; pola spoza argumentów mają wartości nieistotne dla rankingu
+def record(final_capital: float, horizon: str = "monthly", finished_at: float = 1000.0, portfolio: bool = False,
+           history: bool = False, instruments: str = INSTRUMENT_SET, player=None) -> dict:
+    return {
+        "finished_at": finished_at,
+        "player": player,
+        "horizon": horizon,
+        "seed": None if history else 1,
+        "scenario": 0,
+        "rounds": 2,
+        "final_capital": final_capital,
+        "sp500": 1.0,
+        "gold": 1.0,
+        "btc": 1.0,
+        "risk": 50,
+        "rationality": 50,
+        "decisions": np.zeros(1, dtype=DECISION_DTYPE).tobytes(),
+        "returns": np.zeros((2, len(INSTR_INDEX))).tobytes(),
+        "instruments": instruments,
+        "portfolio": int(portfolio),
+        "weights": None,
+        "history": int(history),
+        "history_start": "2020-01-02" if history else None,
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    s = ResultsStore(str(tmp_path / "results.db"), read_pool_size=1)
+    yield s
+    s.close()
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("0", None), ("wyniki.db", "wyniki.db")])
+def test_database_is_opt_in(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv(DB_ENV, raising=False)
+    else:
+        monkeypatch.setenv(DB_ENV, value)
+    assert configured_db_path() == expected
+
+def test_old_database_is_migrated_and_ranked(tmp_path):
+    path = str(tmp_path / "old.db")
+    decisions = np.zeros(1, dtype=DECISION_DTYPE).tobytes()
+    returns = np.zeros((2, len(INSTR_INDEX))).tobytes()
+    with contextlib.closing(sqlite3.connect(path)) as conn, conn:
+        conn.executescript(OLD_SCHEMA)
+        conn.execute(OLD_INSERT, (2000.0, "stary", 500.0, decisions, returns))
+
+    store = ResultsStore(path, read_pool_size=1)
+    try:
+        with store.reader() as conn:
+            have = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+        assert set(ADDED_COLUMNS) <= have
+
+        # Stary wiersz to gra na modelu, w jednym instrumencie na rundę i w domyślnym zestawie instrumentów
+        top = store.leaderboard("monthly", portfolio=False)
+        if INSTRUMENT_SET == LEGACY_INSTRUMENT_SET:
+            assert [row["player"] for row in top] == ["stary"]
+        else:
+            assert top == []
+        assert store.leaderboard("monthly", portfolio=True) == []
+
+        store.submit(record(600.0, player="nowy"))
+        store.flush()
+        assert store.leaderboard("monthly")[0]["player"] == "nowy"
+    finally:
+        store.close()
+
+def test_leaderboard_filters(store):
+    store.submit(record(300.0, player="miesięczna"))
+    store.submit(record(200.0, player="późna", finished_at=5000.0))
+    store.submit(record(900.0, player="portfel", portfolio=True))
+    store.submit(record(800.0, player="notowania", history=True))
+    store.submit(record(700.0, player="dzienna", horizon="daily"))
+    store.submit(record(950.0, player="inny zestaw", instruments="SP500,CASH"))
+    store.flush()
+
+    assert [r["player"] for r in store.leaderboard("monthly")] == ["miesięczna", "późna"]
+    assert [r["player"] for r in store.leaderboard("monthly", since=4000.0)] == ["późna"]
+    assert [r["player"] for r in store.leaderboard("monthly", limit=1)] == ["miesięczna"]
+    assert [r["player"] for r in store.leaderboard("monthly", portfolio=True)] == ["portfel"]
+    assert [r["player"] for r in store.leaderboard("daily")] == ["dzienna"]
+
+def test_rank_counts_only_better_games_in_the_same_ranking(store):
+    for capital in (100.0, 300.0, 500.0):
+        store.submit(record(capital))
+    store.submit(record(1000.0, portfolio=True))
+    store.submit(record(1000.0, history=True))
+    store.submit(record(1000.0, horizon="daily"))
+    store.flush()
+
+    assert store.rank("monthly", 600.0) == 1
+    assert store.rank("monthly", 300.0) == 2
+    assert store.rank("monthly", 50.0) == 4
+    assert store.rank("monthly", 50.0, portfolio=True) == 2
+
+def test_blobs_round_trip_and_reject_other_instrument_sets():
+    rec = record(100.0)
+    np.testing.assert_array_equal(returns_from_blob(rec["returns"], INSTRUMENT_SET), np.zeros((2, len(INSTR_INDEX))))
+    assert decisions_from_blob(rec["decisions"], INSTRUMENT_SET).dtype == DECISION_DTYPE
+    with pytest.raises(ValueError):
+        returns_from_blob(rec["returns"], "SP500,CASH")
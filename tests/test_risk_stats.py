@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from risk_stats import risk_stats
+
+# Miary ryzyka na krótkich seriach policzonych ręcznie, seria samej gotówki (zerowa zmienność)
+# i zgodność liczenia wielu serii naraz z liczeniem każdej osobno.
+
+def test_drawdown_and_time_under_water():
+    values = np.array([100, 120, 90, 110, 130, 117], dtype=np.float64)[:, None]
+    s = risk_stats(values, periods_per_year=12)
+    assert s["max_drawdown"][0] == pytest.approx(0.25)
+    # Pod wodą w punktach 2, 3 (poniżej 120) i 5 (poniżej 130)
+    assert s["under_water"][0] == pytest.approx(3 / 5)
+    assert s["longest_under_water"][0] == 2
+
+def test_var_and_cvar_match_sorted_returns():
+    rng = np.random.default_rng(0)
+    ret = rng.normal(0.01, 0.05, 200)
+    values = np.concatenate([[1.0], np.cumprod(1 + ret)])[:, None]
+    s = risk_stats(values, periods_per_year=12, level=0.95)
+    r = values[1:, 0] / values[:-1, 0] - 1
+    cutoff = np.quantile(r, 0.05)
+    assert s["var"][0] == pytest.approx(-cutoff)
+    assert s["cvar"][0] == pytest.approx(-r[r <= cutoff].mean())
+    assert s["cvar"][0] >= s["var"][0]
+    assert s["volatility"][0] == pytest.approx(r.std(ddof=1) * np.sqrt(12))
+    assert s["sharpe"][0] == pytest.approx(r.mean() * np.sqrt(12) / r.std(ddof=1))
+    assert s["sortino"][0] == pytest.approx(r.mean() * np.sqrt(12) / np.sqrt(np.mean(np.minimum(r, 0) ** 2)))
+
+def test_constant_cash_series():
+    s = risk_stats(np.full((40, 1), 10_000.0), periods_per_year=12)
+    assert np.isnan(s["sharpe"][0]) and np.isnan(s["sortino"][0])
+    for key in ("max_drawdown", "volatility", "var", "cvar", "under_water"):
+        assert s[key][0] == 0.0
+        assert not np.signbit(s[key][0])
+    assert s["longest_under_water"][0] == 0
+
+def test_series_are_independent():
+    rng = np.random.default_rng(1)
+    values = np.cumprod(1 + rng.normal(0, 0.05, (60, 4)), axis=0)
+    values[:, 3] = 1.0
+    together = risk_stats(values, periods_per_year=252)
+    for j in range(values.shape[1]):
+        alone = risk_stats(values[:, [j]], periods_per_year=252)
+        for key, v in together.items():
+            np.testing.assert_allclose(v[[j]], alone[key], rtol=1e-12)
+
+# Kapitał, który spadł do zera (dźwignia -100%), dalej stoi w miejscu: bez NaN i bez dzielenia przez zero
+def test_wiped_out_series():
+    values = np.array([100.0, 50.0, 0.0, 0.0, 0.0])[:, None]
+    with np.errstate(all="raise"):
+        s = risk_stats(values, periods_per_year=12)
+    assert s["max_drawdown"][0] == 1.0
+    assert s["var"][0] == pytest.approx(1.0, abs=0.5)
+    assert all(np.isfinite(v[0]) for v in s.values())
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+import rooms
+from game_engine import CHOICES
+from rooms import CAPITAL_EDGES, Room, RoomRegistry, capital_bin
+
+# Statystyki pokoju są aktualizowane przyrostowo przy każdej decyzji; porównujemy je z przeliczeniem
+# od zera z gier uczestników, także gdy część graczy wyszła z pokoju w trakcie gry.
+
+# Gracz rozgrywa n_rounds losowych rund i zgłasza każdą decyzję do pokoju (jak strona gry)
+def play(room: Room, game, rng, n_rounds: int):
+    for _ in range(min(n_rounds, game.total_rounds - 1 - game.round)):
+        prev_capital = game.capital
+        if game.portfolio:
+            decision = game.step_portfolio(rng.random(len(CHOICES)), leverage=rng.random() < 0.3)
+        else:
+            decision = game.step(CHOICES[rng.integers(len(CHOICES))], leverage=rng.random() < 0.3)
+        room.record(decision, prev_capital)
+
+# Statystyki pokoju policzone od zera: rundy z gier wszystkich, którzy kiedykolwiek dołączyli,
+# bieżący kapitał tylko z gier graczy, którzy są w pokoju
+def recompute(room: Room, all_games: list, present: list) -> dict:
+    n_bins = len(CAPITAL_EDGES) + 1
+    choice_counts = np.zeros((room.total_rounds - 1, len(CHOICES)))
+    leverage_counts = np.zeros(room.total_rounds - 1, dtype=np.int64)
+    reached = np.zeros(room.total_rounds, dtype=np.int64)
+    capital_sum = np.zeros(room.total_rounds)
+    capital_hist = np.zeros((room.total_rounds, n_bins), dtype=np.int64)
+    for game in all_games:
+        capital = game.history_user
+        reached[:len(capital)] += 1
+        capital_sum[:len(capital)] += capital
+        for t, c in enumerate(capital):
+            capital_hist[t, capital_bin(c)] += 1
+        for t, d in enumerate(game.decisions):
+            if game.portfolio:
+                choice_counts[t] += game.weights[t]
+            else:
+                choice_counts[t, d["choice"]] += 1
+            leverage_counts[t] += d["leverage"]
+    current_hist = np.zeros(n_bins, dtype=np.int64)
+    for game in present:
+        current_hist[capital_bin(game.capital)] += 1
+    return {
+        "players": len(present),
+        "finished": sum(game.finished for game in present),
+        "choice_counts": choice_counts,
+        "leverage_counts": leverage_counts,
+        "reached": reached,
+        "capital_sum": capital_sum,
+        "capital_hist": capital_hist,
+        "current_hist": current_hist,
+        "current_sum": sum(game.capital for game in present),
+    }
+
+def assert_snapshot_matches(snap: dict, expected: dict):
+    assert snap["players"] == expected["players"]
+    assert snap["finished"] == expected["finished"]
+    for key in ("leverage_counts", "reached", "capital_hist", "current_hist"):
+        np.testing.assert_array_equal(snap[key], expected[key])
+    for key in ("choice_counts", "capital_sum"):
+        np.testing.assert_allclose(snap[key], expected[key], rtol=1e-12)
+    assert snap["current_sum"] == pytest.approx(expected["current_sum"], rel=1e-12)
+
+@pytest.mark.parametrize("portfolio", [False, True])
+def test_incremental_stats_match_recompute(portfolio):
+    rng = np.random.default_rng(7)
+    room = Room("TEST1", "monthly", seed=12345)
+    games = [room.join(portfolio=portfolio) for _ in range(12)]
+    for game in games:
+        play(room, game, rng, int(rng.integers(0, room.total_rounds + 5)))
+    assert any(game.finished for game in games)
+    assert_snapshot_matches(room.snapshot(), recompute(room, games, games))
+
+def test_leaving_players_drop_out_of_current_stats():
+    rng = np.random.default_rng(11)
+    room = Room("TEST2", "monthly", seed=777)
+    games = [room.join() for _ in range(8)]
+    for game in games:
+        play(room, game, rng, int(rng.integers(0, room.total_rounds + 5)))
+
+    # Wychodzi gracz, który skończył grę, i gracz w trakcie; w ich miejsce dołącza nowy
+    finished = next(g for g in games if g.finished)
+    unfinished = next(g for g in games if not g.finished)
+    for game in (finished, unfinished):
+        room.leave(game)
+    present = [g for g in games if g is not finished and g is not unfinished]
+    newcomer = room.join()
+    play(room, newcomer, rng, 5)
+
+    assert_snapshot_matches(room.snapshot(), recompute(room, games + [newcomer], present + [newcomer]))
+
+def test_players_share_the_room_path():
+    room = Room("TEST3", "monthly", seed=1)
+    a, b = room.join(), room.join(portfolio=True)
+    assert a.path is room.path and b.path is room.path
+    assert not room.path.flags.writeable
+
+def test_failed_room_does_not_leave_a_placeholder(monkeypatch):
+    registry = RoomRegistry()
+
+    def broken_room(*args):
+        raise RuntimeError("błąd budowy pokoju")
+
+    monkeypatch.setattr(rooms, "Room", broken_room)
+    with pytest.raises(RuntimeError):
+        registry.create("monthly", seed=1)
+    assert registry._rooms == {}
+
+    monkeypatch.undo()
+    room = registry.create("monthly", seed=1)
+    assert registry.get(room.code.lower()) is room
+    assert list(registry._rooms) == [room.code]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from game_engine import CHOICES
+from horizons import HORIZONS, horizon_game
+from returns_model import RISKY_KEYS
+from rng_streams import seeded_paths
+from whatif import (PATH_BUDGET_BYTES, WHATIF_SEED_BASE, alternative_paths, alternative_paths_ready, replay_finals,
+                    replay_portfolio_finals, whatif_path_count, whatif_summary)
+
+# Powtórka decyzji na ścieżkach alternatywnych: na ścieżce samej gry musi dać dokładnie kapitał z gry
+# (ta sama dźwignia, widełki i koszty przebudowy), a liczba ścieżek mieści się w budżecie horyzontu.
+
+@pytest.mark.parametrize("horizon", list(HORIZONS))
+def test_path_count_fits_budget(horizon):
+    n = whatif_path_count(horizon)
+    assert n > 0
+    assert n * HORIZONS[horizon]["rounds"] * len(RISKY_KEYS) * 4 <= PATH_BUDGET_BYTES
+
+def test_alternative_paths_are_shared_and_reproducible():
+    paths = alternative_paths("monthly")
+    assert alternative_paths_ready("monthly")
+    assert alternative_paths("monthly") is paths
+    assert not paths.flags.writeable
+    assert paths.shape == (whatif_path_count("monthly"), HORIZONS["monthly"]["rounds"], len(RISKY_KEYS))
+    seeds = np.arange(3) + WHATIF_SEED_BASE
+    np.testing.assert_array_equal(paths[:3], seeded_paths(seeds, HORIZONS["monthly"]["rounds"]).astype(np.float32))
+
+@pytest.mark.parametrize("portfolio", [False, True])
+def test_replay_on_game_path_reproduces_capital(portfolio):
+    rng = np.random.default_rng(4)
+    game = horizon_game("monthly", seed=2024, portfolio=portfolio)
+    for _ in range(game.total_rounds - 1):
+        leverage = rng.random() < 0.4
+        if portfolio:
+            game.step_portfolio(rng.random(len(CHOICES)) ** 2, leverage)
+        else:
+            game.step(CHOICES[rng.integers(len(CHOICES))], leverage)
+    paths = np.stack([game.path, np.zeros_like(game.path)])
+    d = game.decisions
+    if portfolio:
+        finals = replay_portfolio_finals(paths, game.weights, d["leverage"], game.start_capital, game.rebalance_cost)
+    else:
+        finals = replay_finals(paths, d["choice"], d["leverage"], game.start_capital)
+    assert finals[0] == pytest.approx(game.capital, rel=1e-12)
+    # Płaski rynek: kapitał stoi w miejscu, a w portfelu ubywa go tylko o koszty przebudowy
+    if portfolio:
+        assert finals[1] <= game.start_capital
+    else:
+        assert finals[1] == game.start_capital
+
+def test_summary_places_the_result_in_the_distribution():
+    finals = np.arange(1, 1001, dtype=np.float64) * 10.0
+    s = whatif_summary(finals, realized=2505.0, start_capital=5000.0)
+    assert s["paths"] == 1000
+    assert s["percentile"] == pytest.approx(25.0)
+    assert s["loss_probability"] == pytest.approx(0.499)
+    assert s["quantiles"]["p50"] == pytest.approx(np.median(finals))
+    assert s["counts"].sum() == 1000
+    assert len(s["edges"]) == len(s["counts"]) + 1
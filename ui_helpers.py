@@ -0,0 +1,195 @@
+import textwrap  # Renderowanie HTML
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from returns_model import INSTRUMENTS, RISKY_KEYS
+from risk_stats import VAR_LEVEL
+
+# Nazwy serii wykresu w kolejności kolumn bufora historii gry (benchmarki, potem gracz)
+CHART_COLUMNS = [INSTRUMENTS[k]["label"] for k in RISKY_KEYS] + ["Twój Kapitał"]
+
+# Najwięcej wierszy danych wykresu wysyłanych do przeglądarki (długie gry zmniejszamy)
+CHART_MAX_POINTS = 500
+
+# Wykres w trakcie gry idzie do przeglądarki przy każdym rerunie (Streamlit nie ma już add_rows),
+# więc dostaje mniejszy budżet niż wykres w podsumowaniu, wysyłany raz
+CHART_LIVE_POINTS = 250
+
+# Szerokość kubełka zależy tylko od długości gry, więc kubełki już rozegranych rund
+# nie zmieniają się z rundy na rundę (wykres nie "drga" w trakcie gry)
+def chart_bucket(total_rounds: int, max_points: int = CHART_MAX_POINTS) -> int:
+    return max(1, -(-2 * total_rounds // max_points))
+
+# Zmniejszanie min/max: z każdego kubełka rund zostają dwa wiersze (na jego początku i końcu)
+# z minimum i maksimum każdej serii w kolejności wystąpienia, więc krachy i szczyty nie znikają.
+# Zwraca pozycje rund i wartości; ostatni rozegrany punkt zostaje bez zmian.
+def minmax_downsample(values, bucket: int):
+    n, k = values.shape
+    nb = -(-n // bucket)
+    blocks = np.full((nb * bucket, k), np.nan)
+    blocks[:n] = values
+    blocks = blocks.reshape(nb, bucket, k)
+
+    lo = np.nanargmin(blocks, axis=1)
+    hi = np.nanargmax(blocks, axis=1)
+    rows = np.arange(nb)[:, None]
+    cols = np.arange(k)
+    out = np.empty((nb, 2, k))
+    out[:, 0] = blocks[rows, np.minimum(lo, hi), cols]
+    out[:, 1] = blocks[rows, np.maximum(lo, hi), cols]
+
+    starts = np.arange(nb) * bucket
+    idx = np.column_stack((starts, np.minimum(starts + bucket - 1, n - 1))).ravel()
+    return np.append(idx, n - 1), np.vstack((out.reshape(-1, k), values[-1:]))
+
+# Dane wykresu: rozegrane rundy z bufora historii gry (bez dopełniania do pełnej długości)
+# i numer rundy na osi X. Dane są w formacie szerokim; na długi format zamienia je przeglądarka.
+def chart_frame(game, max_points: int = CHART_MAX_POINTS):
+    played = game.history[:game.round + 1]
+    bucket = chart_bucket(game.total_rounds, max_points)
+    if bucket > 1:
+        idx, played = minmax_downsample(played, bucket)
+    else:
+        idx = np.arange(len(played))
+    data = np.column_stack((idx + 1, played))
+    return pd.DataFrame(data, columns=["Runda"] + CHART_COLUMNS, copy=False)
+
+# Specyfikacja Vega-Lite wykresu gry; stała dziedzina osi X daje stały rozmiar wykresu
+# od pierwszej rundy, więc nie trzeba wysyłać pustych punktów dla przyszłych rund
+@lru_cache(maxsize=None)
+def chart_spec(total_rounds: int) -> dict:
+    return {
+        "mark": {"type": "line"},
+        "transform": [{"fold": CHART_COLUMNS, "as": ["Seria", "Wartość"]}],
+        "encoding": {
+            "x": {"field": "Runda", "type": "quantitative", "scale": {"domain": [1, total_rounds]}, "title": None},
+            "y": {"field": "Wartość", "type": "quantitative", "scale": {"zero": False}, "title": None},
+            "color": {"field": "Seria", "type": "nominal", "sort": CHART_COLUMNS, "title": None},
+        },
+    }
+
+# Statystyki pokoju per runda z liczników (Room.snapshot), tylko dla już rozegranych rund:
+# udział wyborów instrumentów i dźwigni w % decyzji oraz średni kapitał uczestników
+def room_round_frame(snap: dict, choice_labels) -> pd.DataFrame:
+    played = int(np.count_nonzero(snap["reached"][1:]))
+    counts = snap["choice_counts"][:played]
+    decided = np.maximum(counts.sum(axis=1), 1)
+    df = pd.DataFrame(counts * 100.0 / decided[:, None], columns=list(choice_labels))
+    df["Dźwignia"] = snap["leverage_counts"][:played] * 100.0 / decided
+    df["Średni kapitał"] = snap["capital_sum"][1:played + 1] / snap["reached"][1:played + 1]
+    df.index = pd.RangeIndex(1, played + 1, name="Runda")
+    return df
+
+# Liczba uczestników w kubełkach kapitału, z czytelnymi granicami kubełków
+def capital_hist_frame(counts, edges) -> pd.DataFrame:
+    labels = [f"< {fmt_pln_num(edges[0])}"]
+    labels += [f"{fmt_pln_num(a)}–{fmt_pln_num(b)}" for a, b in zip(edges[:-1], edges[1:])]
+    labels.append(f"≥ {fmt_pln_num(edges[-1])}")
+    return pd.DataFrame({"Kapitał (PLN)": labels, "Uczestnicy": counts})
+
+# Histogram wyników tych samych decyzji na innych ścieżkach (whatif.whatif_summary) jako słupki od-do
+def whatif_frame(summary: dict) -> pd.DataFrame:
+    edges = summary["edges"]
+    return pd.DataFrame({"od": edges[:-1], "do": edges[1:], "Ścieżki": summary["counts"]})
+
+# Wykres histogramu z pionową linią prawdziwego wyniku gracza
+def whatif_spec(realized: float) -> dict:
+    return {
+        "layer": [
+            {
+                "mark": {"type": "bar", "color": "#9db4cf"},
+                "encoding": {
+                    "x": {"field": "od", "type": "quantitative", "scale": {"type": "log"}, "title": "Kapitał końcowy (PLN)"},
+                    "x2": {"field": "do"},
+                    "y": {"field": "Ścieżki", "type": "quantitative", "title": None},
+                },
+            },
+            {
+                "data": {"values": [{"Twój wynik": realized}]},
+                "mark": {"type": "rule", "color": "#b71c1c", "strokeWidth": 3},
+                "encoding": {"x": {"field": "Twój wynik", "type": "quantitative"}},
+            },
+        ],
+    }
+
+# Tabela miar ryzyka (risk_stats.risk_stats policzone na buforze historii gry): wiersz na serię, gracz pierwszy
+def risk_frame(stats: dict) -> pd.DataFrame:
+    order = [len(CHART_COLUMNS) - 1] + list(range(len(CHART_COLUMNS) - 1))
+    df = pd.DataFrame({
+        "Maks. obsunięcie %": stats["max_drawdown"] * 100,
+        "Zmienność roczna %": stats["volatility"] * 100,
+        "Sharpe": stats["sharpe"],
+        "Sortino": stats["sortino"],
+        f"VaR {VAR_LEVEL:.0%} %": stats["var"] * 100,
+        f"CVaR {VAR_LEVEL:.0%} %": stats["cvar"] * 100,
+        "Pod wodą % rund": stats["under_water"] * 100,
+        "Najdłużej pod wodą (rundy)": stats["longest_under_water"],
+    }, index=pd.Index(CHART_COLUMNS, name="Seria"))
+    return df.iloc[order].round(2)
+
+# Instrumenty z wagą ryzyka mniejszą co do wartości bezwzględnej opisujemy jako wpływające "lekko"
+STRONG_RISK_WEIGHT = 0.5
+
+# Najwięcej instrumentów wymienianych w jednym zdaniu objaśnienia (duże zestawy skracamy)
+EXPLANATION_MAX_INSTRUMENTS = 6
+
+def _instrument_list(keys, weighted: bool = True) -> str:
+    parts = [f"**{INSTRUMENTS[k]['label']}**"
+             + ("" if not weighted or abs(INSTRUMENTS[k]["risk_weight"]) >= STRONG_RISK_WEIGHT else " (lekko)")
+             for k in keys[:EXPLANATION_MAX_INSTRUMENTS]]
+    text = ", ".join(parts)
+    if len(keys) > EXPLANATION_MAX_INSTRUMENTS:
+        text += f" i {len(keys) - EXPLANATION_MAX_INSTRUMENTS} innych"
+    return text
+
+# Objaśnienie oceny inwestora budowane z parametrów oceny zestawu instrumentów (risk_weight, speculative)
+@lru_cache(maxsize=None)
+def score_explanation_md() -> str:
+    weights = {k: INSTRUMENTS[k]["risk_weight"] for k in INSTRUMENTS}
+    up = sorted((k for k in weights if weights[k] > 0), key=lambda k: -weights[k])
+    down = sorted((k for k in weights if weights[k] < 0), key=lambda k: weights[k])
+    speculative = [k for k in RISKY_KEYS if INSTRUMENTS[k]["speculative"]]
+
+    risk = "- **Skłonność do ryzyka rośnie**, "
+    risk += f"jeśli często wybierasz: {_instrument_list(up)}, oraz gdy używasz **lewara**" if up else "gdy używasz **lewara**"
+    if down:
+        risk += f"; **spada**, jeśli często wybierasz: {_instrument_list(down)}"
+    concentration = "- Wliczamy też **koncentrację** (jeśli prawie zawsze jedno aktywo"
+    if speculative:
+        concentration += ", zwłaszcza spekulacyjne: " + _instrument_list(speculative, weighted=False)
+    return "\n".join([
+        "- **Racjonalność spada**, jeśli często trzymasz instrument, który ma **serię spadków** oraz jeśli używasz "
+        "**lewara po spadkach**.  ",
+        "- Dodatkowo racjonalność spada przy **overtradingu** (zbyt częste zmiany) oraz przy „**kupowaniu po euforii**” "
+        "(wejście po dużym wzroście).  ",
+        risk + ".  ",
+        concentration + ").",
+    ])
+
+# Formatujemy liczbę jako PLN bez części dziesiętnej
+def fmt_pln_num(x: float) -> str:
+    return f"{x:,.0f}".replace(",", " ")
+
+# Formatujemy wartość procentową z plusem dla dodatnich wyników
+def fmt_pct(x: float) -> str:
+    sign = "+" if x >= 0 else ""
+    return f"{sign}{x:.2f}%"
+
+# HTML kafelków podsumowania (render jak na screenie + pewne HTML, bez bloków kodu)
+def summary_cards_html(items) -> str:
+    cards = []
+    for it in items:
+        delta = it["delta_pct"]
+        delta_class = "delta-pos" if delta >= 0 else "delta-neg"
+        card = f"""
+<div class="summary-card">
+  <div class="summary-title">{it['title']}</div>
+  <div class="summary-value">{it['value_num_str']} <span class="summary-ccy">PLN</span></div>
+  <div class="summary-delta"><span class="{delta_class}">{fmt_pct(delta)}</span></div>
+</div>
+"""
+        cards.append(textwrap.dedent(card).strip())
+
+    return '<div class="summary-grid">' + "".join(cards) + "</div>"
@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+
+from game_engine import CASH_WEIGHTS, REBALANCE_COST, START_CAPITAL, choice_returns, portfolio_growth
+from horizons import HORIZONS, horizon_params
+from returns_model import RISKY_KEYS
+from rng_streams import MAX_GAME_SEED, seeded_paths
+
+# Powtórka decyzji gracza na tysiącach innych ścieżek z modelu zwrotów ("co by było, gdyby"):
+# te same instrumenty i dźwignia w tych samych rundach, inny przebieg rynku. Miejsce prawdziwego
+# wyniku w tym rozkładzie pokazuje, ile w wyniku było szczęścia, a ile samych decyzji.
+# Ścieżki alternatywne są wspólne dla wszystkich gier horyzontu: liczymy je raz na proces
+# (w tle, przy starcie gry) i trzymamy jako float32, a sama powtórka to jedno mnożenie tablic.
+
+# Liczba ścieżek alternatywnych w horyzoncie. Gra z sesjami dziennymi dostaje ich mniej: każda ścieżka
+# jest 30 razy dłuższa, a podsumowanie nie powinno czekać na ich policzenie (1000 ścieżek to ok. 14 MB
+# i ułamek sekundy; percentyl i kwartyle są przy tej liczbie już stabilne)
+WHATIF_PATHS = {"monthly": 10_000, "daily": 1_000}
+DEFAULT_WHATIF_PATHS = 1_000
+
+# Najwięcej pamięci na ścieżki jednego horyzontu (także dla horyzontów spoza WHATIF_PATHS)
+PATH_BUDGET_BYTES = 32 * 2**20
+
+# Ziarna ścieżek alternatywnych leżą poza zakresem numerów gier, więc nie powtarzają żadnej gry
+WHATIF_SEED_BASE = 4 * MAX_GAME_SEED
+
+# Ścieżek liczonych i powtarzanych naraz (ogranicza pamięć tymczasowych tablic)
+CHUNK_PATHS = 1_000
+
+HIST_BINS = 40
+
+def whatif_path_count(horizon: str) -> int:
+    per_path = HORIZONS[horizon]["rounds"] * len(RISKY_KEYS) * np.dtype(np.float32).itemsize
+    return int(min(WHATIF_PATHS.get(horizon, DEFAULT_WHATIF_PATHS), PATH_BUDGET_BYTES // per_path))
+
+# Gotowe ścieżki horyzontów i blokady ich liczenia (osobna dla każdego horyzontu, więc liczenie
+# długiego horyzontu nie wstrzymuje pozostałych)
+_paths = {}
+_paths_locks = {horizon: threading.Lock() for horizon in HORIZONS}
+
+def _build_paths(horizon: str) -> np.ndarray:
+    h = HORIZONS[horizon]
+    params = None if h["periods_per_month"] == 1 else horizon_params(horizon)
+    n = whatif_path_count(horizon)
+    out = np.empty((n, h["rounds"], len(RISKY_KEYS)), dtype=np.float32)
+    for start in range(0, n, CHUNK_PATHS):
+        stop = min(n, start + CHUNK_PATHS)
+        out[start:stop] = seeded_paths(np.arange(start, stop) + WHATIF_SEED_BASE, h["rounds"], params=params)
+    out.setflags(write=False)
+    return out
+
+# Ścieżki alternatywne horyzontu (ścieżki x rundy x instrumenty); przy równoczesnych wywołaniach
+# liczy je tylko pierwsze, reszta czeka na wynik
+def alternative_paths(horizon: str) -> np.ndarray:
+    paths = _paths.get(horizon)
+    if paths is not None:
+        return paths
+    with _paths_locks[horizon]:
+        if horizon not in _paths:
+            _paths[horizon] = _build_paths(horizon)
+        return _paths[horizon]
+
+# Czy ścieżki horyzontu są już policzone (bez czekania na blokadę); do tej pory podsumowanie
+# pokazuje resztę strony, a powtórkę decyzji dorysowuje, gdy ścieżki będą gotowe
+def alternative_paths_ready(horizon: str) -> bool:
+    return horizon in _paths
+
+# Kapitał końcowy tej samej sekwencji decyzji na każdej ścieżce (z dźwignią i jej widełkami jak w grze)
+def replay_finals(paths, choices, leverage, start_capital: float = START_CAPITAL) -> np.ndarray:
+    choices = np.asarray(choices, dtype=np.int64)
+    leverage = np.asarray(leverage, dtype=bool)
+    n = len(choices)
+    finals = np.empty(len(paths))
+    for start in range(0, len(paths), CHUNK_PATHS):
+        block = paths[start:start + CHUNK_PATHS, :n]
+        k = len(block)
+        ret = choice_returns(block, np.broadcast_to(choices, (k, n)), np.broadcast_to(leverage, (k, n)))
+        finals[start:start + k] = start_capital * np.prod(1.0 + ret, axis=1)
+    return finals
+
+# To samo dla gry w trybie portfela: udziały (rundy x wybory) i koszty przebudowy jak w GameState.step_portfolio;
+# pętla idzie po rundach, a każda runda to operacje na macierzach (ścieżki x wybory)
+def replay_portfolio_finals(paths, weights, leverage, start_capital: float = START_CAPITAL,
+                            cost: float = REBALANCE_COST) -> np.ndarray:
+    weights = np.asarray(weights, dtype=np.float64)
+    leverage = np.asarray(leverage, dtype=bool)
+    n = len(weights)
+    finals = np.empty(len(paths))
+    for start in range(0, len(paths), CHUNK_PATHS):
+        block = paths[start:start + CHUNK_PATHS, :n]
+        k = len(block)
+        capital = np.full(k, start_capital)
+        held = np.broadcast_to(CASH_WEIGHTS, (k, len(CASH_WEIGHTS)))
+        for t in range(n):
+            growth, held = portfolio_growth(block[:, t], weights[t], leverage[t], held, cost)
+            capital *= growth
+        finals[start:start + k] = capital
+    return finals
+
+# Miejsce prawdziwego wyniku w rozkładzie i histogram (kubełki w skali logarytmicznej) do wykresu
+def whatif_summary(finals, realized: float, start_capital: float = START_CAPITAL) -> dict:
+    finals = np.asarray(finals)
+    q = np.percentile(finals, [5, 25, 50, 75, 95])
+    lo = min(finals.min(), realized)
+    hi = max(finals.max(), realized)
+    edges = np.geomspace(max(lo, 1e-6), max(hi, lo * 1.001), HIST_BINS + 1)
+    counts, _ = np.histogram(np.clip(finals, edges[0], edges[-1]), bins=edges)
+    return {
+        "paths": len(finals),
+        "percentile": float((finals < realized).mean() * 100),
+        "quantiles": dict(zip(("p5", "p25", "p50", "p75", "p95"), q.tolist())),
+        "loss_probability": float((finals < start_capital).mean()),
+        "edges": edges,
+        "counts": counts,
+    }